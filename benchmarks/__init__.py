@@ -0,0 +1,5 @@
+"""
+Benchmarks of the load profile pipeline on synthetic input data (see fixtures.py)
+-> run e.g. python -m benchmarks.bench_ramp_pipeline
+-> validate the numpy duty cycle engine against RAMP with python -m benchmarks.validate_duty_cycle_engine
+"""
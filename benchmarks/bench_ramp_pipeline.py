@@ -0,0 +1,164 @@
+"""
+Benchmark of the RAMP load profile pipeline on synthetic input data
+- times add_use_case (incl. usage window draws), run_use_cases, calculate_peak_power_events and
+  calculate_peak_power_timeseries separately for every number of days
+- every number of days runs in a fresh process -> peak RSS after every stage is not influenced by other runs
+- results are written as JSON (one file per commit) -> compare with python -m benchmarks.compare old.json new.json
+
+Usage: python -m benchmarks.bench_ramp_pipeline [--days 7 30 365] [--appliances 11] [--output file.json]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import synthetic_pue_input
+from model.instrumentation import peak_rss_mb
+
+
+class Stage:
+    """
+    Context manager recording wall time, CPU time and peak RSS of a benchmark stage
+    """
+
+    def __init__(self, results, name):
+        self.results = results
+        self.name = name
+
+    def __enter__(self):
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.results[self.name] = {
+            'wall_s': time.perf_counter() - self.wall_start,
+            'cpu_s': time.process_time() - self.cpu_start,
+            'peak_rss_mb': peak_rss_mb()
+        }
+
+
+def run_case(days_nr, fixture_parameters, workers, seed, max_seconds_days):
+    """
+    Run the pipeline for one number of days (module-level to run in a fresh process)
+    :param days_nr: number of days to generate
+    :param fixture_parameters: kwargs of synthetic_pue_input
+    :param workers: number of worker processes of run_use_cases
+    :param seed: master seed of RampControl
+    :param max_seconds_days: calculate_peak_power_timeseries is only timed up to this number of days
+    :return: dict {stage: {wall_s, cpu_s, peak_rss_mb}}
+    """
+
+    from model.ramp_control import RampControl
+
+    pue_input = synthetic_pue_input(**fixture_parameters)
+    days = pd.date_range("2018-01-01", periods=days_nr, freq="D")
+    timeseries = pd.date_range("2018-01-01", periods=days_nr * 24 * 60, freq="Min")
+
+    stages = {'start': {'wall_s': 0, 'cpu_s': 0, 'peak_rss_mb': peak_rss_mb()}}
+    ramp_run = RampControl(scenario_id='benchmark', seed=seed)
+
+    with Stage(stages, 'add_use_case'):
+        ramp_run.draw_usage_windows(pue_input, days)
+        for day in days:
+            appliances_list = ramp_run.add_use_case(name=day, pue_dict=pue_input, day=day.day_name(),
+                                                    month=day.month)
+
+    with Stage(stages, 'run_use_cases'):
+        load_profiles = ramp_run.run_use_cases(appliances_list, timeseries, workers=workers)
+
+    with Stage(stages, 'calculate_peak_power_events'):
+        events, _ = ramp_run.calculate_peak_power_events(load_profiles, pue_input)
+
+    if days_nr <= max_seconds_days:
+        seconds_timeseries = pd.date_range("2018-01-01", periods=days_nr * 24 * 60 * 60, freq="s")
+        with Stage(stages, 'calculate_peak_power_timeseries'):
+            ramp_run.calculate_peak_power_timeseries(load_profiles, pue_input, seconds_timeseries)
+    else:
+        stages['calculate_peak_power_timeseries'] = 'skipped (more than ' + str(max_seconds_days) + ' days)'
+
+    stages['switch_on_events'] = len(events)
+
+    return stages
+
+
+def git_commit():
+    """
+    :return: hash of the checked out commit and whether the working tree has changes (None if not a git repo)
+    """
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+    return commit, dirty
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the RAMP load profile pipeline on synthetic input data')
+    parser.add_argument('--days', type=int, nargs='+', default=[7, 30, 365], help='numbers of days to generate')
+    parser.add_argument('--appliances', type=int, default=11, help='number of appliances')
+    parser.add_argument('--windows', type=int, default=2, help='usage windows per day (1 to 3)')
+    parser.add_argument('--start-up-peak', type=float, nargs=2, default=[10, 40], help='min and max start-up peak')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes of run_use_cases')
+    parser.add_argument('--seed', type=int, default=0, help='seed of fixture and RampControl')
+    parser.add_argument('--max-seconds-days', type=int, default=30,
+                        help='only time calculate_peak_power_timeseries up to this number of days (dense seconds '
+                             'timeseries of a year needs several GB of memory)')
+    parser.add_argument('--output', default=None,
+                        help='result file (default: benchmarks/results/ramp_pipeline_<commit>.json)')
+    args = parser.parse_args(argv)
+
+    fixture_parameters = {
+        'appliances_nr': args.appliances,
+        'windows_nr': args.windows,
+        'start_up_peak': tuple(args.start_up_peak),
+        'seed': args.seed
+    }
+
+    commit, dirty = git_commit()
+    results = {
+        'benchmark': 'ramp_pipeline',
+        'commit': commit,
+        'dirty': dirty,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'parameters': dict(fixture_parameters, workers=args.workers, max_seconds_days=args.max_seconds_days),
+        'cases': {}
+    }
+
+    for days_nr in args.days:
+        print('Benchmark ' + str(days_nr) + ' days')
+        # Fresh process for every case -> independent peak RSS
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            stages = executor.submit(run_case, days_nr, fixture_parameters, args.workers, args.seed,
+                                     args.max_seconds_days).result()
+        results['cases'][str(days_nr)] = stages
+        for stage, values in stages.items():
+            if isinstance(values, dict) and stage != 'start':
+                print('  ' + stage + ': ' + str(round(values['wall_s'], 3)) + ' s')
+
+    output = args.output
+    if output is None:
+        output = os.path.join('benchmarks', 'results', 'ramp_pipeline_' + str(commit)[:10] + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print('Results written to ' + output)
+
+
+if __name__ == '__main__':
+    main()
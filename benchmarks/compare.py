@@ -0,0 +1,64 @@
+"""
+Compare two benchmark result files (e.g. of two commits)
+Usage: python -m benchmarks.compare old.json new.json [--threshold 1.1]
+-> prints wall time and peak RSS of every case and stage with ratio new/old, exits with 1 if a stage got slower
+   than the threshold
+"""
+import argparse
+import json
+import sys
+
+
+def compare(old, new, threshold):
+    """
+    :param old: results dict of the reference run
+    :param new: results dict of the compared run
+    :param threshold: ratio of wall times above which a stage counts as regression
+    :return: list of (case, stage) with regression
+    """
+
+    regressions = []
+    print('case  stage                              old [s]    new [s]   ratio   old RSS [MB]  new RSS [MB]')
+    for case, stages in new['cases'].items():
+        for stage, values in stages.items():
+            old_values = old['cases'].get(case, {}).get(stage)
+            if not isinstance(values, dict) or not isinstance(old_values, dict) or stage == 'start':
+                continue
+
+            ratio = values['wall_s'] / old_values['wall_s'] if old_values['wall_s'] > 0 else float('nan')
+            print('{:<5} {:<32} {:>9.3f}  {:>9.3f}  {:>6.2f}   {:>12}  {:>12}'.format(
+                case, stage, old_values['wall_s'], values['wall_s'], ratio,
+                _format_mb(old_values['peak_rss_mb']), _format_mb(values['peak_rss_mb'])))
+            if ratio > threshold:
+                regressions.append((case, stage))
+
+    return regressions
+
+
+def _format_mb(value):
+    return '-' if value is None else str(round(value))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('old', help='result file of the reference run')
+    parser.add_argument('new', help='result file of the compared run')
+    parser.add_argument('--threshold', type=float, default=1.1, help='wall time ratio counting as regression')
+    args = parser.parse_args(argv)
+
+    with open(args.old) as file:
+        old = json.load(file)
+    with open(args.new) as file:
+        new = json.load(file)
+
+    print('old: ' + str(old.get('commit')) + '   new: ' + str(new.get('commit')))
+    regressions = compare(old, new, args.threshold)
+    if regressions:
+        print('Regressions: ' + ', '.join(case + ' days ' + stage for case, stage in regressions))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
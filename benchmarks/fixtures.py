@@ -0,0 +1,73 @@
+import pandas as pd
+import numpy as np
+
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+WEEKLY_PREFERENCES_INDEX = ['window_1_start', 'window_1_start_var', 'window_1_end', 'window_1_end_var',
+                            'window_2_start', 'window_2_start_var', 'window_2_end', 'window_2_end_var',
+                            'window_3_start', 'window_3_start_var', 'window_3_end', 'window_3_end_var',
+                            'Usage time', 'Usage time variability']
+
+
+def synthetic_pue_input(appliances_nr=11, appliances_per_user=2, windows_nr=2, usage_time=2.0, start_up_peak=(10, 40),
+                        start_up_duration=(1, 5), closed_days=('Sunday',), seed=0):
+    """
+    Build synthetic pue input data in the shape returned by InputData.read_pue_input
+    :param appliances_nr: number of appliances
+    :param appliances_per_user: number of appliances of every user
+    :param windows_nr: number of usage windows per day (1 to 3, evenly spread between 7:00 and 19:00)
+    :param usage_time: mean daily usage time in hours
+    :param start_up_peak: (min, max) of the appliances' start-up peak power
+    :param start_up_duration: (min, max) of the appliances' start-up peak duration in seconds
+    :param closed_days: weekdays without usage windows
+    :param seed: seed of the random appliance parameters
+    :return: nested dict of pue input data
+    """
+
+    rng = np.random.default_rng(seed)
+
+    # Evenly spread windows between 7:00 and 19:00 (2 hours gap between windows)
+    window_length = (12 - 2 * (windows_nr - 1)) / windows_nr
+
+    pue_input = {}
+    for i in range(appliances_nr):
+        appliance = 'appliance_' + str(i)
+
+        weekly_preferences = pd.DataFrame(np.nan, index=pd.Index(WEEKLY_PREFERENCES_INDEX, name='Index'),
+                                          columns=WEEKDAYS)
+        for day in WEEKDAYS:
+            if day in closed_days:
+                weekly_preferences.loc[['Usage time', 'Usage time variability'], day] = 0
+                continue
+            for w in range(windows_nr):
+                start = 7 + w * (window_length + 2)
+                window = 'window_' + str(w + 1)
+                weekly_preferences.loc[[window + '_start', window + '_start_var', window + '_end', window + '_end_var'],
+                                       day] = [start, 0.5, start + window_length, 0.5]
+            weekly_preferences.loc['Usage time', day] = round(usage_time * rng.uniform(0.5, 1.5), 2)
+            weekly_preferences.loc['Usage time variability', day] = 0.1
+
+        monthly_variation = pd.DataFrame({'Usage time variation': rng.uniform(0.8, 1.2, 12).round(2)},
+                                         index=pd.Index(np.arange(1, 13, dtype=float), name='Month'))
+
+        nominal_power = round(rng.uniform(1, 20), 1)
+        pue_input[appliance] = {
+            'User': 'user_' + str(i // appliances_per_user),
+            'Appliance': appliance,
+            'Number': 1,
+            'Load type': 'Motor',
+            'Nominal power': nominal_power,
+            'Cos phi': 0.8,
+            'Connection type': 'direct',
+            'P1': nominal_power,
+            't1': 1,
+            'P2': nominal_power,
+            't2': int(rng.integers(5, 30)),
+            'Duration variability': 0.2,
+            'Start-up peak': round(rng.uniform(*start_up_peak), 1),
+            'Start-up duration': int(rng.integers(start_up_duration[0], start_up_duration[1], endpoint=True)),
+            'weekly_preferences': weekly_preferences,
+            'monthly_variation': monthly_variation
+        }
+
+    return pue_input
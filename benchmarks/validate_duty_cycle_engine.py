@@ -0,0 +1,139 @@
+"""
+Validate the vectorized duty cycle engine against RAMP on synthetic input data
+- both engines generate the same days with the same usage windows and peak time ranges
+- distributions of daily time of use, daily energy, switch-on events per day and event durations (pooled over all
+  appliances and days) are compared with the two-sample Kolmogorov-Smirnov statistic
+- mean hourly total load profiles are compared with their largest relative difference
+-> exits with 1 if a statistic exceeds its critical value / tolerance
+
+Usage: python -m benchmarks.validate_duty_cycle_engine [--days 365] [--alpha 0.01]
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import synthetic_pue_input
+
+
+# c(alpha) of the two-sample Kolmogorov-Smirnov test
+KS_COEFFICIENTS = {0.1: 1.224, 0.05: 1.358, 0.01: 1.628, 0.001: 1.949}
+
+
+def ks_statistic(sample_1, sample_2):
+    """
+    :param sample_1: 1d array
+    :param sample_2: 1d array
+    :return: two-sample Kolmogorov-Smirnov statistic (largest distance of the empirical CDFs)
+    """
+
+    sample_1, sample_2 = np.sort(sample_1), np.sort(sample_2)
+    values = np.concatenate([sample_1, sample_2])
+    cdf_1 = np.searchsorted(sample_1, values, side='right') / sample_1.size
+    cdf_2 = np.searchsorted(sample_2, values, side='right') / sample_2.size
+
+    return np.abs(cdf_1 - cdf_2).max()
+
+
+def ks_critical_value(n_1, n_2, alpha):
+    """
+    :return: critical value of the two-sample Kolmogorov-Smirnov statistic (asymptotic)
+    """
+
+    return KS_COEFFICIENTS[alpha] * np.sqrt((n_1 + n_2) / (n_1 * n_2))
+
+
+def profile_statistics(days_profiles):
+    """
+    :param days_profiles: array (appliances x days x 1440) of load profiles
+    :return: dict {statistic: 1d array pooled over appliances and days}
+    """
+
+    on = days_profiles > 0.001
+    # Switch-on event = first minute of a block of consecutive minutes with load
+    switch_on = on & ~np.concatenate([np.zeros(on.shape[:-1] + (1,), dtype=bool), on[..., :-1]], axis=-1)
+    switch_off = on & ~np.concatenate([on[..., 1:], np.zeros(on.shape[:-1] + (1,), dtype=bool)], axis=-1)
+    durations = np.flatnonzero(switch_off) - np.flatnonzero(switch_on) + 1
+
+    used = on.any(axis=-1)  # appliance days with load
+    return {
+        'time_of_use_min': on.sum(axis=-1)[used],
+        'energy_wmin': np.where(on, days_profiles, 0).sum(axis=-1)[used],
+        'switch_on_events': switch_on.sum(axis=-1)[used],
+        'event_duration_min': durations
+    }
+
+
+def generate(engine, pue_input, days, seed):
+    """
+    :return: array (appliances x days x 1440) of load profiles, wall time of generation in s
+    """
+
+    from model.ramp_control import RampControl
+
+    ramp_run = RampControl(scenario_id='validation', seed=seed)
+    ramp_run.draw_usage_windows(pue_input, days)
+    for day in days:
+        appliances_list = ramp_run.add_use_case(name=day, pue_dict=pue_input, day=day.day_name(), month=day.month)
+
+    start = time.perf_counter()
+    load_profile_array, _ = ramp_run.run_use_cases_array(appliances_list, engine=engine)
+    wall_s = time.perf_counter() - start
+
+    return load_profile_array.reshape(len(appliances_list), len(days), 1440), wall_s
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Validate the numpy duty cycle engine against RAMP')
+    parser.add_argument('--days', type=int, default=365, help='number of days to generate')
+    parser.add_argument('--appliances', type=int, default=11, help='number of appliances')
+    parser.add_argument('--windows', type=int, default=2, help='usage windows per day (1 to 3)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of fixture and RampControl')
+    parser.add_argument('--alpha', type=float, choices=sorted(KS_COEFFICIENTS), default=0.01,
+                        help='significance level of the Kolmogorov-Smirnov tests')
+    parser.add_argument('--profile-tolerance', type=float, default=0.15,
+                        help='largest accepted relative difference of the mean hourly load profiles')
+    args = parser.parse_args(argv)
+
+    pue_input = synthetic_pue_input(appliances_nr=args.appliances, windows_nr=args.windows, seed=args.seed)
+    days = pd.date_range("2018-01-01", periods=args.days, freq="D")
+
+    ramp_profiles, ramp_wall_s = generate('ramp', pue_input, days, args.seed)
+    numpy_profiles, numpy_wall_s = generate('numpy', pue_input, days, args.seed)
+    print('ramp: ' + str(round(ramp_wall_s, 3)) + ' s   numpy: ' + str(round(numpy_wall_s, 3)) + ' s')
+
+    failed = []
+    ramp_statistics = profile_statistics(ramp_profiles)
+    numpy_statistics = profile_statistics(numpy_profiles)
+    print('statistic              ramp mean   numpy mean      KS D   critical')
+    for statistic, ramp_sample in ramp_statistics.items():
+        numpy_sample = numpy_statistics[statistic]
+        d = ks_statistic(ramp_sample, numpy_sample)
+        critical = ks_critical_value(ramp_sample.size, numpy_sample.size, args.alpha)
+        print('{:<20} {:>11.2f}  {:>11.2f}  {:>8.4f}  {:>9.4f}'.format(
+            statistic, ramp_sample.mean(), numpy_sample.mean(), d, critical))
+        if d > critical:
+            failed.append(statistic)
+
+    # Mean hourly load profile (appliances x hours, only loads above the 0.001 window marker) -> compared as total
+    def hourly(profiles):
+        return np.where(profiles > 0.001, profiles, 0).reshape(profiles.shape[0], -1, 24, 60).mean(axis=(1, 3))
+
+    ramp_hourly, numpy_hourly = hourly(ramp_profiles), hourly(numpy_profiles)
+    difference = np.abs(ramp_hourly.sum(axis=0) - numpy_hourly.sum(axis=0)).max() / ramp_hourly.sum(axis=0).max()
+    print('mean hourly profile: largest relative difference ' + str(round(difference, 4)))
+    if difference > args.profile_tolerance:
+        failed.append('mean_hourly_profile')
+
+    if failed:
+        print('Distributions differ: ' + ', '.join(failed))
+        return 1
+
+    print('numpy engine reproduces the RAMP statistics')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,18 @@
+# One-shot conversion of CSV load profiles in existing run caches to parquet (see model/load_profile_store.py)
+# Usage: python convert_csv_cache.py [run_name ...]   (no run name -> all runs in ./data_cache)
+import os
+import sys
+
+from model.load_profile_store import convert_csv_cache
+
+cache_path = "./data_cache/"
+
+run_names = sys.argv[1:] or sorted(os.listdir(cache_path))
+for run_name in run_names:
+    cache_dir_path = cache_path + run_name + '/'
+    if not os.path.isdir(cache_dir_path):
+        print(run_name + ' does not exist at: ' + cache_dir_path)
+        continue
+
+    converted = convert_csv_cache(cache_dir_path)
+    print(run_name + ': ' + str(len(converted)) + ' files converted')
@@ -5,6 +5,7 @@ from sklearn.metrics import mean_absolute_percentage_error
 
 import plotting
 from high_res_data_analysis import read_high_res_data
+from model.load_profile_store import read_load_profiles
 from plotly.subplots import make_subplots
 import plotly.express as px
 import tqdm
@@ -46,8 +47,8 @@ fig.update_layout(
 fig.show_dash(mode='external')
 
 #%% load modeled load profile
-scen_a = pd.read_csv('./data_cache/final_8_v03/load_profile_scenario_a.csv', index_col=0, parse_dates=[0])
-scen_a = scen_a[['total', 'peak_power_profile']]
+scen_a = read_load_profiles('./data_cache/final_8_v03/load_profile_scenario_a.parquet',
+                            columns=['total', 'peak_power_profile'])
 
 df = pd.read_csv('./model_input_data/oemof_model_input/1min_household_load_profile.csv', index_col=0, parse_dates=[0])
 scen_a['household'] = df['household_load']
@@ -110,7 +111,8 @@ fig.show_dash(mode='external')
 #%%
 scen_profiles = {}
 for scenario in ['a', 'b', 'c', 'd', 'a2', 'b2', 'c2', 'd2']:
-    scen_profiles[scenario] = pd.read_csv('./data_cache/final_8/load_profile_scenario_'+ scenario +'.csv', index_col=0, parse_dates=[0])[['total', 'peak_power_profile']]
+    scen_profiles[scenario] = read_load_profiles('./data_cache/final_8/load_profile_scenario_' + scenario + '.parquet',
+                                                 columns=['total', 'peak_power_profile'])
 
 #%%
 fig = make_subplots(1,1)
@@ -4,6 +4,9 @@ from tqdm import tqdm
 
 import os
 
+from model import instrumentation
+
+@instrumentation.span('read_high_res_data.read_edr_data')
 def read_edr_data(dir_path, current_corr_factor):
     """
     Read processed EDR 100ms or 1s EDR data
@@ -122,6 +125,7 @@ def read_edr_data(dir_path, current_corr_factor):
     # Combine all phases' data in one dataframe and return
     return phase_dfs #pd.concat(phase_dfs, axis=1)
 
+@instrumentation.span('read_high_res_data.read_pico_data')
 def read_pico_data(file_path, agg_dur='20ms'):
     """
     - Read pico log CSV file
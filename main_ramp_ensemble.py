@@ -0,0 +1,86 @@
+# %%
+import pandas as pd
+import os
+import json
+import time
+
+from model.data_input import InputData
+from model.compiled_input import CompiledPueInput
+from model.ensemble import EnsembleRunner
+
+# %%  ---- Ensemble parameters ----
+# Days to generate load profiles for
+days_nr = 365
+days_timeseries = pd.date_range("2018-01-01", periods=days_nr, freq="D")  # 2018 starts on Monday
+
+# Number of realisations per scenario
+realisations = 100
+# Quantiles of the load profiles to estimate (saved as p10, p50, p90)
+quantiles = (0.1, 0.5, 0.9)
+# Number of realisations saved in full (the first one is used as the scenario's modelled load profile)
+sample_realisations = 1
+# Number of worker processes generating realisations in parallel (1 -> serial)
+workers = 1
+# Master seed of all realisations (None -> random, saved in scenarios_information to reproduce the run)
+seed = None
+
+# %%  ---- Preparation ----
+# Guard -> worker processes import this script without running it
+if __name__ == '__main__':
+    # Request user to define program run name
+    # Repeat until valid run name was entered
+    while True:
+        run_name = input("Enter run name:")
+        # Create new directory in data_cache
+        new_path = "./data_cache/" + str(run_name)
+        if not os.path.exists(new_path):  # check if this dir already exists
+            os.makedirs(new_path)
+            break
+        else:
+            print(run_name + ' exists already. Pick other name.')
+
+    # Read input data for this run
+    input_data = InputData()
+    input_data.get_all_tables("./model_input_data/model_input_1_scen_1min_res_test.xlsx")
+
+    # Create dict to store scenario information for cache
+    scenarios_information = {}
+
+    # Get table of ramp scenarios as df
+    scenarios = input_data.tables_dict['scenarios']['df']
+
+    # --- Iterate RAMP scenarios ---
+    for index, row in scenarios.iterrows():
+
+        print("Running load profile ensemble for scenario " + row['scenario_id'])
+
+        # Read this scenario's input data and compile it into arrays (also pickled to every worker process)
+        pue_input = CompiledPueInput(input_data.read_pue_input(
+            file="./model_input_data/ramp_model_input/" + row['ramp_input_file_name']))
+
+        ensemble = EnsembleRunner(pue_input, days_timeseries, scenario_id=row['scenario_id'], seed=seed,
+                                  quantiles=quantiles, workers=workers, sample_realisations=sample_realisations)
+
+        # Generate realisations and update aggregates
+        start = time.perf_counter()
+        ensemble.run(realisations)
+        print('done after: ' + str(time.perf_counter() - start) + ' seconds')
+
+        # Save aggregates and sampled realisations
+        print('Saving ensemble aggregates for scenario ' + row['scenario_id'])
+        files = ensemble.save("./data_cache/" + run_name + "/ensemble_scenario_" + row['scenario_id'])
+
+        # save filepaths in scenario_information dict
+        scenarios_information[row['scenario_id']] = {
+            'modelled_load_profiles': files.get('realisation_0'),
+            'ensemble': files,
+            'realisations': ensemble.realisations_nr,
+            'ramp_input_file_name': row['ramp_input_file_name'],
+            'oemof_input_file_name': row['oemof_input_file_name'],
+            'description': row['description'],
+            'seed': ensemble.seed
+        }
+
+    # Save scenario_information dict as json in this run's cache folder
+    with open("./data_cache/" + run_name + "/scenarios_information.json", "w+") as file:
+        json.dump(scenarios_information, file)
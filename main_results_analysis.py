@@ -7,6 +7,7 @@ import pandas as pd
 from plotly.subplots import make_subplots
 
 from model.results_analysis import ResultsAnalysis
+from model.load_profile_store import read_load_profiles
 import plotting
 
 from tqdm import tqdm
@@ -55,10 +56,9 @@ avg_week = pd.DataFrame()
 
 for scenario_id, scenario_data in tqdm(scenarios.items()):
     # Read this scenario's pue load profiles
-    pue_load_profiles = pd.read_csv(
-        cache_dir_path + 'load_profile_scenario_' + str(scenario_id) + '.csv',  # path to RAMP modelled load profiles
-        index_col=0,
-        parse_dates=True)
+    pue_load_profiles = read_load_profiles(
+        cache_dir_path + 'load_profile_scenario_' + str(scenario_id) + '.parquet',  # path to RAMP modelled load profiles
+        columns=['total'])
 
     pue_load = pue_load_profiles['total']
 
@@ -0,0 +1,89 @@
+import numpy as np
+
+from model import usage_windows
+
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MONTHS = list(range(1, 13))
+
+
+class CompiledPueInput:
+    """
+    Pue input data (see InputData.read_pue_input) compiled into typed numpy arrays
+    - appliance parameters: arrays (appliances)
+    - weekly preferences: arrays (weekdays x appliances), usage windows (weekdays x appliances x windows x 4)
+    - monthly variation: array (months x appliances)
+    -> compiled once per input file, consumers gather values by (weekday, month) index without pandas lookups
+    -> can be passed instead of the nested dict to RampControl, usage_windows, peak_power and the numpy engine
+       (iterating yields the appliance names like the nested dict)
+    """
+
+    def __init__(self, pue_input):
+        """
+        :param pue_input: nested dict of pue input data (see InputData.read_pue_input)
+        """
+
+        self.appliances = list(pue_input)
+        self.weekdays = WEEKDAYS
+        self.appliance_index = {appliance: i for i, appliance in enumerate(self.appliances)}
+        self.users = [data['User'] for data in pue_input.values()]
+
+        def parameter(key, dtype=float):
+            return np.array([data[key] for data in pue_input.values()], dtype=dtype)
+
+        # Appliance parameters (appliances)
+        self.number = parameter('Number', dtype=int)
+        self.nominal_power = parameter('Nominal power')
+        self.p1 = parameter('P1')
+        self.t1 = parameter('t1')
+        self.t2 = parameter('t2')
+        self.duration_variability = parameter('Duration variability')
+        self.start_up_peak = parameter('Start-up peak')
+        self.start_up_duration = parameter('Start-up duration', dtype=int)
+
+        # Weekly preferences (weekdays x appliances) in hours, usage windows (weekdays x appliances x windows x
+        # [start, start_var, end, end_var]) in hours, NaN for windows that are not defined
+        self.usage_time = np.array([data['weekly_preferences'].loc['Usage time', WEEKDAYS].to_numpy(dtype=float)
+                                    for data in pue_input.values()]).T
+        self.usage_time_variability = np.array([
+            data['weekly_preferences'].loc['Usage time variability', WEEKDAYS].to_numpy(dtype=float)
+            for data in pue_input.values()]).T
+        self.window_parameters = usage_windows.window_parameters(pue_input, WEEKDAYS)
+
+        # Monthly variation of usage time (months x appliances)
+        self.usage_time_variation = np.array([
+            data['monthly_variation']['Usage time variation'].loc[MONTHS].to_numpy(dtype=float)
+            for data in pue_input.values()]).T
+
+    def __iter__(self):
+        return iter(self.appliances)
+
+    def __len__(self):
+        return len(self.appliances)
+
+    def appliance_indices(self, appliances):
+        """
+        :param appliances: appliance names
+        :return: int array of the appliances' positions in the compiled arrays
+        """
+
+        return np.array([self.appliance_index[appliance] for appliance in appliances], dtype=int)
+
+    def func_time(self, weekday_indices, month_indices):
+        """
+        Daily usage time in min (usage time of the weekday x monthly variation)
+        :param weekday_indices: int array of weekday positions (0 = Monday)
+        :param month_indices: int array of month positions (0 = January), same shape as weekday_indices
+        :return: array (weekday_indices.shape x appliances)
+        """
+
+        return self.usage_time[weekday_indices] * 60 * self.usage_time_variation[month_indices]
+
+
+def weekday_indices(day_names):
+    """
+    :param day_names: weekday names (e.g. DatetimeIndex.day_name())
+    :return: int array of weekday positions (0 = Monday)
+    """
+
+    return np.array([WEEKDAYS.index(day) for day in day_names], dtype=int)
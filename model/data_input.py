@@ -1,13 +1,33 @@
+import os
+import pickle
+import hashlib
+import posixpath
+import zipfile
+from xml.etree import ElementTree
+
 from openpyxl import load_workbook
+from openpyxl.utils import range_boundaries
 import pandas as pd
-import numpy as np
+
+from model import instrumentation
+
+
+# Folder of parsed input workbooks (see cached_parse)
+PARSE_CACHE_PATH = "./data_cache/parsed_input/"
+# Increase if the parsing changes -> previously cached results are parsed again
+PARSE_CACHE_VERSION = 1
+
 
 class InputData:
-    def __init__(self):
+    def __init__(self, parse_cache_path=PARSE_CACHE_PATH):
+        """
+        :param parse_cache_path: folder of the parse cache of input workbooks (None -> workbooks are always parsed)
+        """
 
         self.resource_df = None
         self.pue_input_dict = None
         self.tables_dict = None
+        self.parse_cache_path = parse_cache_path
 
     def dump_resource_df(self, timeseries):
         self.resource_df = self.build_resource_df(timeseries)
@@ -16,83 +36,216 @@ class InputData:
     def read_resource_df_dump(self):
         self.resource_df = pd.read_csv('./data/resource_df.csv', index_col=0, parse_dates=True)
 
+    @instrumentation.span('InputData.build_resource_df')
     def build_resource_df(self, timeseries):
-        # Get weekly and hourly resources from input_data_dict
-        weekly_resources = self.input_data_dict['weekly_resources']['df']
-        weekly_resources.set_index(weekly_resources.columns[0], inplace=True)  # Make week number index
-        hourly_resources = self.input_data_dict['hourly_resources']['df']
-
-        # Create df for hourly resource data for model duration (given by timeseries)
-        resource_dict = {}
-
-        # -- Create list in dict for every hourly resource
-        for index, resource_id in hourly_resources.iterrows():
-            resource_dict[resource_id.iloc[0]] = np.zeros(len(timeseries))
-
-        # -- Create list in dict for every weekly resource
-        for resource_id in weekly_resources.columns:
-            resource_dict[resource_id] = np.zeros(len(timeseries))
+        """
+        Build the resource data (e.g. prices) of every timestep from the hourly and weekly resource tables
+        (see get_all_tables)
+        -> hour, weekday and ISO week of every timestep are computed once and the values are gathered from the tables
+        :param timeseries: DatetimeIndex of any length and resolution
+        :return: df with one column per hourly and weekly resource (index: timestep number)
+        """
 
-        # -- Iterate through timeseries
-        i = 0  # row counter
+        # Get weekly and hourly resources from tables_dict
+        weekly_resources = self.tables_dict['weekly_resources']['df']
+        weekly_resources = weekly_resources.set_index(weekly_resources.columns[0])  # Make week number index
+        hourly_resources = self.tables_dict['hourly_resources']['df']
 
-        for timestamp in timeseries:
-            hour = timestamp.hour
-            day = timestamp.dayofweek
-            week = timestamp.isocalendar().week
+        timeseries = pd.DatetimeIndex(timeseries)
+        hours = timeseries.hour.to_numpy()
+        days = timeseries.dayofweek.to_numpy()
+        weeks = timeseries.isocalendar().week.to_numpy()
 
-            row = []
-            # -- Loop through every hourly resource in this row
-            for index, resource_id in hourly_resources.iterrows():
-                resource_dict[resource_id.iloc[0]][i] = self.input_data_dict[resource_id.iloc[0]]['df'].iloc[hour, day]
+        resource_dict = {}
 
-            # -- Loop through every weekly resource in this row
-            for resource in weekly_resources.columns:
-                # Set resource price for this hour based on input data (corresponding week of year)
-                resource_dict[resource][i] = weekly_resources[resource].loc[week]
+        # -- Every hourly resource: table of hours (rows) x weekdays (columns)
+        for resource_id in hourly_resources.iloc[:, 0]:
+            resource_table = self.tables_dict[resource_id]['df'].to_numpy(dtype=float)
+            resource_dict[resource_id] = resource_table[hours, days]
 
-            i = i + 1
+        # -- Every weekly resource: value of the corresponding week of year
+        for resource_id in weekly_resources.columns:
+            resource_dict[resource_id] = weekly_resources[resource_id].loc[weeks].to_numpy(dtype=float)
 
-        resource_df = pd.DataFrame(data=resource_dict, index=timeseries)
-        resource_df.reset_index(inplace=True, drop=True)  # remove datetime index
+        resource_df = pd.DataFrame(data=resource_dict)  # index: timestep number
 
         return resource_df
 
+    @instrumentation.span('InputData.get_all_tables')
     def get_all_tables(self, file):
         """ Get all tables from a given workbook. Returns a dictionary of tables.
-            Requires a filename, which includes the file path and filename. """
+            Requires a filename, which includes the file path and filename.
+            -> parsed once and cached (see cached_parse) """
+
+        self.tables_dict = cached_parse(file, parse_all_tables, self.parse_cache_path)
+
+        return self.tables_dict
 
-        # Load the workbook, from the filename, setting read_only to False
-        wb = load_workbook(filename=file, read_only=False, keep_vba=False, data_only=True, keep_links=False)
+    @instrumentation.span('InputData.read_pue_input')
+    def read_pue_input(self, file):
+        """
+        Read pue_consumer_data_input excel file
+        -> parsed once and cached (see cached_parse)
+
+        :param file:
+        :return: nested dict: entry for each appliance with dict containing appliance properties:
+        {
+        property_name (column in appliance_data worksheet): property_value
+        ...
+        weekly_preferences: df containing weekly schedule of usage times and usage preferences
+        monthly_variation: df containing variation of usage_time and it's variability for each month of the year
+        }
 
-        # Initialize the dictionary of tables
-        tables_dict = {}
+        """
 
+        self.pue_input_dict = cached_parse(file, parse_pue_input, self.parse_cache_path)
+
+        return self.pue_input_dict
+
+
+def cached_parse(file, parse_function, cache_path=PARSE_CACHE_PATH):
+    """
+    Parse a workbook or take the result of a previous parse from the cache
+    -> cache entry of every (file path, parse function) is valid as long as the file's mtime and content hash match
+    -> results are stored as pickle (every call returns a fresh copy, which may be changed)
+    :param file: path of the workbook
+    :param parse_function: function(file) returning the parsed data (e.g. parse_all_tables)
+    :param cache_path: folder of the cache (None -> always parse)
+    :return: parsed data
+    """
+
+    if cache_path is None:
+        return parse_function(file)
+
+    with open(file, 'rb') as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    key = {
+        'file': os.path.abspath(file),
+        'mtime': os.stat(file).st_mtime_ns,
+        'sha256': content_hash,
+        'parser': parse_function.__name__,
+        'version': PARSE_CACHE_VERSION
+    }
+
+    # One cache file per workbook and parse function -> overwritten when the workbook changes
+    cache_file = os.path.join(cache_path, hashlib.sha256((key['file'] + key['parser']).encode()).hexdigest()[:32]
+                              + '.pickle')
+    if os.path.exists(cache_file):
+        with open(cache_file, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['key'] == key:
+            return cached['data']
+
+    with instrumentation.span('parse_workbook'):
+        data = parse_function(file)
+
+    os.makedirs(cache_path, exist_ok=True)
+    with open(cache_file, 'wb') as f:
+        pickle.dump({'key': key, 'data': data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return data
+
+
+def workbook_tables(file):
+    """
+    Get the tables of every worksheet from the workbook's xml parts (read-only worksheets of openpyxl have no tables)
+    :param file: path of the workbook
+    :return: dict {worksheet name: list of (table name, table range)}
+    """
+
+    namespaces = {
+        'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+        'rel': 'http://schemas.openxmlformats.org/package/2006/relationships'
+    }
+    relationship_id = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+    def relationships(archive, part):
+        # {relationship id: (type, path of target part)}
+        rels_part = posixpath.join(posixpath.dirname(part), '_rels', posixpath.basename(part) + '.rels')
+        if rels_part not in archive.namelist():
+            return {}
+        root = ElementTree.fromstring(archive.read(rels_part))
+        return {rel.get('Id'): (rel.get('Type'), target_part(part, rel.get('Target')))
+                for rel in root.findall('rel:Relationship', namespaces)}
+
+    def target_part(part, target):
+        # targets are relative to the part's folder or absolute within the archive
+        if target.startswith('/'):
+            return target[1:]
+        return posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+
+    tables = {}
+    with zipfile.ZipFile(file) as archive:
+        workbook_rels = relationships(archive, 'xl/workbook.xml')
+        workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        for sheet in workbook.find('main:sheets', namespaces):
+            sheet_part = workbook_rels[sheet.get(relationship_id)][1]
+            sheet_rels = relationships(archive, sheet_part)
+            tables[sheet.get('name')] = []
+            # Tables in order of the worksheet's table parts (at the end of the worksheet -> streamed)
+            for _, element in ElementTree.iterparse(archive.open(sheet_part)):
+                if element.tag == '{' + namespaces['main'] + '}tablePart':
+                    table = ElementTree.fromstring(archive.read(sheet_rels[element.get(relationship_id)][1]))
+                    tables[sheet.get('name')].append((table.get('name'), table.get('ref')))
+                element.clear()
+
+    return tables
+
+
+def sheet_tables_rows(ws, tables):
+    """
+    Read the rows of all tables of a worksheet in one pass over the worksheet
+    :param ws: (read-only) worksheet
+    :param tables: list of (table name, table range) of this worksheet (see workbook_tables)
+    :return: dict {table name: list of rows (lists of cell values), first row is the header}
+    """
+
+    if not tables:
+        return {}
+
+    boundaries = {table_name: range_boundaries(table_range) for table_name, table_range in tables}
+    max_col = max(bounds[2] for bounds in boundaries.values())
+    max_row = max(bounds[3] for bounds in boundaries.values())
+
+    # All rows up to the last table row and column (missing cells are None)
+    values = list(ws.iter_rows(min_row=1, max_row=max_row, min_col=1, max_col=max_col, values_only=True))
+
+    return {table_name: [list(row[min_col - 1:max_col]) for row in values[min_row - 1:max_row]]
+            for table_name, (min_col, min_row, max_col, max_row) in boundaries.items()}
+
+
+def parse_all_tables(file):
+    """
+    Parse all tables of a workbook (see InputData.get_all_tables) with a read-only streaming parse
+    :param file: path of the workbook
+    :return: dict of tables
+    """
+
+    tables = workbook_tables(file)
+
+    # Load the workbook read-only -> cells are streamed instead of building the whole workbook
+    wb = load_workbook(filename=file, read_only=True, keep_vba=False, data_only=True, keep_links=False)
+
+    # Initialize the dictionary of tables
+    tables_dict = {}
+
+    try:
         # Go through each worksheet in the workbook
         for ws_name in wb.sheetnames:
             ws = wb[ws_name]
 
+            tables_rows = sheet_tables_rows(ws, tables.get(ws_name, []))
+
             # Get each table in the worksheet
-            for tbl in ws.tables.values():
+            for table_name, table_range in tables.get(ws_name, []):
+                rows_list = tables_rows[table_name]
+
                 # First, add some info about the table to the dictionary
-                tables_dict[tbl.name] = {
-                    'table_name': tbl.name,
+                tables_dict[table_name] = {
+                    'table_name': table_name,
                     'worksheet': ws_name,
-                    'num_cols': len(tbl.tableColumns),
-                    'table_range': tbl.ref}
-
-                # Grab the 'data' from the table
-                data = ws[tbl.ref]
-
-                # Now convert the table 'data' to a Pandas DataFrame
-                # First get a list of all rows, including the first header row
-                rows_list = []
-                for row in data:
-                    # Get a list of all columns in each row
-                    cols = []
-                    for col in row:
-                        cols.append(col.value)
-                    rows_list.append(cols)
+                    'num_cols': len(rows_list[0]),
+                    'table_range': table_range}
 
                 # Create a pandas dataframe from the rows_list.
                 # The first row is the column names
@@ -103,38 +256,31 @@ class InputData:
                     df = df.set_index('index', drop=True)
 
                 # Add the dataframe to the dictionary of tables
-                tables_dict[tbl.name]['df'] = df
+                tables_dict[table_name]['df'] = df
 
                 # If df has only one "value" column, also save as dict with {key=row_index : value}
                 if len(df.columns) == 1 and df.columns[0] == 'value':
                     dct = df['value'].to_dict()
-                    tables_dict[tbl.name]['dct'] = dct
+                    tables_dict[table_name]['dct'] = dct
+    finally:
+        wb.close()  # read-only workbooks keep the file open
 
-        self.tables_dict = tables_dict
-
-        return tables_dict
-
-    def read_pue_input(self, file):
-        """
-        Read pue_consumer_data_input excel file
+    return tables_dict
 
-        :param file:
-        :return: nested dict: entry for each appliance with dict containing appliance properties:
-        {
-        property_name (column in appliance_data worksheet): property_value
-        ...
-        weekly_preferences: df containing weekly schedule of usage times and usage preferences
-        monthly_variation: df containing variation of usage_time and it's variability for each month of the year
-        }
 
-        """
+def parse_pue_input(file):
+    """
+    Parse a pue_consumer_data_input workbook (see InputData.read_pue_input) with a read-only streaming parse
+    :param file: path of the workbook
+    :return: nested dict of pue input data
+    """
 
-        # Load the workbook, from the filename, setting read_only to False
-        wb = load_workbook(filename=file, read_only=False, keep_vba=False, data_only=True, keep_links=False)
+    tables = workbook_tables(file)
 
-        # Initialize the dictionary of tables
-        #pue_input_dict = {}
+    # Load the workbook read-only -> cells are streamed instead of building the whole workbook
+    wb = load_workbook(filename=file, read_only=True, keep_vba=False, data_only=True, keep_links=False)
 
+    try:
         # Go through each worksheet in the workbook
         for ws_name in wb.sheetnames:
 
@@ -144,16 +290,7 @@ class InputData:
                 print() # Currently not used
             elif ws_name == "appliance_data":    # Special treatment for appliance_data list
                 # Select each table in the worksheet
-                for tbl in ws.tables.values():
-                    # Get table data
-                    data = ws[tbl.ref]
-                    # Convert table to df
-                    rows_list = []
-                    for row in data:
-                        cols = []
-                        for col in row:
-                            cols.append(col.value)
-                        rows_list.append(cols)
+                for table_name, rows_list in sheet_tables_rows(ws, tables.get(ws_name, [])).items():
 
                     # Create a pandas dataframe from the rows_list.
                     # The first row is the column names
@@ -174,7 +311,7 @@ class InputData:
                     pue_input_dict[ws_name]['monthly_variation'] = df.iloc[0:12, 9:12].set_index(keys=df.columns[9], drop=True)
                 except KeyError:
                     raise UserWarning(ws_name + ' is not listed in appliance_data table')
+    finally:
+        wb.close()  # read-only workbooks keep the file open
 
-        self.pue_input_dict = pue_input_dict
-
-        return pue_input_dict
+    return pue_input_dict
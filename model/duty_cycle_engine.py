@@ -0,0 +1,171 @@
+import numpy as np
+
+
+# RAMP defaults of the appliances created by RampControl.add_use_case
+FUNC_CYCLE = 1  # minimum duration of a switch-on event in min
+# Coincident switch-on parameters (see ramp switch_on_parameters)
+MU_PEAK = 0.5
+S_PEAK = 0.5
+OP_FACTOR = 0.5
+
+# add_appliance() kwargs used by the engine
+PARAMETERS = ['number', 'func_time', 'time_fraction_random_variability', 'p_11', 't_11', 'p_12', 't_12', 'r_c1']
+
+
+def compile_parameters(templates):
+    """
+    Stack the appliance parameters of the use case templates of all days
+    :param templates: list of use case templates (one per day, see ramp_control.compile_use_case_template)
+    :return: dict {parameter: float array (days x appliances)}
+    """
+
+    return {parameter: np.array([[appliance['appliance_kwargs'][parameter] for appliance in template]
+                                 for template in templates], dtype=float)
+            for parameter in PARAMETERS}
+
+
+def gather_parameters(pue_input, weekday_indices, month_indices):
+    """
+    Same as compile_parameters, but gathered from the arrays of a CompiledPueInput (no use case templates)
+    :param pue_input: CompiledPueInput
+    :param weekday_indices: int array of every day's weekday position (0 = Monday)
+    :param month_indices: int array of every day's month position (0 = January)
+    :return: dict {parameter: float array (days x appliances)}
+    """
+
+    appliance_parameters = {'number': pue_input.number, 'p_11': pue_input.p1, 't_11': pue_input.t1,
+                            'p_12': pue_input.p1, 't_12': pue_input.t2, 'r_c1': pue_input.duration_variability}
+    shape = (len(weekday_indices), len(pue_input))
+
+    parameters = {parameter: np.broadcast_to(values.astype(float), shape)
+                  for parameter, values in appliance_parameters.items()}
+    parameters['func_time'] = pue_input.func_time(weekday_indices, month_indices)
+    parameters['time_fraction_random_variability'] = pue_input.usage_time_variability[weekday_indices]
+
+    return parameters
+
+
+def generate_load_profiles(parameters, starts, ends, peak_time_ranges, rng, appliances=None):
+    """
+    Generate the daily load profiles of fixed single duty cycle appliances of all days and appliances at once
+    -> same random process as RAMP's Appliance.generate_load_profile (fixed_cycle=1, random_var_w=0) in vectorized form:
+       - total time of use: func_time +- time_fraction_random_variability, limited to 99 % of the windows (step 2a)
+       - duty cycle: t_11 and t_12 +- r_c1, drawn once per day and appliance
+       - switch-on events are added until the total time of use is reached (steps 2c-2e): random switch-on minute
+         among the free minutes of the windows, random duration up to the end of the free spot (the last event is
+         cut to the total time of use), coincident switch-ons inside/outside the peak time range
+       - the duty cycle is repeated over the event's duration
+    -> one round of switch-on events of all days and appliances per loop (instead of one event per loop)
+    -> adjacent windows form one free spot (RAMP keeps them apart)
+    :param parameters: dict {parameter: array (days x appliances)} (see compile_parameters, gather_parameters)
+    :param starts: array (days x appliances x windows) of window starts in min (-1 for undefined windows)
+    :param ends: array (days x appliances x windows) of window ends in min
+    :param peak_time_ranges: array (days x 2) of first and last minute of every day's peak time range
+    :param rng: numpy Generator
+    :param appliances: list of appliance names (only used in error messages)
+    :return: float32 array (days x appliances x 1440) of load profiles (unused window minutes are 0.001)
+    """
+
+    days_nr, appliances_nr, _ = starts.shape
+    rows_nr = days_nr * appliances_nr
+    minutes = np.arange(1440)
+
+    parameters = {parameter: np.broadcast_to(values, (days_nr, appliances_nr)).ravel()
+                  for parameter, values in parameters.items()}
+    defined = starts >= 0
+    window_starts = np.where(defined, starts, 0).reshape(rows_nr, -1)
+    window_ends = np.where(defined, ends, 0).reshape(rows_nr, -1)
+
+    # Appliances without window or usage time are not switched on (no 0.001 in the profile)
+    active = defined.reshape(rows_nr, -1).any(axis=1) & (parameters['func_time'] > 0)
+
+    # Minutes within the windows -> marked with 0.001 and free for switch-on events
+    free = ((minutes >= window_starts[:, :, None]) & (minutes < window_ends[:, :, None])).any(axis=1)
+    free &= active[:, None]
+    profiles = np.where(free, 0.001, 0).astype(np.float32)
+
+    # Randomised total time of use (step 2a)
+    func_time = parameters['func_time']
+    random_var_t = rng.uniform(1 - parameters['time_fraction_random_variability'],
+                               1 + parameters['time_fraction_random_variability'])
+    rand_time = np.round(func_time + (np.trunc(func_time * random_var_t) - func_time) * rng.random(rows_nr))
+    rand_time = np.maximum(rand_time, FUNC_CYCLE)
+    total_time = (window_ends - window_starts).sum(axis=1)
+    rand_time = np.where(rand_time > 0.99 * total_time, np.trunc(0.99 * total_time), rand_time).astype(int)
+
+    too_short = active & (rand_time < FUNC_CYCLE)
+    if too_short.any():
+        day, appliance = np.divmod(np.flatnonzero(too_short)[0], appliances_nr)
+        name = appliances[appliance] if appliances is not None else appliance
+        raise ValueError('Windows of appliance ' + str(name) + ' on day ' + str(day) + ' are too short for its '
+                         'duty cycle')
+
+    # Randomised duty cycle (one per day and appliance)
+    t_1 = np.trunc(parameters['t_11'] * rng.uniform(1 - parameters['r_c1'], 1 + parameters['r_c1'])).astype(int)
+    t_2 = np.trunc(parameters['t_12'] * rng.uniform(1 - parameters['r_c1'], 1 + parameters['r_c1'])).astype(int)
+    cycle_length = np.maximum(t_1 + t_2, 1)
+
+    # Peak time range of every row's day
+    peak_first = np.repeat(peak_time_ranges[:, 0], appliances_nr)
+    peak_last = np.repeat(peak_time_ranges[:, -1], appliances_nr)
+
+    # Only the minutes between the first window start and the last window end are searched for free minutes
+    active_windows = defined.reshape(rows_nr, -1) & active[:, None]
+    first_minute = window_starts[active_windows].min(initial=0)
+    span = minutes[first_minute:max(window_ends[active_windows].max(initial=0), first_minute + 1)]
+
+    # Switch-on events (steps 2c-2e) -> one event of every unfinished row per round
+    tot_time = np.zeros(rows_nr, dtype=int)
+    running = active.copy()
+    while running.any():
+        rows = np.flatnonzero(running)
+        row_free = free[rows, span[0]:span[-1] + 1]
+        free_nr = row_free.sum(axis=1)
+
+        # Rows without free minutes are done
+        running[rows[free_nr == 0]] = False
+        rows, row_free, free_nr = rows[free_nr > 0], row_free[free_nr > 0], free_nr[free_nr > 0]
+        if rows.size == 0:
+            break
+
+        # Random switch-on minute among the free minutes
+        pick = rng.integers(0, free_nr)
+        switch_on = span[np.argmax(row_free.cumsum(axis=1, dtype=np.int16) > pick[:, None], axis=1)]
+        # End of the free spot containing the switch-on minute
+        spot_stop = np.where(~row_free & (span >= switch_on[:, None]), span, span[-1] + 1).min(axis=1)
+
+        # Random duration up to the end of the free spot or the total time of use
+        largest_duration = np.minimum(rand_time[rows], spot_stop - switch_on)
+        duration = np.where(largest_duration > FUNC_CYCLE,
+                            np.trunc(FUNC_CYCLE + (largest_duration - FUNC_CYCLE) * rng.random(rows.size)),
+                            largest_duration).astype(int)
+
+        # Cut the last event to the total time of use
+        tot_time[rows] += duration
+        overflow = np.maximum(tot_time[rows] - rand_time[rows], 0)
+        duration -= overflow
+        running[rows[tot_time[rows] >= rand_time[rows]]] = False
+
+        event = duration > 0
+        rows, switch_on, duration = rows[event], switch_on[event], duration[event]
+        last = switch_on + duration - 1
+
+        # Coincident switch-ons inside (eq. 4) and outside (eq. 3) of the peak time range
+        number = parameters['number'][rows]
+        inside_peak = ~(((switch_on < peak_first[rows]) & (last < peak_first[rows]))
+                        | ((switch_on > peak_last[rows]) & (last > peak_last[rows])))
+        coincidence_peak = np.clip(np.ceil(rng.normal(number * MU_PEAK, S_PEAK * number * MU_PEAK)), 1, number)
+        coincidence_off_peak = np.floor(rng.uniform(0, (number - OP_FACTOR) / number) * number) + 1
+        coincidence = np.where(inside_peak, coincidence_peak, coincidence_off_peak)
+
+        # Write the duty cycle (repeated over the event's duration) into the events' minutes
+        event_index = np.repeat(np.arange(rows.size), duration)
+        offset = np.arange(event_index.size) - np.repeat(np.cumsum(duration) - duration, duration)
+        event_rows = rows[event_index]
+        event_minutes = switch_on[event_index] + offset
+        phase = offset % cycle_length[event_rows]
+        profiles[event_rows, event_minutes] = np.where(phase < t_1[event_rows], parameters['p_11'][event_rows],
+                                                       parameters['p_12'][event_rows]) * coincidence[event_index]
+        free[event_rows, event_minutes] = False
+
+    return profiles.reshape(days_nr, appliances_nr, 1440)
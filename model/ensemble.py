@@ -0,0 +1,297 @@
+import pandas as pd
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from model.ramp_control import RampControl
+from model.load_profile_store import LoadProfileSink, write_load_profiles
+
+
+class RunningMoments:
+    """
+    Running mean and variance of every element of an array over many realisations (Welford's algorithm)
+    -> only mean and sum of squared deviations are held in memory
+    """
+
+    def __init__(self, shape):
+        """
+        :param shape: shape of one realisation
+        """
+
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)   # sum of squared deviations from the mean
+
+    def update(self, x):
+        """
+        Add one realisation
+        :param x: array of one realisation
+        :return:
+        """
+
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def variance(self):
+        """
+        :return: sample variance of every element (NaN for less than 2 realisations)
+        """
+
+        if self.count < 2:
+            return np.full(self.mean.shape, np.nan)
+
+        return self.m2 / (self.count - 1)
+
+    def std(self):
+        """
+        :return: sample standard deviation of every element
+        """
+
+        return np.sqrt(self.variance())
+
+
+class StreamingQuantiles:
+    """
+    Streaming estimate of quantiles of every element of an array over many realisations (P² algorithm,
+    Jain & Chlamtac 1985, extended to several quantiles with shared markers)
+    - markers at the minimum, the quantiles, between the quantiles and at the maximum are tracked per element
+    -> memory per element is constant (2 * number of quantiles + 3 markers), independent of the number of realisations
+    (marker positions are int16 -> max. 32767 realisations)
+    - the first realisations (as many as markers) are kept and give exact quantiles
+    """
+
+    def __init__(self, shape, quantiles=(0.1, 0.5, 0.9), dtype=np.float32):
+        """
+        :param shape: shape of one realisation
+        :param quantiles: quantiles to estimate (between 0 and 1)
+        :param dtype: dtype of the marker heights
+        """
+
+        self.quantiles = sorted(quantiles)
+
+        # Marker probabilities: 0, quantiles, midpoints between them and 1
+        probabilities = [0] + self.quantiles + [1]
+        midpoints = [(p1 + p2) / 2 for p1, p2 in zip(probabilities[:-1], probabilities[1:])]
+        self.probabilities = np.array(sorted(probabilities + midpoints))
+        self.markers_nr = len(self.probabilities)
+
+        self.count = 0
+        self.heights = np.zeros((self.markers_nr,) + tuple(shape), dtype=dtype)    # marker heights
+        self.positions = np.zeros((self.markers_nr,) + tuple(shape), dtype=np.int16)    # marker positions (1-based)
+
+    def update(self, x):
+        """
+        Add one realisation
+        :param x: array of one realisation
+        :return:
+        """
+
+        self.count += 1
+
+        # Initialisation -> collect first observations
+        if self.count <= self.markers_nr:
+            self.heights[self.count - 1] = x
+            if self.count == self.markers_nr:
+                self.heights.sort(axis=0)
+                self.positions[:] = np.arange(1, self.markers_nr + 1).reshape((-1,) + (1,) * x.ndim)
+            return
+
+        q = self.heights
+        n = self.positions
+
+        # Cell k of every observation (q[k] <= x < q[k+1]) -> adjust extreme markers
+        k = np.minimum((q[1:] <= x).sum(axis=0), self.markers_nr - 2)
+        np.minimum(q[0], x, out=q[0])
+        np.maximum(q[-1], x, out=q[-1])
+
+        # Increment positions of markers above the observation's cell
+        marker = np.arange(self.markers_nr).reshape((-1,) + (1,) * x.ndim)
+        n += (marker > k)
+
+        # Desired positions are the same for all elements (every element gets one observation per realisation)
+        desired = 1 + (self.count - 1) * self.probabilities
+
+        # Adjust heights of the middle markers
+        for i in range(1, self.markers_nr - 1):
+            d = desired[i] - n[i]
+            right = n[i + 1] - n[i]
+            left = n[i - 1] - n[i]
+            move = ((d >= 1) & (right > 1)) | ((d <= -1) & (left < -1))
+            if not move.any():
+                continue
+
+            s = np.where(d >= 1, 1, -1)
+            qi, q_right, q_left = q[i].astype(float), q[i + 1].astype(float), q[i - 1].astype(float)
+            ni, n_right, n_left = n[i].astype(float), n[i + 1].astype(float), n[i - 1].astype(float)
+
+            # Piecewise parabolic prediction
+            with np.errstate(divide='ignore', invalid='ignore'):
+                parabolic = qi + s / (n_right - n_left) * ((ni - n_left + s) * (q_right - qi) / (n_right - ni)
+                                                           + (n_right - ni - s) * (qi - q_left) / (ni - n_left))
+                # Linear prediction if parabolic one is not between the neighbouring markers
+                linear = np.where(s > 0, qi + (q_right - qi) / (n_right - ni), qi - (q_left - qi) / (n_left - ni))
+            new_height = np.where((q_left < parabolic) & (parabolic < q_right), parabolic, linear)
+
+            q[i] = np.where(move, new_height, qi)
+            n[i] += np.where(move, s, 0).astype(n.dtype)
+
+    def result(self):
+        """
+        :return: dict {quantile: array of estimated quantile of every element}
+        """
+
+        if self.count < self.markers_nr:
+            # Exact quantiles of the observations so far
+            observations = self.heights[:self.count]
+            return {p: np.quantile(observations, p, axis=0) for p in self.quantiles}
+
+        return {p: self.heights[np.flatnonzero(np.isclose(self.probabilities, p))[0]] for p in self.quantiles}
+
+
+class EnsembleRunner:
+    """
+    Monte Carlo ensemble of RAMP load profiles of one scenario
+    - realisations are generated in parallel (one RampControl run per realisation)
+    - only running aggregates (mean, std, quantiles per minute and appliance) and optionally some sampled
+      realisations are kept
+    """
+
+    def __init__(self, pue_input, days, scenario_id=None, seed=None, quantiles=(0.1, 0.5, 0.9), workers=1,
+                 sample_realisations=0):
+        """
+        :param pue_input: nested dict of pue input data (see InputData.read_pue_input) or CompiledPueInput
+        :param days: DatetimeIndex of the days to generate
+        :param scenario_id: id of the modelled scenario
+        :param seed: master seed of the ensemble (None -> random, saved in self.seed)
+        -> realisation i uses the random streams of scenario '<scenario_id>_realisation_<i>'
+        :param quantiles: quantiles of the load profiles to estimate
+        :param workers: number of worker processes (1 -> realisations one after another in this process)
+        :param sample_realisations: number of realisations to keep in full
+        """
+
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+
+        self.pue_input = pue_input
+        self.days = pd.DatetimeIndex(days)
+        self.timeseries = pd.date_range(self.days[0], periods=len(self.days) * 24 * 60, freq="Min")
+        self.scenario_id = scenario_id
+        self.seed = seed
+        self.quantiles = quantiles
+        self.workers = workers
+        self.sample_realisations = sample_realisations
+
+        # Columns of every realisation -> appliances, total and peak power profile
+        self.columns = list(pue_input) + ['total', 'peak_power_profile']
+
+        self.realisations_nr = 0
+        self.moments = RunningMoments((len(self.columns), len(self.timeseries)))
+        self.quantile_sketch = StreamingQuantiles((len(self.columns), len(self.timeseries)), quantiles=quantiles)
+        self.samples = {}   # realisation number: df of load profiles
+
+    def run(self, realisations):
+        """
+        Generate realisations and add them to the aggregates (can be called repeatedly to extend the ensemble)
+        :param realisations: number of realisations to generate
+        :return:
+        """
+
+        realisation_ids = range(self.realisations_nr, self.realisations_nr + realisations)
+
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                # Limit realisations in flight -> at most 2 per worker are held in memory
+                pending = deque()
+                for realisation in realisation_ids:
+                    pending.append((realisation, executor.submit(
+                        generate_realisation, self.pue_input, self.days, self.scenario_id, self.seed, realisation)))
+                    if len(pending) >= 2 * self.workers:
+                        realisation_done, future = pending.popleft()
+                        self.add_realisation(realisation_done, future.result())
+                while pending:
+                    realisation_done, future = pending.popleft()
+                    self.add_realisation(realisation_done, future.result())
+        else:
+            for realisation in realisation_ids:
+                self.add_realisation(realisation, generate_realisation(
+                    self.pue_input, self.days, self.scenario_id, self.seed, realisation))
+
+    def add_realisation(self, realisation, realisation_array):
+        """
+        Update the aggregates with one realisation
+        :param realisation: number of the realisation
+        :param realisation_array: array of load profiles (columns x minutes, see generate_realisation)
+        :return:
+        """
+
+        self.moments.update(realisation_array)
+        self.quantile_sketch.update(realisation_array)
+        self.realisations_nr += 1
+
+        if realisation < self.sample_realisations:
+            self.samples[realisation] = pd.DataFrame(realisation_array.T, index=self.timeseries, columns=self.columns)
+
+        print('Realisation ' + str(realisation) + ' done (' + str(self.realisations_nr) + ' in ensemble)')
+
+    def aggregates(self):
+        """
+        :return: dict {statistic name ('mean', 'std', 'p10', ...): df of this statistic per minute and column}
+        """
+
+        statistics = {'mean': self.moments.mean, 'std': self.moments.std()}
+        for p, values in self.quantile_sketch.result().items():
+            statistics['p' + str(round(p * 100))] = values
+
+        return {name: pd.DataFrame(np.asarray(values).T, index=self.timeseries, columns=self.columns)
+                for name, values in statistics.items()}
+
+    def save(self, path_prefix):
+        """
+        Save aggregates and sampled realisations as parquet (see load_profile_store)
+        -> realisations are saved with their aggregate pyramid, like the modelled load profiles of a scenario
+           (can be optimised, see pipeline.scenario_model)
+        :param path_prefix: path and beginning of the file names (e.g. ./data_cache/run/ensemble_scenario_a)
+        :return: dict {statistic name or 'realisation_<i>': file path}
+        """
+
+        files = {}
+        for name, df in self.aggregates().items():
+            files[name] = path_prefix + "_" + name + ".parquet"
+            write_load_profiles(df, files[name])
+
+        for realisation, df in self.samples.items():
+            files['realisation_' + str(realisation)] = path_prefix + "_realisation_" + str(realisation) + ".parquet"
+            with LoadProfileSink(files['realisation_' + str(realisation)]) as sink:
+                sink.append(df)
+
+        return files
+
+
+def generate_realisation(pue_input, days, scenario_id, seed, realisation):
+    """
+    Generate one realisation of the load profiles of a scenario
+    Module-level function to allow for pickling when run in a process pool
+    :param pue_input: nested dict of pue input data or CompiledPueInput
+    :param days: DatetimeIndex of the days to generate
+    :param scenario_id: id of the modelled scenario
+    :param seed: master seed of the ensemble
+    :param realisation: number of the realisation -> part of the key of its random streams
+    :return: float32 array (appliances + total + peak power profile x minutes)
+    """
+
+    ramp_run = RampControl(scenario_id=str(scenario_id) + '_realisation_' + str(realisation), seed=seed)
+
+    ramp_run.draw_usage_windows(pue_input, days)
+    for day in days:
+        appliances_list = ramp_run.add_use_case(name=day, pue_dict=pue_input, day=day.day_name(), month=day.month)
+
+    load_profile_array, appliances = ramp_run.run_use_cases_array(appliances_list)
+    timeseries = pd.date_range(days[0], periods=load_profile_array.shape[1], freq="Min")
+    _, peak_power_minute_max = ramp_run.calculate_peak_power_events_array(load_profile_array, appliances, timeseries,
+                                                                          pue_input)
+
+    return np.vstack([load_profile_array,
+                      load_profile_array.sum(axis=0),
+                      peak_power_minute_max['Total_peak_power'].to_numpy(dtype=np.float32)])
@@ -0,0 +1,164 @@
+import functools
+import json
+import os
+import sys
+import time
+
+
+class Span:
+    """
+    Timed section of a run -> records wall time, CPU time and peak RSS
+    - spans are nestable: a span opened inside another one is recorded as its child
+    - repeated spans with the same name and parent are merged (count and summed times, e.g. one span per day)
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_rss_mb = None
+        self.children = {}  # name: Span
+
+    def child(self, name):
+        if name not in self.children:
+            self.children[name] = Span(name)
+        return self.children[name]
+
+    def to_dict(self):
+        """
+        :return: dict of this span and its children (json serializable)
+        """
+
+        span_dict = {
+            'name': self.name,
+            'count': self.count,
+            'wall_s': round(self.wall_s, 6),
+            'cpu_s': round(self.cpu_s, 6),
+            'peak_rss_mb': self.peak_rss_mb
+        }
+        if self.children:
+            span_dict['children'] = [child.to_dict() for child in self.children.values()]
+
+        return span_dict
+
+
+# Root of all spans of this process and stack of the currently open spans
+_root = Span('root')
+_stack = [_root]
+
+
+class span:
+    """
+    Context manager and decorator recording a span
+    with instrumentation.span('solve'):
+        ...
+
+    @instrumentation.span('OemofModel.build_energysystem')
+    def build_energysystem(self):
+        ...
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.span = _stack[-1].child(self.name)
+        _stack.append(self.span)
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self.span
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.span.count += 1
+        self.span.wall_s += time.perf_counter() - self.wall_start
+        self.span.cpu_s += time.process_time() - self.cpu_start
+        self.span.peak_rss_mb = peak_rss_mb()
+        _stack.pop()
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(self.name):
+                return function(*args, **kwargs)
+        return wrapper
+
+
+def peak_rss_mb():
+    """
+    :return: peak resident set size of this process so far in MB (None if not available on this platform)
+    """
+
+    try:
+        import resource
+    except ImportError:     # Windows
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kB on Linux and in bytes on macOS
+    return round(peak / 1024**2 if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def timings():
+    """
+    :return: list of dicts of all recorded top level spans (with their children)
+    """
+
+    return [child.to_dict() for child in _root.children.values()]
+
+
+def add_timings(span_dicts):
+    """
+    Add spans recorded in another process (see timings) as children of the currently open span
+    -> spans with the same name and parent are merged (peak RSS is the maximum of the processes)
+    :param span_dicts: list of dicts of spans (see Span.to_dict)
+    :return:
+    """
+
+    def add(parent, span_dict):
+        child = parent.child(span_dict['name'])
+        child.count += span_dict['count']
+        child.wall_s += span_dict['wall_s']
+        child.cpu_s += span_dict['cpu_s']
+        peak_rss = [rss for rss in [child.peak_rss_mb, span_dict['peak_rss_mb']] if rss is not None]
+        child.peak_rss_mb = max(peak_rss) if peak_rss else None
+        for grandchild_dict in span_dict.get('children', []):
+            add(child, grandchild_dict)
+
+    for span_dict in span_dicts:
+        add(_stack[-1], span_dict)
+
+
+def reset():
+    """
+    Discard all recorded spans
+    :return:
+    """
+
+    global _root, _stack
+    _root = Span('root')
+    _stack = [_root]
+
+
+def write_timings(cache_dir_path, key):
+    """
+    Save recorded spans to timings.json in a run's cache folder
+    -> timings of several scripts using the same run folder are kept under their own key
+    :param cache_dir_path: path of the run's cache folder (e.g. ./data_cache/run_name/)
+    :param key: key of this script's timings (e.g. 'ramp', 'oemof')
+    :return: path of timings.json
+    """
+
+    file_path = os.path.join(cache_dir_path, 'timings.json')
+
+    all_timings = {}
+    if os.path.exists(file_path):
+        with open(file_path) as file:
+            all_timings = json.load(file)
+
+    all_timings[key] = timings()
+
+    with open(file_path, "w+") as file:
+        json.dump(all_timings, file, indent=2)
+
+    return file_path
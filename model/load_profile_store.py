@@ -0,0 +1,304 @@
+import os
+import json
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+INDEX_COLUMN = 'timestamp'   # column the time index is stored in
+ROW_GROUP_SIZE = 24 * 60    # rows per row group (one day of 1 min data) -> date range reads skip other days
+PYRAMID_RESOLUTIONS = ['15min', '1h', '1d']  # resolutions of the precomputed aggregates
+PYRAMID_STATISTICS = ['mean', 'max', 'std']  # statistics of the minute values within every period
+
+
+def write_load_profiles(load_profiles, file):
+    """
+    Save load profiles in columnar Parquet format
+    - values are stored as float32 columns, the time index as timestamp column
+    - one row group per day of 1 min data -> columns and date ranges can be read without reading the whole file
+    :param load_profiles: df of load profiles (time index, one column per profile)
+    :param file: path of the parquet file
+    :return:
+    """
+
+    pq.write_table(load_profiles_table(load_profiles), file, row_group_size=ROW_GROUP_SIZE)
+
+
+def load_profiles_table(load_profiles):
+    """
+    :param load_profiles: df of load profiles (time index, one column per profile)
+    :return: pyarrow table with timestamp column and float32 columns (as stored by write_load_profiles)
+    """
+
+    return pa.table(
+        [pa.array(load_profiles.index.to_numpy())] +
+        [pa.array(load_profiles[column].to_numpy(dtype=np.float32)) for column in load_profiles.columns],
+        names=[INDEX_COLUMN] + [str(column) for column in load_profiles.columns])
+
+
+class LoadProfileSink:
+    """
+    Append blocks of load profiles to a parquet file (and its aggregate pyramid) as they are generated
+    -> only one block is held in memory, files are the same as written by write_load_profiles and
+       write_aggregate_pyramid
+    -> blocks must consist of whole days (aggregates of a period are calculated within one block)
+    with LoadProfileSink(file) as sink:
+        for load_profiles in blocks:
+            sink.append(load_profiles)
+    """
+
+    def __init__(self, file, pyramid=True):
+        """
+        :param file: path of the 1 min parquet file
+        :param pyramid: if True, the aggregates of every block are appended to the aggregate pyramid files
+        """
+
+        self.file = file
+        self.pyramid = pyramid
+        self.writers = {}  # resolution: ParquetWriter ('1min' -> file)
+        self.aggregate_files = {}  # resolution: path of aggregate file
+
+    def append(self, load_profiles):
+        """
+        :param load_profiles: df of 1 min load profiles of one block of days
+        :return:
+        """
+
+        self._write('1min', self.file, load_profiles)
+
+        if self.pyramid:
+            for resolution in PYRAMID_RESOLUTIONS:
+                aggregates = load_profiles.resample(resolution).agg(PYRAMID_STATISTICS)
+                aggregates.columns = [str(column) + '__' + statistic for column, statistic in aggregates.columns]
+
+                self.aggregate_files[resolution] = aggregate_file(self.file, resolution)
+                self._write(resolution, self.aggregate_files[resolution], aggregates)
+
+    def _write(self, resolution, file, load_profiles):
+        table = load_profiles_table(load_profiles)
+        if resolution not in self.writers:
+            self.writers[resolution] = pq.ParquetWriter(file, table.schema)
+        self.writers[resolution].write_table(table, row_group_size=ROW_GROUP_SIZE)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_load_profiles(file, columns=None, start=None, end=None):
+    """
+    Read load profiles saved with write_load_profiles (CSV files of old run caches are read as well)
+    :param file: path of the parquet (or CSV) file
+    :param columns: list of columns to read (None -> all)
+    :param start: first timestamp to read (None -> from the beginning)
+    :param end: last timestamp to read, inclusive (None -> until the end)
+    :return: df of load profiles with time index
+    """
+
+    if file.endswith('.csv'):
+        load_profiles = pd.read_csv(file, index_col=0, parse_dates=True)
+        if columns is not None:
+            load_profiles = load_profiles[columns]
+        return load_profiles.loc[start:end]
+
+    # Only read row groups overlapping the date range
+    filters = []
+    if start is not None:
+        filters.append((INDEX_COLUMN, '>=', pd.Timestamp(start)))
+    if end is not None:
+        filters.append((INDEX_COLUMN, '<=', pd.Timestamp(end)))
+
+    if columns is not None:
+        columns = [INDEX_COLUMN] + list(columns)
+
+    table = pq.read_table(file, columns=columns, filters=filters or None)
+
+    load_profiles = table.to_pandas().set_index(INDEX_COLUMN)
+    load_profiles.index.name = None
+
+    return load_profiles
+
+
+def load_profile_columns(file):
+    """
+    Get names of the load profiles stored in a file without reading it
+    :param file: path of the parquet file
+    :return: list of column names
+    """
+
+    return [name for name in pq.read_schema(file).names if name != INDEX_COLUMN]
+
+
+def convert_csv_cache(cache_dir_path):
+    """
+    Convert all CSV load profiles of a run cache to parquet (with aggregate pyramid) and update
+    scenarios_information.json (CSV files are kept)
+    :param cache_dir_path: path of the run's cache folder (e.g. ./data_cache/run_name/)
+    :return: dict {CSV file: parquet file} of converted files
+    """
+
+    converted = {}
+    for file_name in sorted(os.listdir(cache_dir_path)):
+        if not (file_name.startswith('load_profile_scenario_') or file_name.startswith('ensemble_scenario_')):
+            continue
+        if not file_name.endswith('.csv'):
+            continue
+
+        csv_file = os.path.join(cache_dir_path, file_name)
+        parquet_file = csv_file[:-len('.csv')] + '.parquet'
+        print('Converting ' + csv_file)
+        load_profiles = pd.read_csv(csv_file, index_col=0, parse_dates=True)
+        write_load_profiles(load_profiles, parquet_file)
+        if file_name.startswith('load_profile_scenario_'):
+            write_aggregate_pyramid(load_profiles, parquet_file)
+        converted[csv_file] = parquet_file
+
+    # Point scenario information to the parquet files
+    info_file = os.path.join(cache_dir_path, 'scenarios_information.json')
+    if os.path.exists(info_file):
+        with open(info_file) as file:
+            scenarios_information = json.load(file)
+
+        converted_names = {os.path.basename(csv): os.path.basename(parquet) for csv, parquet in converted.items()}
+        for scenario in scenarios_information.values():
+            for key, value in scenario.items():
+                if isinstance(value, str) and os.path.basename(value) in converted_names:
+                    scenario[key] = value[:-len('.csv')] + '.parquet'
+                elif isinstance(value, dict):   # e.g. ensemble files
+                    for name, path in value.items():
+                        if isinstance(path, str) and os.path.basename(path) in converted_names:
+                            value[name] = path[:-len('.csv')] + '.parquet'
+
+        with open(info_file, "w+") as file:
+            json.dump(scenarios_information, file)
+
+    return converted
+
+
+def aggregate_file(file, resolution):
+    """
+    Get path of an aggregate file of a load profile file
+    :param file: path of the 1 min parquet file (e.g. ./data_cache/run/load_profile_scenario_a.parquet)
+    :param resolution: resolution of the aggregate (e.g. '1h')
+    :return: path (e.g. ./data_cache/run/load_profile_scenario_a_1h.parquet)
+    """
+
+    return file[:-len('.parquet')] + '_' + resolution + '.parquet'
+
+
+def write_aggregate_pyramid(load_profiles, file):
+    """
+    Save mean, max and std of all load profiles at every resolution of the aggregate pyramid next to the 1 min file
+    -> columns are named <profile>__<statistic> (e.g. total__mean)
+    :param load_profiles: df of 1 min load profiles
+    :param file: path of the 1 min parquet file
+    :return: dict {resolution: path of aggregate file}
+    """
+
+    files = {}
+    for resolution in PYRAMID_RESOLUTIONS:
+        aggregates = load_profiles.resample(resolution).agg(PYRAMID_STATISTICS)
+        aggregates.columns = [str(column) + '__' + statistic for column, statistic in aggregates.columns]
+
+        files[resolution] = aggregate_file(file, resolution)
+        write_load_profiles(aggregates, files[resolution])
+
+    return files
+
+
+def closest_resolution(freq, file=None):
+    """
+    Find the coarsest stored resolution the requested freq can be exactly aggregated from
+    :param freq: requested frequency (e.g. '1h', '2h', '30min')
+    :param file: path of the 1 min parquet file -> only resolutions with existing aggregate file are considered
+    (None -> all pyramid resolutions)
+    :return: resolution (e.g. '1h') or '1min' if freq is finer than every aggregate
+    """
+
+    try:
+        freq = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+    except ValueError:
+        # Calendar frequencies (weeks, months, ...) consist of whole days
+        freq = None
+
+    resolution = '1min'
+    for candidate in PYRAMID_RESOLUTIONS:
+        if file is not None and not os.path.exists(aggregate_file(file, candidate)):
+            continue
+        candidate_length = pd.Timedelta(candidate)
+        if freq is None or (candidate_length <= freq and freq % candidate_length == pd.Timedelta(0)):
+            resolution = candidate
+
+    return resolution
+
+
+def read_resampled_load_profiles(file, freq, statistics, start=None, end=None):
+    """
+    Read load profiles at the requested frequency from the closest stored resolution of the aggregate pyramid
+    (1 min data is only read if freq is finer than every aggregate)
+    :param file: path of the 1 min parquet file
+    :param freq: requested frequency (e.g. '1h')
+    :param statistics: dict {column: statistic ('mean', 'max' or 'std')} of the profiles to read
+    :param start: first timestamp to read (None -> from the beginning)
+    :param end: last timestamp to read, inclusive (None -> until the end)
+    :return: df of the requested profiles at freq
+    """
+
+    resolution = closest_resolution(freq, file)
+
+    if resolution == '1min':
+        load_profiles = read_load_profiles(file, columns=list(statistics), start=start, end=end)
+        return load_profiles.resample(freq).agg(statistics)
+
+    columns = [column + '__' + statistic for column, statistic in statistics.items()]
+    if 'std' in statistics.values():
+        # Pooled std also needs the mean of every period
+        columns += [column + '__mean' for column, statistic in statistics.items() if statistic == 'std']
+    aggregates = read_load_profiles(aggregate_file(file, resolution), columns=list(dict.fromkeys(columns)),
+                                    start=start, end=end)
+
+    if pd.tseries.frequencies.to_offset(resolution) == pd.tseries.frequencies.to_offset(freq):
+        return pd.DataFrame({column: aggregates[column + '__' + statistic]
+                             for column, statistic in statistics.items()})
+
+    resampled = {}
+    for column, statistic in statistics.items():
+        if statistic == 'std':
+            resampled[column] = pooled_std(aggregates[column + '__mean'], aggregates[column + '__std'],
+                                           period_length=pd.Timedelta(resolution) // pd.Timedelta('1min'), freq=freq)
+        else:
+            # mean of equally long periods' means and max of maxima are exact
+            resampled[column] = aggregates[column + '__' + statistic].resample(freq).agg(statistic)
+
+    return pd.DataFrame(resampled)
+
+
+def pooled_std(means, stds, period_length, freq):
+    """
+    Combine std of equally long periods to std of longer periods
+    :param means: series of period means
+    :param stds: series of period std (ddof=1)
+    :param period_length: number of values per period
+    :param freq: frequency of the longer periods
+    :return: series of std (ddof=1) of the longer periods
+    """
+
+    # population variance of every period
+    variances = stds.astype(float) ** 2 * (period_length - 1) / period_length
+    means = means.astype(float)
+
+    periods_nr = means.resample(freq).count()
+    # population variance = mean of period variances + variance of period means
+    combined = variances.resample(freq).mean() + (means ** 2).resample(freq).mean() - means.resample(freq).mean() ** 2
+    values_nr = periods_nr * period_length
+
+    return np.sqrt((combined * values_nr / (values_nr - 1)).clip(lower=0))
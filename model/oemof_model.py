@@ -7,10 +7,17 @@ from oemof.tools import economics
 
 import plotting
 from plotly.subplots import make_subplots
+from model import instrumentation, time_aggregation
+
+
+# Flows of the load left unsupplied beyond the limits of unsupplied demand (only with fixed capacities)
+UNSUPPLIED_EXCESS_FLOWS = ['unsupplied_excess_pue_demand_l - bus_ac_pue_l',
+                           'unsupplied_excess_household_demand_l - bus_ac_household_l']
 
 
 class OemofModel:
 
+    @instrumentation.span('OemofModel.__init__')
     def __init__(self, pue_load_profile,
                  household_baseload,
                  peak_power_profile,
@@ -23,10 +30,39 @@ class OemofModel:
                  pv_south_exists=True,
                  pv_east_west_exists=False,
                  pv_east_ts=None,
-                 pv_west_ts=None
+                 pv_west_ts=None,
+                 typical_periods=None,
+                 period_length='1D',
+                 capacities=None
                  ):
+        """
+        :param pue_load_profile: series of the pue load (any resolution, resampled to freq)
+        :param household_baseload: series of the household baseload
+        :param peak_power_profile: series of the peak power (max within every timestep)
+        :param system_data: dict of tables of the oemof input workbook (see InputData.get_all_tables)
+        :param pv_gen_ts: series of PV generation per kWp
+        :param freq: frequency of the model
+        :param peak_power_model: if True, the peak power demand is modelled (see build_energysystem)
+        :param pue_load_exists:
+        :param household_baseload_exists:
+        :param pv_south_exists:
+        :param pv_east_west_exists:
+        :param pv_east_ts:
+        :param pv_west_ts:
+        :param typical_periods: number of typical periods the timeseries are aggregated to (None -> full timeseries)
+        -> the energy system is built on the typical periods and the peak periods (see time_aggregation.TypicalPeriods),
+           results are mapped back to the full timeseries
+        :param period_length: length of the typical periods (e.g. '1D' or '7D')
+        :param capacities: dict of fixed total capacities {component: capacity} (None -> capacities are optimised)
+        -> e.g. results_components_capacities.loc['capacity_total'] of a sizing run (+ 'genset' if a genset exists)
+        -> only the dispatch is optimised (see solve_rolling_horizon for high resolution timeseries)
+        """
+
+        if typical_periods is not None and capacities is not None:
+            raise ValueError('Typical periods are only used for sizing, not with fixed capacities')
 
         self.peak_power_model = peak_power_model
+        self.capacities = capacities
 
         # Resample input timeseries
         household_baseload = household_baseload.resample(freq).mean()
@@ -86,10 +122,23 @@ class OemofModel:
         # set timeseries index frequency (needed for oemof)
         self.timeseries.index.freq = freq
 
+        # Aggregate timeseries into typical periods -> self.timeseries only contains the typical periods
+        self.typical_periods = None
+        if typical_periods is not None:
+            self.full_timeseries = self.timeseries
+            self.typical_periods = time_aggregation.TypicalPeriods(
+                self.timeseries, typical_periods, period_length=period_length,
+                # keep peak load periods and the period with the lowest PV generation
+                extreme_periods={'pue_load': 'max', 'household_baseload': 'max', 'peak_power': 'max', 'pv': 'min_sum'})
+            self.timeseries = self.typical_periods.timeseries
+            print('timeseries aggregated to ' + str(len(self.typical_periods.representatives)) + ' typical periods')
+
         # Create energy system object
-        self.energysystem = solph.EnergySystem(timeindex=self.timeseries.index, infer_last_interval=False)
-        # Create solph model object for customs constraints
-        self.om = solph.Model(self.energysystem)
+        # -> with typical periods the last interval is inferred: every (weighted) step of the typical periods is modelled
+        self.energysystem = solph.EnergySystem(timeindex=self.timeseries.index,
+                                               infer_last_interval=self.typical_periods is not None)
+        # solph model object -> created with the components in build_energysystem
+        self.om = None
 
         # Get user input data
         self.general_data = system_data['general_data']['dct']
@@ -118,16 +167,13 @@ class OemofModel:
         else:
             total_load = pue_load_profile + household_baseload[pue_load_profile.index]
 
-        # Energy [kWh] that can be left unsupplied
-        # = Total energy demand in kWh multiplied with unsupplied_total_demand fraction
-        self.unsupplied_total_demand = total_load.resample('1h').mean().sum() \
-                                       * self.general_data['unsupplied_total_demand']
-
-        self.unsupplied_pue_demand = pue_load_profile.resample('1h').mean().sum() \
-                                     * self.general_data['unsupplied_pue_demand']
-
-        self.unsupplied_household_demand = pue_load_profile.resample('1h').mean().sum() \
-                                           * self.general_data['unsupplied_household_demand']
+        # Energy demand [kWh] the fractions of unsupplied demand refer to
+        self.energy_demand = {
+            'total': total_load.resample('1h').mean().sum(),
+            'pue': pue_load_profile.resample('1h').mean().sum(),
+            'household': household_baseload[pue_load_profile.index].resample('1h').mean().sum()
+        }
+        self.calc_unsupplied_demand()
 
         # Variables for results
         self.results_oemof = None  # oemof results output
@@ -135,6 +181,7 @@ class OemofModel:
         self.results_components_costs = None  # individual components' cost results
         self.results_system = None  # overall system results (KPIs: LCOE, energy delivered, capital cost, OPEX...)
         self.results_ac_flows = pd.DataFrame()  # AC flows in the system
+        self.results_battery_content = None  # battery content of the full timeseries (typical periods, rolling horizon)
 
     def calc_components_costs(self):
         """
@@ -163,7 +210,62 @@ class OemofModel:
 
         return components_costs
 
-    def build_energysystem(self):
+    def calc_unsupplied_demand(self):
+        """
+        Energy [kWh] that can be left unsupplied
+        = energy demand in kWh multiplied with the unsupplied demand fraction of general_data
+        -> unsupplied_total_demand, unsupplied_pue_demand, unsupplied_household_demand
+        """
+
+        self.unsupplied_total_demand = self.energy_demand['total'] * self.general_data['unsupplied_total_demand']
+        self.unsupplied_pue_demand = self.energy_demand['pue'] * self.general_data['unsupplied_pue_demand']
+        self.unsupplied_household_demand = (self.energy_demand['household']
+                                            * self.general_data['unsupplied_household_demand'])
+
+    def capacity_kwargs(self, component, nominal_key='nominal_value'):
+        """
+        Capacity of a component's flow or storage
+        :param component: name of the component (see components_data)
+        :param nominal_key: keyword of the fixed capacity ('nominal_value' for flows, 'nominal_storage_capacity')
+        :return: dict of keyword arguments -> fixed capacity (see capacities) or investment of the component
+        """
+
+        if self.capacities is not None:
+            return {nominal_key: self.capacities[component]}
+
+        return {'investment': solph.Investment(ep_costs=self.components_specific_costs[component]['capital_cost'],
+                                               existing=self.components_data[component]['existing_capacity'])}
+
+    @instrumentation.span('OemofModel.build_energysystem')
+    def build_energysystem(self, timeseries=None, initial_battery_content=None, unsupplied_demand=None):
+        """
+        Create the energysystem's components and the solph model (self.om)
+        :param timeseries: part of the model timeseries to build the energysystem for, e.g. a window of the rolling
+        horizon (None -> self.timeseries in self.energysystem)
+        -> a new self.energysystem is created for this part
+        :param initial_battery_content: battery content at the first timestep in kWh (None -> optimised)
+        :param unsupplied_demand: dict of energy [kWh] that can be left unsupplied {'total': ..., 'pue': ...,
+        'household': ...} (None -> unsupplied demand of the full timeseries)
+        """
+
+        if timeseries is None:
+            timeseries = self.timeseries
+        else:
+            # every step of the part is modelled -> parts can be stitched without gaps
+            self.energysystem = solph.EnergySystem(timeindex=timeseries.index, infer_last_interval=True)
+
+        if unsupplied_demand is None:
+            unsupplied_demand = {'total': self.unsupplied_total_demand,
+                                 'pue': self.unsupplied_pue_demand,
+                                 'household': self.unsupplied_household_demand}
+
+        # Initial battery level within the battery's state of charge limits (None -> optimised)
+        initial_battery_level = None
+        if initial_battery_content is not None and self.capacities['battery_capacity'] > 0:
+            initial_battery_level = min(max(initial_battery_content / self.capacities['battery_capacity'],
+                                            self.components_data['battery_capacity']['min_soc']),
+                                        self.components_data['battery_capacity']['max_soc'])
+
         #  --- Create buses ---
         # AC grid bus
         bus_ac = solph.buses.Bus(label='bus_ac_l')
@@ -202,7 +304,7 @@ class OemofModel:
             # create sink object representing the pue load
             pue_load = solph.components.Sink(label='pue_load_l',
                                              inputs={bus_ac_pue: solph.flows.Flow(
-                                                 fix=self.timeseries['pue_load'],
+                                                 fix=timeseries['pue_load'],
                                                  nominal_value=self.pue_load_nominal)})
             loads_list.append(pue_load)
 
@@ -210,7 +312,7 @@ class OemofModel:
             # create sink object representing the household baseload
             household_baseload = solph.components.Sink(label='household_baseload_l',
                                                        inputs={bus_ac_household: solph.flows.Flow(
-                                                           fix=self.timeseries['household_baseload'],
+                                                           fix=timeseries['household_baseload'],
                                                            nominal_value=self.household_baseload_nominal)})
             loads_list.append(household_baseload)
 
@@ -220,41 +322,21 @@ class OemofModel:
         # create fixed source for PV systems
         if self.pv_south_exists:
             pv = solph.components.Source(label='pv_l',
-                                         outputs={bus_ac: solph.flows.Flow(fix=self.timeseries['pv'],
+                                         outputs={bus_ac: solph.flows.Flow(fix=timeseries['pv'],
                                                                            variable_costs=0,
-                                                                           investment=solph.Investment(
-                                                                               ep_costs=
-                                                                               self.components_specific_costs['pv'][
-                                                                                   'capital_cost'],
-                                                                               existing=self.components_data['pv'][
-                                                                                   'existing_capacity']
-                                                                           ))})
+                                                                           **self.capacity_kwargs('pv'))})
             self.energysystem.add(pv)
 
         if self.pv_east_west_exists:
             pv_west = solph.components.Source(label='pv_west_l',
-                                              outputs={bus_ac: solph.flows.Flow(fix=self.timeseries['pv_west'],
+                                              outputs={bus_ac: solph.flows.Flow(fix=timeseries['pv_west'],
                                                                                 variable_costs=0,
-                                                                                investment=solph.Investment(
-                                                                                    ep_costs=
-                                                                                    self.components_specific_costs[
-                                                                                        'pv_west']['capital_cost'],
-                                                                                    existing=
-                                                                                    self.components_data['pv_west'][
-                                                                                        'existing_capacity']
-                                                                                ))})
+                                                                                **self.capacity_kwargs('pv_west'))})
 
             pv_east = solph.components.Source(label='pv_east_l',
-                                              outputs={bus_ac: solph.flows.Flow(fix=self.timeseries['pv_east'],
+                                              outputs={bus_ac: solph.flows.Flow(fix=timeseries['pv_east'],
                                                                                 variable_costs=0,
-                                                                                investment=solph.Investment(
-                                                                                    ep_costs=
-                                                                                    self.components_specific_costs[
-                                                                                        'pv_east']['capital_cost'],
-                                                                                    existing=
-                                                                                    self.components_data['pv_east'][
-                                                                                        'existing_capacity']
-                                                                                ))})
+                                                                                **self.capacity_kwargs('pv_east'))})
             self.energysystem.add(pv_west, pv_east)
 
         # --- Battery storage ---
@@ -265,7 +347,7 @@ class OemofModel:
                                                           'variable_opex']
                                                   )},
                                                   loss_rate=self.components_data['battery_capacity']['loss'],
-                                                  initial_storage_level=None,
+                                                  initial_storage_level=initial_battery_level,
                                                   balanced=False,
                                                   min_storage_level=self.components_data['battery_capacity']['min_soc'],
                                                   max_storage_level = self.components_data['battery_capacity']['max_soc'],
@@ -278,24 +360,15 @@ class OemofModel:
                                                   outflow_conversion_factor=self.components_data['battery_capacity'][
                                                       'efficiency'],
 
-                                                  investment=solph.Investment(
-                                                      ep_costs=self.components_specific_costs['battery_capacity'][
-                                                          'capital_cost'],
-                                                      existing=self.components_data['battery_capacity'][
-                                                          'existing_capacity']
-                                                  ))
+                                                  **self.capacity_kwargs('battery_capacity',
+                                                                         nominal_key='nominal_storage_capacity'))
 
         # Converter object representing battery inverter
         battery_inverter = solph.components.Converter(label='battery_inverter_l',
                                                       inputs={bus_bat_dc: solph.flows.Flow(bidirectional=True)},
                                                       outputs={bus_ac:
-                                                          solph.flows.Flow(investment=solph.Investment(
-                                                              ep_costs=
-                                                              self.components_specific_costs['battery_inverter'][
-                                                                  'capital_cost'],
-                                                              existing=self.components_data['battery_inverter'][
-                                                                  'existing_capacity']),
-                                                              bidirectional=True)},
+                                                          solph.flows.Flow(**self.capacity_kwargs('battery_inverter'),
+                                                                           bidirectional=True)},
                                                       conversion_factors={
                                                           bus_ac: self.components_data['battery_inverter'][
                                                               'efficiency']})
@@ -307,41 +380,68 @@ class OemofModel:
         bus_unsupplied_demand = solph.buses.Bus(label='bus_unsupplied_demand')
         self.energysystem.add(bus_unsupplied_demand)
 
-        if self.unsupplied_total_demand != 0:
+        # Unsupplied energy is limited over the full timeseries
+        # -> with typical periods, outflows count as often as their typical period is represented
+        if self.typical_periods is None:
+            unsupplied_outflow_conversion = 1
+        else:
+            unsupplied_outflow_conversion = list(1 / self.typical_periods.timestep_weights)
+
+        if unsupplied_demand['total'] != 0:
             # Generic Storage block representing unsupplied total demand
             unsupplied_total_demand = solph.components.GenericStorage(label='unsupplied_total_demand_l',
-                                                                      nominal_storage_capacity=self.unsupplied_total_demand,
+                                                                      nominal_storage_capacity=unsupplied_demand['total'],
                                                                       inputs={
                                                                           bus_unsupplied_demand: solph.flows.Flow()},
                                                                       outputs={
                                                                           bus_ac: solph.flows.Flow(variable_costs=0.1)},
+                                                                      outflow_conversion_factor=unsupplied_outflow_conversion,
                                                                       initial_storage_level=1,
                                                                       balanced=False)
             self.energysystem.add(unsupplied_total_demand)
 
-        if self.unsupplied_pue_demand != 0:
+        if unsupplied_demand['pue'] != 0:
             # Generic Storage block representing unsupplied pue demand
             unsupplied_pue_demand = solph.components.GenericStorage(label='unsupplied_pue_demand_l',
-                                                                    nominal_storage_capacity=self.unsupplied_pue_demand,
+                                                                    nominal_storage_capacity=unsupplied_demand['pue'],
                                                                     inputs={bus_unsupplied_demand: solph.flows.Flow()},
                                                                     outputs={bus_ac_pue: solph.flows.Flow(
                                                                         variable_costs=0.1)},
+                                                                    outflow_conversion_factor=unsupplied_outflow_conversion,
                                                                     initial_storage_level=1,
                                                                     balanced=False)
             self.energysystem.add(unsupplied_pue_demand)
 
-        if self.unsupplied_household_demand != 0:
+        if unsupplied_demand['household'] != 0:
             # Generic Storage block representing unsupplied pue demand
             unsupplied_household_demand = solph.components.GenericStorage(label='unsupplied_household_demand_l',
-                                                                          nominal_storage_capacity=self.unsupplied_household_demand,
+                                                                          nominal_storage_capacity=unsupplied_demand['household'],
                                                                           inputs={
                                                                               bus_unsupplied_demand: solph.flows.Flow()},
                                                                           outputs={bus_ac_household: solph.flows.Flow(
                                                                               variable_costs=0.1)},
+                                                                          outflow_conversion_factor=unsupplied_outflow_conversion,
                                                                           initial_storage_level=1,
                                                                           balanced=False)
             self.energysystem.add(unsupplied_household_demand)
 
+        if self.capacities is not None:
+            # Fixed capacities may not supply every load without perfect foresight (e.g. a rolling horizon window after
+            # the unsupplied energy is used up) -> load left unsupplied beyond the limits at a penalty keeps the
+            # dispatch feasible
+            # -> fed into the load buses: not counted as energy delivered through the AC bus
+            if self.pue_load_exists:
+                unsupplied_excess_pue_demand = solph.components.Source(label='unsupplied_excess_pue_demand_l',
+                                                                       outputs={bus_ac_pue: solph.flows.Flow(
+                                                                           variable_costs=1000)})  # penalty >> 0.1
+                self.energysystem.add(unsupplied_excess_pue_demand)
+
+            if self.household_baseload_exists:
+                unsupplied_excess_household_demand = solph.components.Source(
+                    label='unsupplied_excess_household_demand_l',
+                    outputs={bus_ac_household: solph.flows.Flow(variable_costs=1000)})  # penalty >> 0.1
+                self.energysystem.add(unsupplied_excess_household_demand)
+
         # --- Genset ---
         if self.components_data['genset']['exists'] != 0:
             # Create fuel bus
@@ -353,23 +453,39 @@ class OemofModel:
                                                       summed_max=1)
                                                   })
 
+            if self.capacities is None:
+                genset_capacity = {'investment': solph.Investment(
+                    ep_costs=self.components_specific_costs['genset']['capital_cost'])}
+            else:
+                genset_capacity = {'nominal_value': self.capacities['genset']}
+
             # create converter representing genset
             genset = solph.components.Converter(label='genset_l',
                                                 inputs={bus_fuel: solph.flows.Flow(
                                                     variable_costs=self.components_specific_costs['genset'][
                                                         'variable_opex'])},
-                                                outputs={bus_ac: solph.flows.Flow(
-                                                    investment=solph.Investment(
-                                                        ep_costs=self.components_specific_costs['genset'][
-                                                            'capital_cost']
-                                                    ))
-                                                },
+                                                outputs={bus_ac: solph.flows.Flow(**genset_capacity)},
                                                 conversion_factors={
                                                     bus_ac: self.components_data['genset']['efficiency']}, )
             self.energysystem.add(bus_fuel, fuel_source, genset)
 
         # ------------- Add peak power model ------------
         if self.peak_power_model:
+            # Peak power of the battery inverter and storage -> linked to their capacities (see custom constraints)
+            if self.capacities is None:
+                peak_battery_inverter_capacity = {'investment': solph.Investment(
+                    ep_costs=1  # Cost can be dummy value -> as long as larger 0 it will be minimized
+                )}
+                peak_battery_storage_capacity = {'investment': solph.Investment(
+                    ep_costs=1  # Cost can be dummy value -> as long as larger 0 it will be minimized
+                )}
+            else:
+                peak_battery_inverter_capacity = {'nominal_value': self.capacities['battery_inverter']
+                                                  * self.components_data['battery_inverter']['peak_power_ratio']}
+                peak_battery_storage_capacity = {'nominal_value': self.capacities['battery_capacity']
+                                                 * self.components_data['battery_capacity']['c-rate']
+                                                 * self.components_data['battery_capacity']['peak_power_ratio']}
+
             # -- Buses ---
             peak_ac_bus = solph.buses.Bus(label='peak_ac_bus_l')
             peak_dc_bus = solph.buses.Bus(label='peak_dc_bus_l')
@@ -384,24 +500,14 @@ class OemofModel:
             peak_battery_inverter = solph.components.Converter(
                 label='peak_battery_inverter_l',
                 inputs={peak_dc_bus: solph.flows.Flow(bidirectional=True)},
-                outputs={peak_ac_bus: solph.flows.Flow(
-                    investment=solph.Investment(
-                        ep_costs=1  # Cost can be dummy value -> as long as larger 0 it will be minimized
-                    ),
-                    bidirectional=True
-                )}
+                outputs={peak_ac_bus: solph.flows.Flow(**peak_battery_inverter_capacity, bidirectional=True)}
             )
 
             # Converter representing peak power of battery storage -> to be linked to battery storage capacity
             peak_battery_storage = solph.components.Converter(
                 label='peak_battery_storage_l',
                 inputs={peak_dc_battery_storage_bus: solph.flows.Flow(bidirectional=True)},
-                outputs={peak_dc_bus: solph.flows.Flow(
-                    investment=solph.Investment(
-                        ep_costs=1  # Cost can be dummy value -> as long as larger 0 it will be minimized
-                    ),
-                    bidirectional=True
-                )}
+                outputs={peak_dc_bus: solph.flows.Flow(**peak_battery_storage_capacity, bidirectional=True)}
             )
 
             self.energysystem.add(peak_battery_inverter, peak_battery_storage)
@@ -411,7 +517,7 @@ class OemofModel:
             # Electricity peaks demand -> timeseries
             ac_peak_demand = solph.components.Sink(label='ac_peak_demand_l',
                                                    inputs={peak_ac_bus: solph.flows.Flow(
-                                                       fix=self.timeseries['peak_power'],
+                                                       fix=timeseries['peak_power'],
                                                        nominal_value=self.peak_power_nominal)})
 
             # Sink representing battery inverter electricity base load
@@ -433,7 +539,13 @@ class OemofModel:
 
         print('initialise the operational model')
         # initialise the operational model
-        self.om = solph.Model(self.energysystem)
+        if self.typical_periods is None:
+            self.om = solph.Model(self.energysystem)
+        else:
+            # Timesteps weighted with the number of periods their typical period represents, battery content linked
+            # over the full sequence of periods
+            self.om = solph.Model(self.energysystem, objective_weighting=self.typical_periods.objective_weighting())
+            time_aggregation.add_inter_period_storage_constraints(self.om, battery, self.typical_periods)
 
         # --- Add custom constraints ---
         # https://oemof-solph.readthedocs.io/en/latest/reference/oemof.solph.constraints.html
@@ -448,34 +560,132 @@ class OemofModel:
                 name='battery_inverter_base_load_flow_link'
             )
 
-            # -- Equate battery inverter's nominal power to be at least P_peak/peak_power_factor
-            solph.constraints.equate_variables(
-                self.om,
-                self.om.InvestmentFlowBlock.invest[battery_inverter, bus_ac, 0],  # Nominal power bat inverter
-                self.om.InvestmentFlowBlock.invest[peak_battery_inverter, peak_ac_bus, 0],  # Peak power bat inverter
-                factor1=self.components_data['battery_inverter']['peak_power_ratio']
-            )
-
-            # -- Equate battery storage capacity to be at least 1/(C_rate * Peak_power_ratio)
-            solph.constraints.equate_variables(
-                self.om,
-                self.om.GenericInvestmentStorageBlock.invest[battery, 0],  # Battery capacity (var_1)
-                self.om.InvestmentFlowBlock.invest[peak_battery_storage, peak_dc_bus, 0],
-                # Peak power bat inverter (var_2)
-                factor1=self.components_data['battery_capacity']['c-rate'] * self.components_data['battery_capacity'][
-                    'peak_power_ratio']  # var_1 * factor1 = var_2
-            )
-
+            # Capacities are optimised -> peak power capacities are linked with the investments
+            if self.capacities is None:
+                # -- Equate battery inverter's nominal power to be at least P_peak/peak_power_factor
+                solph.constraints.equate_variables(
+                    self.om,
+                    self.om.InvestmentFlowBlock.invest[battery_inverter, bus_ac, 0],  # Nominal power bat inverter
+                    self.om.InvestmentFlowBlock.invest[peak_battery_inverter, peak_ac_bus, 0],  # Peak power bat inverter
+                    factor1=self.components_data['battery_inverter']['peak_power_ratio']
+                )
+
+                # -- Equate battery storage capacity to be at least 1/(C_rate * Peak_power_ratio)
+                solph.constraints.equate_variables(
+                    self.om,
+                    self.om.GenericInvestmentStorageBlock.invest[battery, 0],  # Battery capacity (var_1)
+                    self.om.InvestmentFlowBlock.invest[peak_battery_storage, peak_dc_bus, 0],
+                    # Peak power bat inverter (var_2)
+                    factor1=self.components_data['battery_capacity']['c-rate'] * self.components_data['battery_capacity'][
+                        'peak_power_ratio']  # var_1 * factor1 = var_2
+                )
+
+    @instrumentation.span('OemofModel.solve_energysystem')
     def solve_energysystem(self):
 
         print('solve model')
         # if tee_switch is true solver messages will be displayed
-        self.om.solve(solver='cbc')
+        with instrumentation.span('solve'):
+            self.om.solve(solver='cbc')
 
         print('extract results')
-        self.energysystem.results['main'] = solph.processing.results(self.om)
+        with instrumentation.span('solph.processing.results'):
+            self.energysystem.results['main'] = solph.processing.results(self.om)
         self.energysystem.dump('./mg_model/oemof_results/', filename='mg_model.oemof')
 
+    def solve(self, solver='cbc'):
+        """
+        Build and solve the energysystem and extract its results (see build_energysystem, extract_results)
+        :param solver: name of the solver
+        """
+
+        self.build_energysystem()  # Create energysystem's components and build system
+
+        print('solve model')
+        with instrumentation.span('solve'):
+            self.om.solve(solver=solver)  # Solve the model
+
+        # Process and save oemof results
+        print('process results')
+        with instrumentation.span('solph.processing.results'):
+            self.results_oemof = solph.processing.results(self.om)
+
+        # Extract and process oemof results
+        self.extract_results(self.results_oemof)
+
+    @instrumentation.span('OemofModel.solve_rolling_horizon')
+    def solve_rolling_horizon(self, horizon='1D', overlap='12h', solver='cbc'):
+        """
+        Optimise the dispatch of the fixed capacities (see capacities) window by window (rolling horizon)
+        -> every window covers horizon + overlap, only the horizon is kept and the next window starts at its end
+        -> battery content and the remaining energy that can be left unsupplied are carried from window to window
+        -> only one window is built and solved at a time: memory is bounded by the window size, not the timeseries
+        -> results_ac_flows, results_battery_content and the system results are stitched from the kept parts
+        :param horizon: length of the kept part of every window (e.g. '1D')
+        :param overlap: look-ahead after the horizon, solved but discarded (e.g. '12h', '0h' -> no look-ahead)
+        :param solver: name of the solver
+        """
+
+        if self.capacities is None:
+            raise ValueError('Rolling horizon dispatch requires fixed capacities')
+
+        timestep = pd.Timedelta(pd.tseries.frequencies.to_offset(self.timeseries.index.freq))
+        horizon_steps = int(pd.Timedelta(horizon) / timestep)
+        overlap_steps = int(pd.Timedelta(overlap) / timestep)
+        if horizon_steps < 1:
+            raise ValueError('Horizon ' + str(horizon) + ' is shorter than the model timestep')
+
+        # Energy [kWh] that can be left unsupplied in the remaining timeseries -> every window may use all of it,
+        # the energy left unsupplied in the kept part is deducted for the next windows
+        unsupplied_demand = {'total': self.unsupplied_total_demand,
+                             'pue': self.unsupplied_pue_demand,
+                             'household': self.unsupplied_household_demand}
+        unsupplied_flows = {'total': 'unsupplied_total_demand_l - bus_ac_l',
+                            'pue': 'unsupplied_pue_demand_l - bus_ac_pue_l',
+                            'household': 'unsupplied_household_demand_l - bus_ac_household_l'}
+
+        ac_flows = []
+        battery_content = []
+        initial_battery_content = None  # first window -> optimised
+        windows_starts = range(0, len(self.timeseries), horizon_steps)
+        for window_nr, start in enumerate(windows_starts):
+            kept_steps = min(horizon_steps, len(self.timeseries) - start)
+            window = self.timeseries.iloc[start:start + kept_steps + overlap_steps]
+            print('rolling horizon window ' + str(window_nr + 1) + '/' + str(len(windows_starts)))
+
+            with instrumentation.span('window'):
+                self.build_energysystem(timeseries=window, initial_battery_content=initial_battery_content,
+                                        unsupplied_demand=unsupplied_demand)
+
+                with instrumentation.span('solve'):
+                    self.om.solve(solver=solver)
+
+                with instrumentation.span('solph.processing.results'):
+                    results = solph.processing.convert_keys_to_strings(solph.processing.results(self.om),
+                                                                       keep_none_type=True)
+
+            # Keep the horizon of this window
+            window_ac_flows = self.ac_flows(results).iloc[:kept_steps]
+            window_battery_content = solph.views.node(results, 'battery_l')['sequences'][
+                (('battery_l', 'None'), 'storage_content')]
+            ac_flows.append(window_ac_flows)
+            battery_content.append(window_battery_content.iloc[:kept_steps])
+
+            # Carry battery content and remaining unsupplied energy to the next window
+            initial_battery_content = window_battery_content.iloc[kept_steps]
+            for demand, flow in unsupplied_flows.items():
+                if flow in window_ac_flows.columns:
+                    unsupplied = window_ac_flows[flow].sum() * timestep / pd.Timedelta('1h')
+                    unsupplied_demand[demand] = max(unsupplied_demand[demand] - unsupplied, 0)
+
+        # Stitch the windows' results
+        self.results_ac_flows = pd.concat(ac_flows)
+        self.results_battery_content = pd.concat(battery_content)
+        self.results_components_capacities = self.fixed_capacities_results()
+        self.calc_results_costs()
+        self.calc_results_system()
+
+    @instrumentation.span('OemofModel.extract_results')
     def extract_results(self, results, from_dump=False):
         """
         Process results from oemof solph
@@ -486,26 +696,40 @@ class OemofModel:
 
         results = solph.processing.convert_keys_to_strings(results, keep_none_type=True)
 
-        # Extract component results
-        results_pv = solph.views.node(results, 'pv_l')
-        results_battery = solph.views.node(results, 'battery_l')
-        results_battery_inverter = solph.views.node(results, 'battery_inverter_l')
-        results_battery_inverter_peak_power = solph.views.node(results, 'peak_battery_inverter_l')
+        # Collect components' capacities results (fixed capacities -> no investment results)
+        if self.capacities is not None:
+            self.results_components_capacities = self.fixed_capacities_results()
+        else:
+            self.results_components_capacities = self.invest_capacities_results(results)
 
-        if self.pv_east_west_exists:
-            results_pv_east = solph.views.node(results, 'pv_east_l')
-            results_pv_west = solph.views.node(results, 'pv_west_l')
+        self.calc_results_costs()
 
-        if self.components_data['genset']['exists'] != 0:
-            results_genset = solph.views.node(results, 'genset_l')
+        def sequences(view):
+            # Typical periods -> map sequences back to the full timeseries
+            if self.typical_periods is None:
+                return view['sequences']
+            return self.typical_periods.expand(view['sequences'])
 
-        # Extract bus results
-        results_ac_bus = solph.views.node(results, 'bus_ac_l')
-        results_ac_pue_bus = solph.views.node(results, 'bus_ac_pue_l')
-        results_ac_household_bus = solph.views.node(results, 'bus_ac_household_l')
-        results_peak_ac_bus = solph.views.node(results, 'peak_ac_bus_l')
+        # Extract resulting flows
+        self.results_ac_flows = self.ac_flows(results, sequences=sequences)
+
+        # Battery content of the full timeseries from the levels linking the typical periods
+        if self.typical_periods is not None:
+            self.results_battery_content = self.typical_periods.expand_storage_content(
+                self.om, self.energysystem.groups['battery_l'])
+
+        self.calc_results_system()
+
+    def invest_capacities_results(self, results):
+        """
+        :param results: oemof results with string keys
+        :return: df of the components' invested and total capacities (one column per component)
+        """
+
+        results_pv = solph.views.node(results, 'pv_l')
+        results_battery = solph.views.node(results, 'battery_l')
+        results_battery_inverter = solph.views.node(results, 'battery_inverter_l')
 
-        # Collect components' capacities results
         results_components_capacities_dict = {
             'pv': {
                 'capacity_invest': results_pv['scalars'][('pv_l', 'bus_ac_l'), 'invest'],
@@ -523,6 +747,9 @@ class OemofModel:
 
         # east-west pv results if it is modelled
         if self.pv_east_west_exists:
+            results_pv_east = solph.views.node(results, 'pv_east_l')
+            results_pv_west = solph.views.node(results, 'pv_west_l')
+
             results_components_capacities_dict['pv_east'] = {
                 'capacity_invest': results_pv_east['scalars'][('pv_east_l', 'bus_ac_l'), 'invest'],
                 'capacity_total': results_pv_east['scalars'][('pv_east_l', 'bus_ac_l'), 'total'],
@@ -533,9 +760,33 @@ class OemofModel:
                 'capacity_total': results_pv_west['scalars'][('pv_west_l', 'bus_ac_l'), 'total'],
             }
 
+        return pd.DataFrame(results_components_capacities_dict)
+
+    def fixed_capacities_results(self):
+        """
+        :return: df of the components' invested (= total - existing) and total capacities of the fixed capacities
+        (one column per component)
+        """
+
+        components = ['pv', 'battery_capacity', 'battery_inverter']
+        if self.pv_east_west_exists:
+            components += ['pv_east', 'pv_west']
+
+        return pd.DataFrame({
+            component: {
+                'capacity_invest': self.capacities[component] - self.components_data[component]['existing_capacity'],
+                'capacity_total': self.capacities[component]
+            } for component in components})
+
+    def calc_results_costs(self):
+        """
+        Calculate economic results of every component from results_components_capacities
+        -> results_components_costs (one column per component + total)
+        """
+
         # Calculate economic results for each component
         results_components_costs_dict = {}
-        for component, component_capacities in results_components_capacities_dict.items():
+        for component, component_capacities in self.results_components_capacities.items():
             results_components_costs_dict[component] = {
                 'capex': self.components_specific_costs[component]['specific_capex'] * component_capacities[
                     'capacity_total'],
@@ -547,8 +798,7 @@ class OemofModel:
                 # not considered for now TODO
             }
 
-        # Transfer dicts to DataFrames
-        self.results_components_capacities = pd.DataFrame(results_components_capacities_dict)
+        # Transfer dict to DataFrame
         self.results_components_costs = pd.DataFrame(results_components_costs_dict)
 
         self.results_components_costs.loc['total_annual_cost'] = (
@@ -557,17 +807,39 @@ class OemofModel:
         # Sum components cost for total system cost
         self.results_components_costs['total'] = self.results_components_costs.sum(axis=1)
 
-        # Extract resulting flows
+    def ac_flows(self, results, sequences=None):
+        """
+        :param results: oemof results with string keys
+        :param sequences: function(node view) returning the view's sequences (None -> view['sequences'])
+        :return: df of the AC flows in the system (columns: 'from - to')
+        """
+
+        if sequences is None:
+            def sequences(view):
+                return view['sequences']
+
+        # Extract bus results
+        results_ac_bus = solph.views.node(results, 'bus_ac_l')
+        results_ac_pue_bus = solph.views.node(results, 'bus_ac_pue_l')
+        results_ac_household_bus = solph.views.node(results, 'bus_ac_household_l')
+
         # Extract electricity component timeseries
-        self.results_ac_flows = pd.concat([results_ac_bus['sequences'], results_ac_pue_bus['sequences'],
-                                           results_ac_household_bus['sequences']], axis=1)
+        ac_flows = pd.concat([sequences(results_ac_bus), sequences(results_ac_pue_bus),
+                              sequences(results_ac_household_bus)], axis=1)
 
         # Add peak_power bus flows if peak_power_model exists
         if self.peak_power_model:
-            self.results_ac_flows = pd.concat([self.results_ac_flows, results_peak_ac_bus['sequences']])
+            ac_flows = pd.concat([ac_flows, sequences(solph.views.node(results, 'peak_ac_bus_l'))], axis=1)
 
-        self.results_ac_flows.columns = [x[0][0] + ' - ' + x[0][1] for x in
-                                         self.results_ac_flows.columns]  # Remove tuple columns
+        ac_flows.columns = [x[0][0] + ' - ' + x[0][1] for x in ac_flows.columns]  # Remove tuple columns
+
+        return ac_flows
+
+    def calc_results_system(self):
+        """
+        Calculate the system results (KPIs) from results_ac_flows and results_components_costs
+        -> results_system
+        """
 
         # Calculate and save system results (KPIs)
         # Sums of energy flows
@@ -584,6 +856,12 @@ class OemofModel:
             'battery_throughput': self.results_ac_flows['battery_inverter_l - bus_ac_l'].abs().mean()*model_dur / 2,
         }
 
+        # Load left unsupplied beyond the limits of unsupplied demand (only with fixed capacities)
+        if self.capacities is not None:
+            excess_flows = [flow for flow in UNSUPPLIED_EXCESS_FLOWS if flow in self.results_ac_flows.columns]
+            self.results_system['unsupplied_excess_energy'] = \
+                self.results_ac_flows[excess_flows].sum(axis=1).mean()*model_dur
+
         # Get maximum of peak power of battery inverter
         if self.peak_power_model:
             self.results_system['battery_inverter_peak_power_flow'] = self.results_ac_flows['peak_battery_inverter_l - peak_ac_bus_l'].max()
@@ -597,3 +875,23 @@ class OemofModel:
 
         self.results_system['LCOE'] = (self.results_components_costs['total']['total_annual_cost'] /
                                        self.results_system['total_energy_delivered']) * model_dur/8760
+
+
+class ModelResults:
+    """
+    Results of a solved OemofModel without its energysystem and pyomo model
+    -> compact and picklable, e.g. returned from worker processes (see pipeline.optimise_scenarios)
+    -> same results attributes as OemofModel
+    """
+
+    def __init__(self, mg_model):
+        """
+        :param mg_model: solved OemofModel with extracted results
+        """
+
+        self.capacities = mg_model.capacities
+        self.results_components_capacities = mg_model.results_components_capacities
+        self.results_components_costs = mg_model.results_components_costs
+        self.results_system = mg_model.results_system
+        self.results_ac_flows = mg_model.results_ac_flows
+        self.results_battery_content = mg_model.results_battery_content
@@ -0,0 +1,184 @@
+import pandas as pd
+import numpy as np
+
+
+def find_switch_on_events(load_profiles, pue_dict, seed=None, random_streams=None):
+    """
+    Find all switch-on events in RAMP-modelled PUE load profiles and draw the position of their start-up peak
+    - switch-on events are found for all appliances at once on the minute load profile array
+    - the random start second of every event's peak is drawn in one batch
+
+    :param load_profiles: df of RAMP modelled load profiles (1 min resolution, one column per appliance)
+    :param pue_dict: nested dict of pue input data (containing 'Start-up peak' and 'Start-up duration' per appliance)
+    or CompiledPueInput
+    :param seed: seed of the random generator drawing the start second of the peaks (None -> random)
+    :param random_streams: RandomStreams instance -> if passed, the start seconds of every day's and appliance's
+    events are drawn from their own 'peak_power' stream (seed is ignored)
+    :return: df of switch-on events (one row per event, sorted by minute) with columns:
+    minute (timestamp of the minute the event happens in), appliance, second_offset (start second of the peak within
+    the minute), duration (of the peak in seconds), peak (start-up peak power)
+    """
+
+    return find_switch_on_events_array(load_profiles.to_numpy().T, load_profiles.columns, load_profiles.index,
+                                       pue_dict, seed=seed, random_streams=random_streams)
+
+
+def find_switch_on_events_array(load_profile_array, appliances, timeseries, pue_dict, seed=None,
+                                random_streams=None, previous_minute=None):
+    """
+    Find all switch-on events in a plain array of load profiles (see find_switch_on_events)
+    :param load_profile_array: array of load profiles (appliances x minutes, 1 min resolution)
+    :param appliances: appliance names (row labels of the array)
+    :param timeseries: 1 min timeseries (column labels of the array)
+    :param pue_dict:
+    :param seed:
+    :param random_streams:
+    :param previous_minute: load of every appliance in the minute before the array (e.g. last minute of the previous
+    block of days) -> switch-on events in the first minute are found as well (None -> never in first minute)
+    :return: df of switch-on events (see find_switch_on_events)
+    """
+
+    appliances = pd.Index(appliances)
+
+    # Copy with minutes as rows (float32 stays float32 -> 0.001 is compared in the array's precision)
+    start_up_times = np.array(load_profile_array.T, dtype=np.result_type(load_profile_array.dtype, np.float32))
+
+    # Set all values that equal 0.001 to 0 -> fix for RAMP marking usage windows with 0.001
+    start_up_times[start_up_times == start_up_times.dtype.type(0.001)] = 0
+
+    # Only leave "start-up events": value is not 0 and previous value was 0 (never in first timestep)
+    switch_on = np.zeros(start_up_times.shape, dtype=bool)
+    switch_on[1:] = (start_up_times[1:] != 0) & (start_up_times[:-1] == 0)
+    if previous_minute is not None:
+        previous_minute = np.asarray(previous_minute, dtype=start_up_times.dtype)
+        previous_off = (previous_minute == 0) | (previous_minute == start_up_times.dtype.type(0.001))
+        switch_on[0] = (start_up_times[0] != 0) & previous_off
+
+    # Start-up peak and duration of every appliance (column)
+    if isinstance(pue_dict, dict):
+        start_up_peak = np.array([pue_dict[appliance]['Start-up peak'] for appliance in appliances], dtype=float)
+        start_up_duration = np.array([pue_dict[appliance]['Start-up duration'] for appliance in appliances],
+                                     dtype=int)
+    else:   # CompiledPueInput
+        start_up_peak = pue_dict.start_up_peak[pue_dict.appliance_indices(appliances)]
+        start_up_duration = pue_dict.start_up_duration[pue_dict.appliance_indices(appliances)]
+
+    # Minute and appliance (column) of every switch-on event
+    event_minutes, event_appliances = np.nonzero(switch_on)
+    event_durations = start_up_duration[event_appliances]
+
+    # Draw random start second of every event -> same as random.randint(0, 60 - duration)
+    if random_streams is None:
+        # all events in one batch
+        rng = np.random.default_rng(seed)
+        event_offsets = rng.integers(0, 60 - event_durations, endpoint=True)
+    else:
+        # one batch per day and appliance from its own stream
+        event_days = timeseries[event_minutes].normalize()
+        event_offsets = np.zeros(len(event_minutes), dtype=int)
+        groups = pd.Series(np.arange(len(event_minutes))).groupby([event_days, event_appliances], sort=False)
+        for (day, appliance), idx in groups.indices.items():
+            rng = random_streams.generator('peak_power', day, appliances[appliance])
+            event_offsets[idx] = rng.integers(0, 60 - event_durations[idx], endpoint=True)
+
+    events = pd.DataFrame({
+        'minute': timeseries[event_minutes],
+        'appliance': pd.Categorical.from_codes(event_appliances, categories=appliances),
+        'second_offset': event_offsets.astype(np.int16),
+        'duration': event_durations.astype(np.int16),
+        'peak': start_up_peak[event_appliances]
+    })
+
+    return events
+
+
+def _event_seconds(events, minute_positions):
+    """
+    Expand every event to the seconds its start-up peak lasts
+    :param events: df of switch-on events (see find_switch_on_events)
+    :param minute_positions: array of the position of every event's minute in the target timeseries
+    :return: array of second positions (relative to the target timeseries start), array of event row of every second
+    """
+
+    durations = events['duration'].to_numpy(dtype=int)
+    first_seconds = minute_positions * 60 + events['second_offset'].to_numpy(dtype=int)
+
+    seconds = np.arange(durations.max(initial=0))
+    in_peak = seconds < durations[:, np.newaxis]  # mask seconds beyond each event's start-up duration
+
+    peak_seconds = (first_seconds[:, np.newaxis] + seconds)[in_peak]
+    peak_events = np.repeat(np.arange(len(events)), durations)  # event of every masked second
+
+    return peak_seconds, peak_events
+
+
+def peak_power_minute_max(events, timeseries):
+    """
+    Calculate the maximum of the coincident (summed over all appliances) start-up peak power within every minute
+    directly from the switch-on events -> only minutes containing events are resolved to seconds
+
+    :param events: df of switch-on events (see find_switch_on_events)
+    :param timeseries: minute timeseries (DatetimeIndex) to calculate the peak power minute maxima for
+    :return: df containing timeseries with max peak power within every minute ('Total_peak_power')
+    """
+
+    minute_max = np.zeros(len(timeseries))
+
+    # Only consider events within the timeseries
+    events = events[events['minute'].isin(timeseries)]
+
+    if len(events) > 0:
+        # Number minutes with events consecutively -> sum peaks of every such minute second by second
+        event_minutes, minute_positions = np.unique(timeseries.get_indexer(events['minute']), return_inverse=True)
+        peak_seconds, peak_events = _event_seconds(events, minute_positions.ravel())
+
+        summed_peaks = np.bincount(peak_seconds, weights=events['peak'].to_numpy()[peak_events],
+                                   minlength=len(event_minutes) * 60)
+
+        minute_max[event_minutes] = summed_peaks.reshape(-1, 60).max(axis=1)
+
+    return pd.DataFrame({'Total_peak_power': minute_max}, index=timeseries)
+
+
+def peak_power_seconds(events, start, end):
+    """
+    Materialise the peak power timeseries with seconds resolution for a chosen time window
+    :param events: df of switch-on events (see find_switch_on_events)
+    :param start: first minute of the time window (timestamp)
+    :param end: end of the time window (timestamp, exclusive)
+    :return: df containing peak power timeseries with seconds resolution (one column per appliance
+    and 'Total_peak_power')
+    """
+
+    minutes = pd.date_range(start, end, freq='min', inclusive='left')
+    seconds_timeseries = pd.date_range(start, periods=len(minutes) * 60, freq='s')
+
+    # Only consider events within the time window
+    events = events[events['minute'].isin(minutes)]
+
+    peak_seconds, peak_events = _event_seconds(events, minutes.get_indexer(events['minute']))
+    peak_appliances = events['appliance'].cat.codes.to_numpy()[peak_events]
+    peaks = events['peak'].to_numpy()[peak_events]
+
+    # Preallocated array (one row per second, one column per appliance)
+    appliances = events['appliance'].cat.categories
+    peak_power_array = np.zeros((len(seconds_timeseries), len(appliances)))
+    peak_power_array[peak_seconds, peak_appliances] = peaks
+
+    peak_power_profiles = pd.DataFrame(peak_power_array, index=seconds_timeseries, columns=appliances)
+    peak_power_profiles['Total_peak_power'] = peak_power_array.sum(axis=1)
+
+    return peak_power_profiles
+
+
+def read_peak_power_events(file):
+    """
+    Read switch-on events saved as CSV (see main_ramp.py)
+    :param file: path to CSV file
+    :return: df of switch-on events (see find_switch_on_events)
+    """
+
+    events = pd.read_csv(file, parse_dates=['minute'])
+    events['appliance'] = events['appliance'].astype('category')
+
+    return events
@@ -0,0 +1,528 @@
+import os
+import json
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from model.data_input import InputData
+from model.compiled_input import CompiledPueInput
+from model.ramp_control import RampControl
+from model.oemof_model import OemofModel, ModelResults
+from model.load_profile_store import LoadProfileSink, read_resampled_load_profiles
+from model import instrumentation, scenario_cache, two_stage
+
+
+CACHE_PATH = "./data_cache/"
+RAMP_INPUT_PATH = "./model_input_data/ramp_model_input/"
+OEMOF_INPUT_PATH = "./model_input_data/"
+PV_RESOURCE_FILE = "pv_resource_model/pv_resource_data/1min_res_pv_mhv.csv"
+HOUSEHOLD_BASELOAD_FILE = "model_input_data/oemof_model_input/1min_household_load_profile.csv"
+START_DATE = "2018-01-01"    # 2018 starts on Monday
+
+
+def create_run_dir(run_name, overwrite=False):
+    """
+    Create cache folder of a new run
+    :param run_name:
+    :param overwrite: if True, an existing folder of this run is reused (files in it are overwritten)
+    :return: path of the run's cache folder
+    """
+
+    cache_dir_path = CACHE_PATH + str(run_name) + "/"
+    if os.path.exists(cache_dir_path) and not overwrite:
+        raise FileExistsError(run_name + ' exists already at: ' + cache_dir_path)
+    os.makedirs(cache_dir_path, exist_ok=True)
+
+    return cache_dir_path
+
+
+def read_scenarios(input_workbook, scenario_ids=None):
+    """
+    Read table of scenarios from the run's input workbook
+    :param input_workbook: path of the input workbook (containing the 'scenarios' table)
+    :param scenario_ids: list of scenario ids to keep (None -> all)
+    :return: df of scenarios (one row per scenario)
+    """
+
+    input_data = InputData()
+    input_data.get_all_tables(input_workbook)
+    scenarios = input_data.tables_dict['scenarios']['df']
+
+    if scenario_ids is not None:
+        unknown = set(scenario_ids) - set(scenarios['scenario_id'])
+        if unknown:
+            raise ValueError('Scenarios not in ' + input_workbook + ': ' + ', '.join(sorted(unknown)))
+        scenarios = scenarios[scenarios['scenario_id'].isin(scenario_ids)]
+
+    return scenarios
+
+
+def generate_load_profiles(cache_dir_path, scenarios, days_nr=365, workers=1, seed=None, continue_on_error=False,
+                           reuse_cached=True, engine='ramp', block_days=None):
+    """
+    Generate load profiles of all scenarios with RAMP and save them in the run's cache folder
+    -> writes scenarios_information.json and timings.json
+    -> every scenario is keyed by a hash of its RAMP input workbook, days, seed and code version (see scenario_cache):
+       load profiles of previous runs with the same key are reused instead of generated again
+    :param cache_dir_path: path of the run's cache folder
+    :param scenarios: df of scenarios (see read_scenarios)
+    :param days_nr: number of days to generate
+    :param workers: number of worker processes to generate the days of a scenario in parallel (1 -> serial)
+    :param seed: master seed of all random streams (None -> random, saved in scenarios_information)
+    :param continue_on_error: if True, a failing scenario is recorded with its error and the others are generated
+    :param reuse_cached: if True, load profiles of previous runs in CACHE_PATH with matching key are reused
+    (only possible with a given seed)
+    :param engine: 'ramp' -> RAMP generates the appliances' load profiles, 'numpy' -> vectorized duty cycle engine with
+    the same statistics (see RampControl.run_use_cases)
+    :param block_days: number of days generated and appended to the files at once (None -> all days)
+    -> memory depends on block_days instead of days_nr (e.g. 7 for profiles of 10-20 years)
+    :return: dict of scenarios information (failed scenarios contain 'error', 'cache' is 'reused' or 'generated')
+    """
+
+    # timings.json only contains the spans of this stage (optimise_scenarios may run in the same process)
+    instrumentation.reset()
+
+    # Days to generate load profiles for
+    days_timeseries = pd.date_range(START_DATE, periods=days_nr, freq="D")
+
+    scenarios_information = {}
+    for index, row in scenarios.iterrows():
+        try:
+            ramp_input_file = RAMP_INPUT_PATH + row['ramp_input_file_name']
+
+            # Look for load profiles generated with the same key in previous runs
+            cached_information = None
+            if reuse_cached:
+                cache_key = scenario_cache.scenario_cache_key(row['scenario_id'], ramp_input_file, days_nr, seed,
+                                                              START_DATE, engine=engine, block_days=block_days)
+                cached_information = scenario_cache.find_cached_scenario(cache_key, CACHE_PATH,
+                                                                         exclude_dir=cache_dir_path)
+
+            if cached_information is not None:
+                print('Reusing cached load profiles for scenario ' + row['scenario_id'] + ' from '
+                      + cached_information['modelled_load_profiles'])
+                scenario_information = scenario_cache.reuse_cached_scenario(cached_information, cache_dir_path)
+                scenario_information.update(row[['oemof_input_file_name', 'description']])
+                scenario_information['cache'] = 'reused'
+                scenario_information['reused_from'] = cached_information['modelled_load_profiles']
+            else:
+                scenario_information = generate_scenario_load_profiles(
+                    cache_dir_path, row, days_timeseries, workers=workers, seed=seed, engine=engine,
+                    block_days=block_days)
+                # Key with the drawn seed (if not given) -> later runs with this seed can reuse these load profiles
+                scenario_information['cache_key'] = scenario_cache.scenario_cache_key(
+                    row['scenario_id'], ramp_input_file, days_nr, scenario_information['seed'], START_DATE,
+                    engine=engine, block_days=block_days)
+                scenario_information['cache'] = 'generated'
+
+            scenarios_information[row['scenario_id']] = scenario_information
+        except Exception:
+            if not continue_on_error:
+                raise
+            print('Load profile generation failed for scenario ' + row['scenario_id'])
+            traceback.print_exc()
+            scenarios_information[row['scenario_id']] = dict(row[['ramp_input_file_name', 'oemof_input_file_name',
+                                                                  'description']],
+                                                             error=traceback.format_exc())
+
+    # Save scenario_information dict as json in this run's cache folder
+    with open(cache_dir_path + "scenarios_information.json", "w+") as file:
+        json.dump(scenarios_information, file)
+        print('Modeled load profiles and scenarios information saved.')
+
+    # Save timings of all scenarios' stages in this run's cache folder
+    instrumentation.write_timings(cache_dir_path, 'ramp')
+
+    return scenarios_information
+
+
+def generate_scenario_load_profiles(cache_dir_path, scenario, days_timeseries, workers=1, seed=None, engine='ramp',
+                                    block_days=None):
+    """
+    Generate load profiles of one scenario with RAMP and save them in the run's cache folder
+    :param cache_dir_path: path of the run's cache folder
+    :param scenario: row of the scenarios df
+    :param days_timeseries: days to generate load profiles for
+    :param workers: number of worker processes
+    :param seed: master seed of all random streams
+    :param engine: 'ramp' or 'numpy' (see generate_load_profiles)
+    :param block_days: number of days generated and saved at once (see generate_load_profiles)
+    :return: dict of this scenario's information (file paths, input files, seed, engine)
+    """
+
+    scenario_id = scenario['scenario_id']
+
+    # Record timings of every stage of this scenario
+    with instrumentation.span('scenario_' + scenario_id):
+
+        print("Running load profile model for scenario " + scenario_id)
+
+        # Read this scenario's input data and compile it into arrays (no pandas lookups while generating)
+        pue_input = CompiledPueInput(
+            InputData().read_pue_input(file=RAMP_INPUT_PATH + scenario['ramp_input_file_name']))
+
+        # Create instance of RampControl
+        ramp_run = RampControl(scenario_id=scenario_id, seed=seed)
+
+        file_path = cache_dir_path + "load_profile_scenario_" + scenario_id + ".parquet"
+        events_file_path = cache_dir_path + "peak_power_events_scenario_" + scenario_id + ".csv"
+
+        # Generate load profiles and peak power profiles block by block of days and append every block to the files
+        # -> only one block is held in memory
+        print("Generating 1min load profiles and peak power profiles for scenario " + scenario_id)
+        blocks = ramp_run.iter_load_profile_blocks(pue_input, days_timeseries,
+                                                   block_days=block_days or len(days_timeseries), workers=workers,
+                                                   engine=engine)
+        # Save load profiles (including peak power profile) as parquet with mean, max and std at 15min, 1h and 1d
+        with LoadProfileSink(file_path) as sink:
+            for i, (timeseries, load_profile_array, appliances, peak_power_events, peak_power_minute_max) \
+                    in enumerate(blocks):
+                # Build load profiles df with total load profile and peak power minute max profile
+                load_profiles = pd.DataFrame(load_profile_array.T, index=timeseries, columns=appliances)
+                load_profiles['total'] = load_profile_array.sum(axis=0)
+                load_profiles['peak_power_profile'] = peak_power_minute_max['Total_peak_power']
+
+                with instrumentation.span('save_load_profiles'):
+                    sink.append(load_profiles)
+                    # Switch-on events with start-up peaks as CSV -> seconds resolution can be materialised on
+                    # request for any time window with peak_power.peak_power_seconds(peak_power_events, start, end)
+                    peak_power_events.to_csv(events_file_path, index=False, mode='w' if i == 0 else 'a',
+                                             header=(i == 0))
+
+                print('done until: ' + str(timeseries[-1].date()))
+        aggregate_files = sink.aggregate_files
+
+    # scenario information with file paths
+    return {
+        'modelled_load_profiles': file_path,
+        'load_profile_aggregates': aggregate_files,
+        'peak_power_events': events_file_path,
+        'ramp_input_file_name': scenario['ramp_input_file_name'],
+        'oemof_input_file_name': scenario['oemof_input_file_name'],
+        'description': scenario['description'],
+        'seed': ramp_run.random_streams.master_seed,
+        'engine': engine,
+        'block_days': block_days
+    }
+
+
+def read_scenarios_information(cache_dir_path):
+    """
+    Read scenarios information of a run with generated load profiles
+    :param cache_dir_path: path of the run's cache folder
+    :return: dict of scenarios information
+    """
+
+    with open(cache_dir_path + "scenarios_information.json", "r") as file:
+        return json.load(file)
+
+
+def optimise_scenarios(cache_dir_path, scenarios, scenario_ids=None, freq='1h', short=False, solver='cbc',
+                       peak_power_from=None, continue_on_error=False, typical_periods=None, period_length='1D',
+                       dispatch_freq=None, horizon='1D', overlap='12h', margin=0.0, max_iterations=1, workers=1):
+    """
+    Build and solve the oemof microgrid model of every scenario and save the system results
+    -> writes scenarios_system_results.xlsx and timings.json
+    -> with workers > 1 the scenarios are built and solved in a process pool, the workers only return the models'
+       results (see ModelResults)
+    :param cache_dir_path: path of the run's cache folder
+    :param scenarios: dict of scenarios information (see read_scenarios_information)
+    -> 'mg_model' (solved OemofModel, ModelResults with workers > 1) is added to every optimised scenario's dict
+    :param scenario_ids: list of scenario ids to optimise (None -> all)
+    :param freq: frequency of the oemof model
+    :param short: number of days to optimise (False -> all days)
+    :param solver: name of the solver
+    :param peak_power_from: dict {scenario id: scenario id whose peak power profile is used instead of its own}
+    :param continue_on_error: if True, a failing scenario is recorded with its error and the others are optimised
+    :param typical_periods: number of typical periods the timeseries are aggregated to (None -> full timeseries)
+    :param period_length: length of the typical periods (pandas offset, e.g. '1D', '7D')
+    :param dispatch_freq: frequency of the dispatch check of the optimised capacities (two-stage sizing, see
+    two_stage.check_capacities; None -> no dispatch check)
+    -> 'mg_model_dispatch' (last dispatched OemofModel) and 'dispatch_checks' (df) are added to every checked
+       scenario's dict, writes scenarios_dispatch_results.xlsx (checked capacities, dispatch KPIs and violations)
+    :param horizon: length of the kept part of every rolling horizon window (see OemofModel.solve_rolling_horizon)
+    :param overlap: look-ahead of every rolling horizon window
+    :param margin: relative capacity margin added to violated capacities after every dispatch check
+    :param max_iterations: maximum number of dispatch checks
+    :param workers: number of scenarios built and solved at the same time in worker processes (1 -> one after another
+    in this process)
+    :return: df of system results (capacities and KPIs, one column per scenario), list of failed scenario ids
+    """
+
+    # timings.json only contains the spans of this stage (generate_load_profiles may run in the same process)
+    instrumentation.reset()
+
+    if peak_power_from is None:
+        peak_power_from = {}
+
+    def peak_power_file(scenario_id):
+        # Modelled load profiles of the scenario whose peak power profile is used
+        source_id = peak_power_from.get(scenario_id, scenario_id)
+        if 'modelled_load_profiles' not in scenarios.get(source_id, {}):
+            raise ValueError('Scenario ' + str(source_id) + ' has no modelled load profiles (peak power profile of '
+                             + 'scenario ' + str(scenario_id) + ')')
+        return scenarios[source_id]['modelled_load_profiles']
+
+    # Get PV resource data -> same for all scenarios
+    pv_data = pd.read_csv(PV_RESOURCE_FILE, index_col=0, parse_dates=True)
+
+    # Get household baseload -> same for all scenarios
+    household_baseload = pd.read_csv(HOUSEHOLD_BASELOAD_FILE, index_col=0, parse_dates=True)
+
+    # Only read the modelled timeframe
+    end = None
+    if short:
+        end = pd.Timestamp(START_DATE) + pd.Timedelta(days=short) - pd.Timedelta(minutes=1)
+
+    # Options of every scenario's optimisation (see optimise_and_check_scenario)
+    options = {'freq': freq, 'end': end, 'solver': solver, 'typical_periods': typical_periods,
+               'period_length': period_length, 'dispatch_freq': dispatch_freq, 'horizon': horizon, 'overlap': overlap,
+               'margin': margin, 'max_iterations': max_iterations}
+    scenario_ids = [scenario_id for scenario_id in scenarios if scenario_ids is None or scenario_id in scenario_ids]
+
+    # Submit all scenarios to the process pool -> PV and household data are passed once to every worker
+    # -> errors before submitting are raised in the scenario's turn below (handled like errors of the optimisation)
+    executor = None
+    futures = {}
+    submit_errors = {}
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_optimise_worker,
+                                       initargs=(pv_data, household_baseload))
+        for scenario_id in scenario_ids:
+            try:
+                futures[scenario_id] = executor.submit(optimise_scenario_worker, cache_dir_path, scenario_id,
+                                                       scenarios[scenario_id], peak_power_file(scenario_id), options)
+            except Exception as error:
+                submit_errors[scenario_id] = error
+
+    scenarios_system_kpis = {}
+    scenarios_system_capacities = {}
+    scenarios_dispatch_kpis = {}
+    failed = []
+    try:
+        for scenario_id in scenario_ids:
+            scenario_data = scenarios[scenario_id]
+
+            try:
+                if scenario_id in submit_errors:
+                    raise submit_errors[scenario_id]
+                elif executor is not None:
+                    # Results in order of the scenarios, timings of the worker are added to this process' timings
+                    mg_model, dispatch_model, dispatch_checks, worker_timings = futures[scenario_id].result()
+                    instrumentation.add_timings(worker_timings)
+                else:
+                    mg_model, dispatch_model, dispatch_checks = optimise_and_check_scenario(
+                        cache_dir_path, scenario_id, scenario_data, pv_data, household_baseload,
+                        peak_power_file=peak_power_file(scenario_id), **options)
+            except Exception:
+                if not continue_on_error:
+                    raise
+                print('Optimisation failed for scenario ' + scenario_id)
+                traceback.print_exc()
+                failed.append(scenario_id)
+                continue
+
+            # Add mg_model to scenario_data dict
+            scenario_data['mg_model'] = mg_model
+
+            # Copy this scenario's system results in systems_kpis dict
+            scenarios_system_kpis[scenario_id] = mg_model.results_system
+            scenarios_system_capacities[scenario_id] = mg_model.results_components_capacities.loc['capacity_total']
+
+            if dispatch_freq is not None:
+                scenario_data['mg_model_dispatch'] = dispatch_model
+                scenario_data['dispatch_checks'] = dispatch_checks
+                # Dispatch KPIs (energy left unsupplied beyond the limits is not delivered) next to the sizing LCOE
+                scenarios_dispatch_kpis[scenario_id] = dict(dispatch_checks.iloc[-1], **dispatch_model.results_system,
+                                                            LCOE_sizing=mg_model.results_system['LCOE'])
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    scenarios_system_kpis = pd.DataFrame(scenarios_system_kpis)
+    scenarios_system_capacities = pd.DataFrame(scenarios_system_capacities)
+
+    # Save dfs as xlsx
+    scenarios_system_results = pd.concat([scenarios_system_capacities, scenarios_system_kpis])
+    scenarios_system_results.to_excel(cache_dir_path + 'scenarios_system_results.xlsx')
+    if dispatch_freq is not None:
+        pd.DataFrame(scenarios_dispatch_kpis).to_excel(cache_dir_path + 'scenarios_dispatch_results.xlsx')
+
+    # Save timings of model construction, solving and results processing in this run's cache folder
+    instrumentation.write_timings(cache_dir_path, 'oemof')
+
+    return scenarios_system_results, failed
+
+
+# Input data shared by all scenarios in a worker process (see init_optimise_worker)
+_worker_data = {}
+
+
+def init_optimise_worker(pv_data, household_baseload):
+    """
+    Initialise a worker process of optimise_scenarios -> the shared input data is passed once per worker
+    :param pv_data: df of PV resource data
+    :param household_baseload: df of household baseload
+    """
+
+    _worker_data['pv_data'] = pv_data
+    _worker_data['household_baseload'] = household_baseload
+
+
+def optimise_scenario_worker(cache_dir_path, scenario_id, scenario_data, peak_power_file, options):
+    """
+    Optimise one scenario in a worker process (see optimise_and_check_scenario)
+    -> only the results are returned (no energysystem or pyomo model)
+    :return: ModelResults of the sizing, ModelResults of the last dispatch (None -> no dispatch check),
+    df of the dispatch checks (None -> no dispatch check), timings of this scenario (see instrumentation.timings)
+    """
+
+    instrumentation.reset()     # the worker's timings only contain this scenario
+
+    mg_model, dispatch_model, dispatch_checks = optimise_and_check_scenario(
+        cache_dir_path, scenario_id, scenario_data, _worker_data['pv_data'], _worker_data['household_baseload'],
+        peak_power_file=peak_power_file, **options)
+
+    if dispatch_model is not None:
+        dispatch_model = ModelResults(dispatch_model)
+
+    return ModelResults(mg_model), dispatch_model, dispatch_checks, instrumentation.timings()
+
+
+def optimise_and_check_scenario(cache_dir_path, scenario_id, scenario_data, pv_data, household_baseload, freq='1h',
+                                end=None, solver='cbc', peak_power_file=None, typical_periods=None,
+                                period_length='1D', dispatch_freq=None, horizon='1D', overlap='12h', margin=0.0,
+                                max_iterations=1):
+    """
+    Optimise the capacities of one scenario (see optimise_scenario) and check them with a dispatch at dispatch_freq
+    (see two_stage.check_capacities)
+    -> parameters see optimise_scenarios
+    :return: solved OemofModel, last dispatched OemofModel (None -> no dispatch check),
+    df of the dispatch checks (None -> no dispatch check)
+    """
+
+    mg_model = optimise_scenario(cache_dir_path, scenario_id, scenario_data, pv_data, household_baseload,
+                                 freq=freq, end=end, solver=solver, peak_power_file=peak_power_file,
+                                 typical_periods=typical_periods, period_length=period_length)
+
+    # Check the optimised capacities with a dispatch at high resolution (second stage)
+    dispatch_model = None
+    dispatch_checks = None
+    if dispatch_freq is not None:
+        with instrumentation.span('scenario_' + scenario_id):
+            dispatch_model, dispatch_checks = two_stage.check_capacities(
+                lambda capacities: scenario_model(
+                    cache_dir_path, scenario_id, scenario_data, pv_data, household_baseload,
+                    freq=dispatch_freq, end=end, peak_power_file=peak_power_file,
+                    peak_power_model=False, capacities=capacities),
+                mg_model.results_components_capacities.loc['capacity_total'].to_dict(),
+                solver=solver, horizon=horizon, overlap=overlap, margin=margin, max_iterations=max_iterations)
+
+    return mg_model, dispatch_model, dispatch_checks
+
+
+def optimise_scenario(cache_dir_path, scenario_id, scenario_data, pv_data, household_baseload, freq='1h', end=None,
+                      solver='cbc', peak_power_file=None, typical_periods=None, period_length='1D',
+                      capacities=None, horizon='1D', overlap='12h'):
+    """
+    Build and solve the oemof microgrid model of one scenario and extract its results
+    :param cache_dir_path: path of the run's cache folder
+    :param scenario_id:
+    :param scenario_data: dict of this scenario's information
+    :param pv_data: df of PV resource data
+    :param household_baseload: df of household baseload
+    :param freq: frequency of the oemof model
+    :param end: last timestamp to optimise (None -> all)
+    :param solver: name of the solver
+    :param peak_power_file: load profiles file whose peak power profile is used (None -> this scenario's
+    modelled_load_profiles)
+    :param typical_periods: number of typical periods the timeseries are aggregated to (None -> full timeseries)
+    :param period_length: length of the typical periods (pandas offset, e.g. '1D', '7D')
+    :param capacities: dict of fixed total capacities (None -> capacities are optimised)
+    -> only the dispatch is optimised with a rolling horizon (see OemofModel.solve_rolling_horizon)
+    :param horizon: length of the kept part of every rolling horizon window
+    :param overlap: look-ahead of every rolling horizon window
+    :return: solved OemofModel with extracted results
+    """
+
+    # Record timings of every stage of this scenario
+    with instrumentation.span('scenario_' + scenario_id):
+        print('Run oemof model for scenario ' + scenario_id)
+
+        mg_model = scenario_model(cache_dir_path, scenario_id, scenario_data, pv_data, household_baseload, freq=freq,
+                                  end=end, peak_power_file=peak_power_file,
+                                  typical_periods=typical_periods, period_length=period_length,
+                                  capacities=capacities)
+
+        # Fixed capacities -> dispatch window by window, results are stitched in the model
+        if capacities is not None:
+            mg_model.solve_rolling_horizon(horizon=horizon, overlap=overlap, solver=solver)
+        else:
+            mg_model.solve(solver=solver)
+
+    return mg_model
+
+
+def scenario_model(cache_dir_path, scenario_id, scenario_data, pv_data, household_baseload, freq='1h', end=None,
+                   peak_power_file=None, peak_power_model=True, typical_periods=None, period_length='1D',
+                   capacities=None):
+    """
+    Build the oemof microgrid model of one scenario from its input data and load profiles (not solved)
+    :param cache_dir_path: path of the run's cache folder
+    :param scenario_id:
+    :param scenario_data: dict of this scenario's information
+    :param pv_data: df of PV resource data
+    :param household_baseload: df of household baseload
+    :param freq: frequency of the oemof model
+    :param end: last timestamp to optimise (None -> all)
+    :param peak_power_file: load profiles file whose peak power profile is used (None -> this scenario's
+    modelled_load_profiles)
+    :param peak_power_model: if True, the peak power demand is modelled
+    :param typical_periods: number of typical periods the timeseries are aggregated to (None -> full timeseries)
+    :param period_length: length of the typical periods (pandas offset, e.g. '1D', '7D')
+    :param capacities: dict of fixed total capacities (None -> capacities are optimised)
+    :return: OemofModel
+    """
+
+    # Modelled load profiles of this scenario (e.g. load_profile_scenario_<id>.parquet or an ensemble realisation)
+    load_profiles_file = scenario_data['modelled_load_profiles']
+    if peak_power_file is None:
+        peak_power_file = load_profiles_file
+
+    # Read this scenario's oemof input data
+    oemof_input = InputData()
+    oemof_input.get_all_tables(OEMOF_INPUT_PATH + scenario_data['oemof_input_file_name'])
+
+    # Read this scenario's pue load profiles at the model's frequency (from the closest stored aggregate)
+    pue_load_profiles = read_resampled_load_profiles(
+        load_profiles_file,  # RAMP modelled load profiles
+        freq=freq,
+        statistics={'total': 'mean'},
+        end=end)
+    pue_load_profiles['peak_power_profile'] = read_resampled_load_profiles(
+        peak_power_file,
+        freq=freq,
+        statistics={'peak_power_profile': 'max'},
+        end=end)['peak_power_profile']
+
+    # Initialise instance of OemofModel with scenario's input data
+    mg_model = OemofModel(
+        pue_load_profile=pue_load_profiles['total'],
+        household_baseload=household_baseload['household_load'],
+        peak_power_profile=pue_load_profiles['peak_power_profile'],
+        system_data=oemof_input.tables_dict,
+        pv_gen_ts=pv_data['north_20'],
+        freq=freq,
+        peak_power_model=peak_power_model,
+        pue_load_exists=True,
+        household_baseload_exists=True,
+        pv_east_west_exists=False,
+        pv_east_ts=pv_data['east_20'],
+        pv_west_ts=pv_data['west_20'],
+        typical_periods=typical_periods,
+        period_length=period_length,
+        capacities=capacities
+    )
+
+    return mg_model
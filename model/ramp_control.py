@@ -3,110 +3,127 @@ import ramp
 import numpy as np
 import random
 import math
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from model import peak_power, usage_windows, duty_cycle_engine, compiled_input, instrumentation
+from model.random_streams import RandomStreams
 
 
 class RampControl:
-    def __init__(self):
+    def __init__(self, scenario_id=None, seed=None):
+        """
+        :param scenario_id: id of the modelled scenario (part of the key of all random streams)
+        :param seed: master seed of all random streams (None -> random, saved in self.random_streams.master_seed)
+        """
 
         self.ramp_use_cases = {}
+        self.use_case_dates = {}  # date of every use case (= day) -> key of its random streams
+
+        # Independent random streams for every (scenario, day, appliance)
+        self.random_streams = RandomStreams(master_seed=seed, scenario_id=scenario_id)
+
+        # Cache of the deterministic use case parameters of every (weekday, month) combination
+        self.use_case_templates = {}
+        self.template_pue_dict = None  # pue_dict the templates were compiled from
 
-    def add_use_case(self, name, pue_dict, day, month):
+        # Precomputed usage windows of every day -> date: (starts, ends) arrays (appliances x windows) in min
+        self.usage_windows = {}
+
+        # Fingerprint of every use case's users and windows -> name: fingerprint (see add_use_case)
+        self.use_case_fingerprints = {}
+        # Cache of the deterministic part of the peak time range -> fingerprint: (mu, sigma) of the peak time in min
+        self.peak_windows = {}
+        # Template and windows of every use case -> name: (day, month, starts, ends) (input of the numpy engine)
+        self.use_case_inputs = {}
+
+    @instrumentation.span('RampControl.draw_usage_windows')
+    def draw_usage_windows(self, pue_dict, days):
+        """
+        Draw the usage windows of all appliances for all days at once (consumed by add_use_case)
+        :param pue_dict:
+        :param days: DatetimeIndex of days (dates of the use cases)
+        :return:
+        """
+
+        starts, ends = usage_windows.draw_usage_windows(pue_dict, days, random_streams=self.random_streams)
+        for i, date in enumerate(days):
+            self.usage_windows[date] = (starts[i], ends[i])
+
+    def use_case_template(self, pue_dict, day, month):
+        """
+        Get the deterministic part of the use cases of a (weekday, month) combination
+        -> compiled once per combination from pue_dict and cached (only 7x12 combinations exist)
+        :param pue_dict:
+        :param day: weekday
+        :param month:
+        :return: list of dicts (one per appliance) with user and add_appliance() kwargs
+        """
+
+        # Reset caches if other input data is used
+        if pue_dict is not self.template_pue_dict:
+            self.use_case_templates = {}
+            self.peak_windows = {}
+            self.template_pue_dict = pue_dict
+
+        if (day, month) not in self.use_case_templates:
+            self.use_case_templates[(day, month)] = compile_use_case_template(pue_dict, day, month)
+
+        return self.use_case_templates[(day, month)]
+
+    @instrumentation.span('RampControl.add_use_case')
+    def add_use_case(self, name, pue_dict, day, month, date=None, windows=None):
         """
         Function to process user input data and generate RAMP use case from it
         NEW version -> update 2023-10-24 for new input file format
+        - the deterministic parameters are taken from the (weekday, month) template
+        - the usage windows are precomputed for all days (see draw_usage_windows)
         :param name:
         :param pue_dict:
         :param day:
         :param month:
-        :param preferred:
+        :param date: date of this use case -> key of its random streams (None -> name is used as date)
+        :param windows: (starts, ends) arrays (appliances x windows) of this day's usage windows in min
+        (None -> taken from self.usage_windows, drawn for this day only if missing)
         :return:
         """
 
+        if date is None:
+            date = name
+        self.use_case_dates[name] = date
+
+        if windows is None:
+            if date not in self.usage_windows:
+                self.draw_usage_windows(pue_dict, pd.DatetimeIndex([date]))
+            windows = self.usage_windows[date]
+        starts, ends = windows
+
         # Create dict containing users
         users_dict = {}
         appliances_list = []
-        # Loop through appliances in pue_dict
-        for appliance, data in pue_dict.items():
+        # Loop through appliances of this day's template
+        template = self.use_case_template(pue_dict, day, month)
+        for a, appliance_template in enumerate(template):
+            appliance = appliance_template['name']
             appliances_list.append(appliance)
-            # Get preferred usage_windows from input_data
-            day_pref = data['weekly_preferences'][day].iloc[0:24]
 
-            window_1 = None
-            window_2 = None
-            window_3 = None
-            windows_nr = 0
-
-            # Define window 1
-            # Do random window calculation outside of RAMP to allow for individual manipulation window start and end
-            if not math.isnan(day_pref['window_1_start']):
-                # Rand window calculation in RAMP: random.randint(_window[0] - _random_var, _window[0] + _random_var
-                # !! Different here: window_X_start_var is absolut value in hours!
-                rand_len = (day_pref['window_1_end'] - day_pref['window_1_start']) * 60  # window length in min
-                rand_start = random.randint(day_pref['window_1_start']*60-day_pref['window_1_start_var']*60,
-                                            day_pref['window_1_start']*60+day_pref['window_1_start_var']*60)
-
-                rand_end = random.randint(day_pref['window_1_end']*60-day_pref['window_1_end_var']*60,
-                                          day_pref['window_1_end']*60-day_pref['window_1_end_var']*60)
-                window_1 = [rand_start, rand_end]
-                windows_nr = windows_nr+1
-
-            # Define window 2
-            if not math.isnan(day_pref['window_2_start']):
-                # Rand window calculation in RAMP: random.randint(_window[0] - _random_var, _window[0] + _random_var
-                rand_len = (day_pref['window_2_end'] - day_pref['window_2_start']) * 60  # window length in min
-                rand_start = random.randint(day_pref['window_2_start']*60-day_pref['window_2_start_var']*60,
-                                            day_pref['window_2_start']*60+day_pref['window_2_start_var']*60)
-
-                rand_end = random.randint(day_pref['window_2_end']*60-day_pref['window_2_end_var']*60,
-                                          day_pref['window_2_end']*60+day_pref['window_2_end_var']*60)
-                window_2 = [rand_start, rand_end]
-                windows_nr = windows_nr + 1
-
-            # Define window 3
-            if not math.isnan(day_pref['window_3_start']):
-                # Rand window calculation in RAMP: random.randint(_window[0] - _random_var, _window[0] + _random_var
-                rand_len = (day_pref['window_3_end'] - day_pref['window_3_start']) * 60  # window length in min
-                rand_start = random.randint(day_pref['window_3_start']*60-day_pref['window_3_start_var']*60,
-                                            day_pref['window_3_start']*60+day_pref['window_3_start_var']*60)
-
-                rand_end = random.randint(day_pref['window_3_end']*60-day_pref['window_3_end_var']*60,
-                                          day_pref['window_3_end']*60+day_pref['window_3_end_var']*60)
-                window_3 = [rand_start, rand_end]
-                windows_nr = windows_nr + 1
+            # Random windows are drawn outside of RAMP to allow for individual manipulation window start and end
+            appliance_windows = {'window_1': None, 'window_2': None, 'window_3': None}
+            for i, window in enumerate(usage_windows.WINDOWS):
+                if starts[a, i] >= 0:   # -1 -> window not defined
+                    appliance_windows['window_' + str(window)] = [int(starts[a, i]), int(ends[a, i])]
 
             # Check if user does not exist yet
-            if data['User'] not in users_dict.keys():
-                users_dict[data['User']] = ramp.User(user_name=data['User'], num_users=1)   # Create user instance
+            if appliance_template['user'] not in users_dict.keys():
+                # Create user instance
+                users_dict[appliance_template['user']] = ramp.User(user_name=appliance_template['user'], num_users=1)
 
-            # Get this days func_time (in min)
-            func_time = data['weekly_preferences'][day].loc['Usage time'] * 60
+            # add appliance to this user (RAMP objects are created per day as RAMP changes them while generating)
+            users_dict[appliance_template['user']].add_appliance(
+                **appliance_template['appliance_kwargs'],
 
-            # Get func_time fraction that is subject to random variability
-            time_fraction_random_variability = data['weekly_preferences'][day].loc['Usage time variability']
-
-            # Consider monthly variation of usage time
-            func_time = func_time * data['monthly_variation']['Usage time variation'].loc[month]
-
-            # add appliance to this user
-            users_dict[data['User']].add_appliance(
-                name=appliance,
-                number=data['Number'],
-                power=data['Nominal power'],
-
-                fixed_cycle=1,  # one duty cycle
-                p_11=data['P1'],
-                t_11=data['t1'],  # start-up time is always 1
-                p_12=data['P1'],
-                t_12=data['t2'],  # steady state duration = total duration - start-up time
-                r_c1=data['Duration variability'],
-
-                func_time=func_time,  # total time of use per day
-                time_fraction_random_variability=time_fraction_random_variability,
-
-                num_windows=windows_nr,
-                window_1=window_1,
-                window_2=window_2,
-                window_3=window_3,
+                num_windows=int((starts[a] >= 0).sum()),
+                **appliance_windows,
 
                 random_var_w=0   # Random window variability is specified beforehand!
             )
@@ -116,9 +133,33 @@ class RampControl:
         )
 
         self.ramp_use_cases[name] = use_case
+        # Users' maximum profiles only depend on the appliances' number, power and windows
+        # -> same appliances and windows = same peak window (usage time does not matter)
+        appliances_power = np.array([[appliance_template['appliance_kwargs']['number'],
+                                      appliance_template['appliance_kwargs']['power']]
+                                     for appliance_template in template], dtype=float)
+        self.use_case_fingerprints[name] = (appliances_power.tobytes(), starts.tobytes(), ends.tobytes())
+        self.use_case_inputs[name] = (day, month, starts, ends)
 
         return appliances_list
 
+    def peak_window(self, name):
+        """
+        Get the deterministic part of a use case's peak time range (see peak_window_parameters)
+        -> calculated once per fingerprint of users and windows and cached
+        :param name: name of the use case
+        :return: (mu, sigma) of the peak time in min
+        """
+
+        fingerprint = self.use_case_fingerprints.get(name)
+        if fingerprint is None:     # use case not added by add_use_case
+            return peak_window_parameters(self.ramp_use_cases[name].users)
+
+        if fingerprint not in self.peak_windows:
+            self.peak_windows[fingerprint] = peak_window_parameters(self.ramp_use_cases[name].users)
+
+        return self.peak_windows[fingerprint]
+
     def add_use_case_old(self, name, pue_dict, day, month, preferred=True):
         """
         Function to process user input data and generate RAMP use case from it
@@ -221,93 +262,404 @@ class RampControl:
 
         return appliances_list
 
-    def run_use_cases(self, appliances_list ,timeseries):
+    def run_use_cases(self, appliances_list, timeseries, workers=1, engine='ramp'):
+        """
+        Generate load profiles of every appliance for every use case (= day)
+        - every day and appliance is generated with its own random stream (see self.random_streams)
+        - with workers > 1 the days are spread over a process pool
+          (scripts calling this in parallel mode must be guarded by if __name__ == '__main__' on Windows)
+        :param appliances_list: list of appliance names (as returned by add_use_case)
+        :param timeseries: 1 min timeseries covering all use cases
+        :param workers: number of worker processes (1 -> generate days one after another in this process)
+        :param engine: 'ramp' -> RAMP's Appliance.generate_load_profile, 'numpy' -> vectorized duty cycle engine
+        (see run_use_cases_numpy)
+        :return: df of load profiles (one column per appliance)
+        """
 
-        # define dict for resulting load profiles
-        load_profiles = {app: [] for app in appliances_list}
+        load_profile_array, appliances = self.run_use_cases_array(appliances_list, workers=workers, engine=engine)
 
-        for name, use_case in self.ramp_use_cases.items():
+        # df is only a view of the (transposed) array -> no copy of the load profiles
+        load_profiles_df = pd.DataFrame(load_profile_array.T, index=timeseries, columns=appliances, copy=False)
 
-            # Calculate peak time range of this use case
-            peak_time_range = ramp.calc_peak_time_range(use_case.users)
+        return load_profiles_df
 
-            # Loop through all users
-            for user in use_case.users:
-                # Loop through user's appliances
-                for appliance in user.App_list:
-                    # Generate appliance load profile
-                    # if this appliance has at least one usage window in this use_case (=this day)
-                    if appliance.num_windows > 0:
-                        appliance.generate_load_profile(
-                            prof_i=0,
-                            peak_time_range=peak_time_range,
-                            day_type=0,  # is always week day -> day types defined through different use cases
-                            power=10  # does not matter since we only use duty cycles
-                        )
-                        load_profiles[appliance.name].extend(appliance.daily_use)
-                    else:   # otherwise add zeroes -> no operation on this day
-                        load_profiles[appliance.name].extend([0]*1440)
+    @instrumentation.span('RampControl.run_use_cases_array')
+    def run_use_cases_array(self, appliances_list, workers=1, engine='ramp'):
+        """
+        Generate load profiles of every appliance for every use case (= day) as plain array
+        -> results are written directly into a preallocated float32 array (no DataFrame is built)
+        :param appliances_list: list of appliance names (as returned by add_use_case)
+        :param workers: number of worker processes (see run_use_cases, not used by the numpy engine)
+        :param engine: 'ramp' or 'numpy' (see run_use_cases)
+        :return: float32 array of load profiles (appliances x minutes, days in order of the use cases),
+        index of appliance names (row labels of the array)
+        """
 
-        load_profiles_df = pd.DataFrame(load_profiles, index=timeseries)
+        if engine == 'numpy':
+            return self.run_use_cases_numpy(appliances_list)
+        elif engine != 'ramp':
+            raise ValueError('Unknown engine: ' + str(engine))
+
+        # Get seeds of every use case's (= day's) random streams
+        use_cases = list(self.ramp_use_cases.values())
+        day_seeds = [self.use_case_seeds(name, appliances_list) for name in self.ramp_use_cases.keys()]
+        # Peak windows are looked up per fingerprint -> only the random peak time is drawn per day
+        peak_windows = [self.peak_window(name) for name in self.ramp_use_cases.keys()]
+
+        # Preallocated array -> one row per appliance, one column per minute
+        load_profile_array = np.zeros((len(appliances_list), len(use_cases) * 1440), dtype=np.float32)
+        # View of the array with one block of 1440 minutes per day (days x appliances x minutes of day)
+        days_view = load_profile_array.reshape(len(appliances_list), len(use_cases), 1440).swapaxes(0, 1)
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # map returns the days' results in order of the use cases
+                days_profiles = executor.map(generate_use_case_load_profiles, use_cases,
+                                             repeat(appliances_list), day_seeds, peak_windows,
+                                             chunksize=max(1, len(use_cases) // (workers * 4)))
+                for i, day_profiles in enumerate(days_profiles):
+                    days_view[i] = day_profiles
+        else:
+            # write every day directly into its block of the array
+            for i, (use_case, seeds, peak_window) in enumerate(zip(use_cases, day_seeds, peak_windows)):
+                generate_use_case_load_profiles(use_case, appliances_list, seeds, peak_window, out=days_view[i])
+
+        return load_profile_array, pd.Index(appliances_list)
+
+    def run_use_cases_numpy(self, appliances_list):
+        """
+        Generate load profiles of every appliance for every use case (= day) with the vectorized duty cycle engine
+        -> all days and appliances at once (see duty_cycle_engine.generate_load_profiles)
+        -> only for use cases created by add_use_case (fixed single duty cycle, windows drawn beforehand)
+        - peak time ranges are drawn from the same 'peak_time' streams as with RAMP
+        - switch-on events are drawn from one 'duty_cycle' stream keyed by the first day
+          -> reproducible for the same days, but not for a part of them (unlike RAMP's per-day streams)
+        :param appliances_list: list of appliance names (as returned by add_use_case)
+        :return: float32 array of load profiles (appliances x minutes), index of appliance names
+        """
 
-        return load_profiles_df
+        names = list(self.ramp_use_cases.keys())
+        inputs = [self.use_case_inputs[name] for name in names]
 
-    def calculate_peak_power_timeseries(self, load_profiles, pue_dict, seconds_timeseries):
+        # Appliance parameters and windows of every day (days x appliances)
+        if isinstance(self.template_pue_dict, dict):
+            parameters = duty_cycle_engine.compile_parameters(
+                [self.use_case_template(self.template_pue_dict, day, month) for day, month, _, _ in inputs])
+        else:   # CompiledPueInput -> gathered from its arrays
+            parameters = duty_cycle_engine.gather_parameters(
+                self.template_pue_dict, compiled_input.weekday_indices([day for day, _, _, _ in inputs]),
+                np.array([month - 1 for _, month, _, _ in inputs]))
+        starts = np.stack([day_starts for _, _, day_starts, _ in inputs])
+        ends = np.stack([day_ends for _, _, _, day_ends in inputs])
+
+        # First and last minute of every day's peak time range
+        peak_time_ranges = np.zeros((len(names), 2), dtype=int)
+        for i, name in enumerate(names):
+            seed_global_random_states(self.random_streams.seed('peak_time', self.use_case_dates[name]))
+            peak_time_ranges[i] = draw_peak_time_range(self.peak_window(name))[[0, -1]]
+
+        rng = self.random_streams.generator('duty_cycle', self.use_case_dates[names[0]])
+        days_profiles = duty_cycle_engine.generate_load_profiles(parameters, starts, ends, peak_time_ranges, rng,
+                                                                 appliances=appliances_list)
+
+        # days x appliances x minutes of day -> appliances x minutes
+        load_profile_array = np.ascontiguousarray(days_profiles.transpose(1, 0, 2)).reshape(len(appliances_list), -1)
+
+        return load_profile_array, pd.Index(appliances_list)
+
+    def iter_load_profile_blocks(self, pue_dict, days, block_days=7, workers=1, engine='ramp'):
         """
-        Calculates timerseries of switch-on power peaks based in RAMP-modelled PUE load profiles
-        :param load_profiles:
+        Generate load profiles and peak power minute maxima block by block of days (e.g. weeks)
+        -> use cases of a block are discarded after it is yielded: memory depends on block_days, not on the number of
+           days (e.g. 10-20 years for lifetime simulations)
+        -> with RAMP every day has its own random streams: the load profiles do not depend on block_days
+           (the numpy engine draws one stream per block, see run_use_cases_numpy)
         :param pue_dict:
-        :param seconds_timeseries:
-        :return: df containing peak power timeseries with seconds resolution,
-        timeseries resampled to min with max peak power within that minute
+        :param days: DatetimeIndex of days to generate
+        :param block_days: number of days per block
+        :param workers: number of worker processes (see run_use_cases)
+        :param engine: 'ramp' or 'numpy' (see run_use_cases)
+        :return: generator of (1 min timeseries, float32 array of load profiles (appliances x minutes),
+        index of appliance names, df of switch-on events, df of max peak power within every minute) of every block
         """
 
-        start_up_times = load_profiles.copy()
+        days = pd.DatetimeIndex(days)
+        previous_minute = None  # last minute of the previous block -> switch-on events at midnight
+        for first_day in range(0, len(days), block_days):
+            block = days[first_day:first_day + block_days]
+            timeseries = pd.date_range(block[0], periods=len(block) * 24 * 60, freq="Min")
 
-        # Set all values that equal 0.001 to 0 -> fix for RAMP marking usage windows with 0.001
-        start_up_times[start_up_times == 0.001] = 0
+            with instrumentation.span('initialise_use_cases'):
+                self.draw_usage_windows(pue_dict, block)
+                for day in block:
+                    appliances_list = self.add_use_case(name=day, pue_dict=pue_dict, day=day.day_name(),
+                                                        month=day.month)
 
-        # Set all values to 0 which previous value was not 0 -> only leave "start-up events"
-        start_up_times[start_up_times.shift() != 0] = 0
+            with instrumentation.span('generate_load_profiles'):
+                load_profile_array, appliances = self.run_use_cases_array(appliances_list, workers=workers,
+                                                                          engine=engine)
 
-        # Turn df into numpy array
-        start_up_times = start_up_times
+            with instrumentation.span('peak_power'):
+                peak_power_events, peak_power_minute_max = self.calculate_peak_power_events_array(
+                    load_profile_array, appliances, timeseries, pue_dict, previous_minute=previous_minute)
 
-        # Create new df for peak power profiles
-        peak_power_profiles = pd.DataFrame(columns=start_up_times.columns)
+            previous_minute = load_profile_array[:, -1].copy()
+            self.clear_use_cases()
 
-        # Loop through each appliances start up times
-        for appliance, ts in start_up_times.items():
-            start_up_peak = pue_dict[appliance]['Start-up peak']
-            start_up_duration = pue_dict[appliance]['Start-up duration']
+            yield timeseries, load_profile_array, appliances, peak_power_events, peak_power_minute_max
 
-            # turn ts pandas Series to np array
-            np_ts = ts.to_numpy()
+    def clear_use_cases(self):
+        """
+        Discard all use cases and their usage windows (cached templates and peak windows are kept)
+        :return:
+        """
 
-            # Loop through every timestep
-            i = 0
-            peak_power_array = [0] * len(np_ts)  # preallocate array
-            for elem in np_ts:
-                if elem == 0:  # if no switch on event
-                    peak_power_array[i] = [0] * 60  # add list with 0 for every second
-                else:  # switch on event
-                    # Define list of zeros for this minute
-                    minute = [0] * 60
-                    rand_start = random.randint(0, 60 - start_up_duration)  # draw random start time index
+        self.ramp_use_cases = {}
+        self.use_case_dates = {}
+        self.usage_windows = {}
+        self.use_case_fingerprints = {}
+        self.use_case_inputs = {}
 
-                    # place start up power for length of start-up duration
-                    minute[rand_start:rand_start + start_up_duration] = [start_up_peak] * start_up_duration
-                    peak_power_array[i] = minute.copy()  # save in list
-                i = i + 1
-            # flatten np array and add to peak power_profiles
-            peak_power_profiles[appliance] = np.array(peak_power_array).flatten()
+    def use_case_seeds(self, name, appliances_list):
+        """
+        Get seeds of the random streams used by RAMP to generate one use case (= day)
+        :param name: name of the use case
+        :param appliances_list: list of appliance names
+        :return: dict {'peak_time': seed of peak time range calculation, appliance name: seed of its generation}
+        """
 
-        # Set index of peak_power profiles timeseries to seconds
-        peak_power_profiles.set_index(seconds_timeseries, inplace=True)
-        peak_power_profiles['Total_peak_power'] = peak_power_profiles.sum(axis='columns')
+        date = self.use_case_dates[name]
+
+        seeds = {'peak_time': self.random_streams.seed('peak_time', date)}
+        for appliance in appliances_list:
+            seeds[appliance] = self.random_streams.seed('ramp', date, appliance)
+
+        return seeds
+
+    @instrumentation.span('RampControl.calculate_peak_power_events')
+    def calculate_peak_power_events(self, load_profiles, pue_dict):
+        """
+        Calculates switch-on events with their start-up power peaks based on RAMP-modelled PUE load profiles
+        and the maximum coincident peak power of every minute directly from these events
+        -> no dense seconds resolution timeseries is built
+        :param load_profiles: df of RAMP modelled load profiles (1 min resolution, one column per appliance)
+        :param pue_dict:
+        :return: df of switch-on events (see peak_power.find_switch_on_events),
+        timeseries of max peak power within every minute
+        """
+
+        # Start seconds of the peaks are drawn from every day's and appliance's own random stream
+        events = peak_power.find_switch_on_events(load_profiles, pue_dict, random_streams=self.random_streams)
+        peak_power_minute_max = peak_power.peak_power_minute_max(events, load_profiles.index)
+
+        return events, peak_power_minute_max
 
-        # resample to minutes with the maximum of the summed peak power for every minute
-        peak_power_minute_max = pd.DataFrame(peak_power_profiles['Total_peak_power'].resample('min').max()).rename_axis()
+    @instrumentation.span('RampControl.calculate_peak_power_events_array')
+    def calculate_peak_power_events_array(self, load_profile_array, appliances, timeseries, pue_dict,
+                                          previous_minute=None):
+        """
+        Same as calculate_peak_power_events, but for the plain array of run_use_cases_array
+        :param load_profile_array: array of load profiles (appliances x minutes)
+        :param appliances: appliance names (row labels of the array)
+        :param timeseries: 1 min timeseries (column labels of the array)
+        :param pue_dict:
+        :param previous_minute: load of every appliance in the minute before the array (see
+        peak_power.find_switch_on_events_array)
+        :return: df of switch-on events, timeseries of max peak power within every minute
+        """
+
+        events = peak_power.find_switch_on_events_array(load_profile_array, appliances, timeseries, pue_dict,
+                                                        random_streams=self.random_streams,
+                                                        previous_minute=previous_minute)
+        peak_power_minute_max = peak_power.peak_power_minute_max(events, timeseries)
+
+        return events, peak_power_minute_max
+
+    @instrumentation.span('RampControl.calculate_peak_power_timeseries')
+    def calculate_peak_power_timeseries(self, load_profiles, pue_dict, seconds_timeseries):
+        """
+        Calculates timerseries of switch-on power peaks based in RAMP-modelled PUE load profiles
+        - switch-on events are found for all appliances at once on the minute load profile array
+        - the random start second of every event's peak is drawn in one batch
+        - peaks are scattered into a preallocated seconds x appliances array
+        :param load_profiles: df of RAMP modelled load profiles (1 min resolution, one column per appliance)
+        :param pue_dict:
+        :param seconds_timeseries:
+        :return: df containing peak power timeseries with seconds resolution,
+        timeseries resampled to min with max peak power within that minute
+        """
+
+        events, peak_power_minute_max = self.calculate_peak_power_events(load_profiles, pue_dict)
+
+        # Materialise seconds resolution timeseries for the full duration of the load profiles
+        peak_power_profiles = peak_power.peak_power_seconds(events,
+                                                            start=load_profiles.index[0],
+                                                            end=load_profiles.index[-1] + pd.Timedelta(minutes=1))
+        peak_power_profiles.set_index(seconds_timeseries, inplace=True)
 
         return peak_power_profiles, peak_power_minute_max
 
+
+def generate_use_case_load_profiles(use_case, appliances_list, seeds, peak_window=None, out=None):
+    """
+    Generate the daily load profile of every appliance of one RAMP use case (= day)
+    Module-level function to allow for pickling when run in a process pool
+    :param use_case: RAMP UseCase of this day
+    :param appliances_list: list of appliance names
+    :param seeds: seeds of this day's random streams (see RampControl.use_case_seeds)
+    -> RAMP uses the global random states, which are reseeded before every random process
+    :param peak_window: (mu, sigma) of this use case's peak time (None -> calculated from the use case's users)
+    :param out: array (appliances x 1440) to write the profiles into (None -> new float32 array)
+    :return: array of daily load profiles (appliances x 1440, rows in order of appliances_list)
+    """
+
+    if out is None:
+        out = np.zeros((len(appliances_list), 1440), dtype=np.float32)
+    rows = {app: i for i, app in enumerate(appliances_list)}
+
+    # Calculate peak time range of this use case
+    if peak_window is None:
+        peak_window = peak_window_parameters(use_case.users)
+    seed_global_random_states(seeds['peak_time'])
+    peak_time_range = draw_peak_time_range(peak_window)
+
+    # Loop through all users
+    for user in use_case.users:
+        # Loop through user's appliances
+        for appliance in user.App_list:
+            # Generate appliance load profile
+            # if this appliance has at least one usage window in this use_case (=this day)
+            # otherwise keep zeroes -> no operation on this day
+            if appliance.num_windows > 0:
+                seed_global_random_states(seeds[appliance.name])
+                appliance.generate_load_profile(
+                    prof_i=0,
+                    peak_time_range=peak_time_range,
+                    day_type=0,  # is always week day -> day types defined through different use cases
+                    power=10  # does not matter since we only use duty cycles
+                )
+                out[rows[appliance.name]] = appliance.daily_use
+
+    return out
+
+
+def peak_window_parameters(users):
+    """
+    Deterministic part of ramp.calc_peak_time_range: peak window of the users' total theoretical maximum profile
+    :param users: list of RAMP users of a use case
+    :return: (mu, sigma) of the normally distributed peak time in min
+    """
+
+    tot_max_profile = np.zeros(1440)
+    for user in users:
+        tot_max_profile = tot_max_profile + user.maximum_profile
+    peak_window = np.flatnonzero(tot_max_profile == np.amax(tot_max_profile))
+
+    return round(np.average(peak_window)), 1 / 3 * (peak_window[-1] - peak_window[0])
+
+
+def draw_peak_time_range(peak_window, peak_enlarge=0.15):
+    """
+    Stochastic part of ramp.calc_peak_time_range: draws the peak time and its enlargement
+    -> same draws from python's global random state as RAMP (seed it with seed_global_random_states before)
+    :param peak_window: (mu, sigma) of the peak time (see peak_window_parameters)
+    :param peak_enlarge: percentage random enlargement or reduction of peak time range length
+    :return: array of the minutes of the peak time range
+    """
+
+    mu, sigma = peak_window
+    peak_time = round(random.normalvariate(mu, sigma))
+    # at least 1 min -> if rounded to 0 the peak time range would be empty and RAMP fails (as fixed in RAMP upstream)
+    rand_peak_enlarge = max(round(math.fabs(peak_time - random.gauss(peak_time, peak_enlarge * peak_time))), 1)
+
+    return np.arange(peak_time - rand_peak_enlarge, peak_time + rand_peak_enlarge)
+
+
+def seed_global_random_states(seed):
+    """
+    Seed the global random states of python's random and numpy (used by RAMP)
+    :param seed: int seed (32 bit)
+    """
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def compile_use_case_template(pue_dict, day, month):
+    """
+    Compile the deterministic part of the use cases of one (weekday, month) combination
+    :param pue_dict: nested dict of pue input data or CompiledPueInput
+    :param day: weekday
+    :param month:
+    :return: list of dicts (one per appliance) with name, user and add_appliance() kwargs
+    """
+
+    if not isinstance(pue_dict, dict):
+        return compiled_use_case_template(pue_dict, day, month)
+
+    template = []
+    for appliance, data in pue_dict.items():
+        day_data = data['weekly_preferences'][day]
+        # Get this days func_time (in min) and consider monthly variation of usage time
+        func_time = day_data.loc['Usage time'] * 60
+        func_time = func_time * data['monthly_variation']['Usage time variation'].loc[month]
+
+        template.append({
+            'name': appliance,
+            'user': data['User'],
+            'appliance_kwargs': dict(
+                name=appliance,
+                number=data['Number'],
+                power=data['Nominal power'],
+
+                fixed_cycle=1,  # one duty cycle
+                p_11=data['P1'],
+                t_11=data['t1'],  # start-up time is always 1
+                p_12=data['P1'],
+                t_12=data['t2'],  # steady state duration = total duration - start-up time
+                r_c1=data['Duration variability'],
+
+                func_time=func_time,  # total time of use per day
+                # func_time fraction that is subject to random variability
+                time_fraction_random_variability=day_data.loc['Usage time variability'],
+            )
+        })
+
+    return template
+
+
+def compiled_use_case_template(pue_input, day, month):
+    """
+    Same as compile_use_case_template, but from the arrays of a CompiledPueInput
+    :param pue_input: CompiledPueInput
+    :param day: weekday
+    :param month:
+    :return: list of dicts (one per appliance) with name, user and add_appliance() kwargs
+    """
+
+    weekday = pue_input.weekdays.index(day)
+    func_time = pue_input.func_time(weekday, month - 1).tolist()
+    time_fraction_random_variability = pue_input.usage_time_variability[weekday].tolist()
+    number, power = pue_input.number.tolist(), pue_input.nominal_power.tolist()
+    p1, t1, t2 = pue_input.p1.tolist(), pue_input.t1.tolist(), pue_input.t2.tolist()
+    duration_variability = pue_input.duration_variability.tolist()
+
+    return [{
+        'name': appliance,
+        'user': pue_input.users[a],
+        'appliance_kwargs': dict(
+            name=appliance,
+            number=number[a],
+            power=power[a],
+
+            fixed_cycle=1,  # one duty cycle
+            p_11=p1[a],
+            t_11=t1[a],
+            p_12=p1[a],
+            t_12=t2[a],
+            r_c1=duration_variability[a],
+
+            func_time=func_time[a],
+            time_fraction_random_variability=time_fraction_random_variability[a],
+        )
+    } for a, appliance in enumerate(pue_input.appliances)]
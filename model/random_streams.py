@@ -0,0 +1,76 @@
+import zlib
+
+import numpy as np
+
+
+class RandomStreams:
+    """
+    Independent, reproducible random streams for every (scenario, day, appliance) combination
+    - all streams are derived from one master seed with numpy SeedSequences
+    - the spawn key of a stream only depends on scenario id, date and appliance name (not on the order or number of
+      generated days) -> serial, parallel and partial re-runs of a year draw identical random numbers
+    """
+
+    def __init__(self, master_seed=None, scenario_id=None):
+        """
+        :param master_seed: int master seed (None -> draw fresh entropy, saved in self.master_seed to reproduce run)
+        :param scenario_id: id of the scenario the streams are used for
+        """
+
+        if master_seed is None:
+            master_seed = np.random.SeedSequence().entropy
+
+        self.master_seed = master_seed
+        self.scenario_id = scenario_id
+
+    def seed_sequence(self, purpose, day, appliance=None):
+        """
+        Get SeedSequence of one stream
+        :param purpose: what the stream is used for (e.g. 'windows', 'peak_time', 'ramp', 'peak_power')
+        -> independent streams for every random process of the same day and appliance
+        :param day: date (timestamp) of the day
+        :param appliance: name of the appliance (None -> stream of the whole day)
+        :return: numpy SeedSequence
+        """
+
+        spawn_key = (stable_key(self.scenario_id), stable_key(purpose), day_key(day))
+        if appliance is not None:
+            spawn_key = spawn_key + (stable_key(appliance),)
+
+        return np.random.SeedSequence(self.master_seed, spawn_key=spawn_key)
+
+    def generator(self, purpose, day, appliance=None):
+        """
+        Get numpy random Generator of one stream (see seed_sequence)
+        :return: numpy Generator
+        """
+
+        return np.random.default_rng(self.seed_sequence(purpose, day, appliance))
+
+    def seed(self, purpose, day, appliance=None):
+        """
+        Get int seed of one stream (see seed_sequence) -> to seed the global random states used by RAMP
+        :return: int seed (32 bit)
+        """
+
+        return int(self.seed_sequence(purpose, day, appliance).generate_state(1)[0])
+
+
+def stable_key(value):
+    """
+    Turn a string (or None) into an int that does not change between python sessions (unlike hash())
+    :param value: str or None
+    :return: int
+    """
+
+    return zlib.crc32(str(value).encode())
+
+
+def day_key(day):
+    """
+    Get proleptic Gregorian ordinal of a date -> day key independent of the modelled timeframe
+    :param day: date (datetime.date, datetime.datetime or pandas Timestamp)
+    :return: int
+    """
+
+    return day.toordinal()
@@ -0,0 +1,142 @@
+import os
+import json
+import shutil
+import hashlib
+
+import ramp
+
+
+# Modules whose code determines the generated load profiles -> part of the cache key
+GENERATION_MODULES = ['pipeline.py', 'data_input.py', 'ramp_control.py', 'usage_windows.py', 'random_streams.py',
+                      'peak_power.py', 'load_profile_store.py', 'duty_cycle_engine.py', 'compiled_input.py']
+
+
+def file_hash(file):
+    """
+    :param file: path of a file
+    :return: sha256 hex digest of the file's content
+    """
+
+    sha256 = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(1024**2), b''):
+            sha256.update(block)
+
+    return sha256.hexdigest()
+
+
+def code_version():
+    """
+    Hash of the load profile generation code (modules in GENERATION_MODULES and RAMP version)
+    :return: sha256 hex digest
+    """
+
+    model_dir = os.path.dirname(os.path.abspath(__file__))
+    sha256 = hashlib.sha256()
+    for module in GENERATION_MODULES:
+        sha256.update(module.encode())
+        sha256.update(file_hash(os.path.join(model_dir, module)).encode())
+    sha256.update(str(getattr(ramp, '__version__', None)).encode())
+
+    return sha256.hexdigest()
+
+
+def scenario_cache_key(scenario_id, ramp_input_file, days_nr, seed, start_date, resolution='1min', engine='ramp',
+                       block_days=None):
+    """
+    Key of a scenario's generated load profiles
+    -> same key = same input workbook, generation parameters and code version = identical load profiles
+    :param scenario_id: id of the scenario (part of the key of its random streams)
+    :param ramp_input_file: path of the scenario's RAMP input workbook
+    :param days_nr: number of generated days
+    :param seed: master seed (None -> no key, since the profiles can not be reproduced)
+    :param start_date: first generated day
+    :param resolution: resolution of the load profiles
+    :param engine: engine generating the load profiles (see RampControl.run_use_cases)
+    :param block_days: number of days generated at once (only changes the load profiles of the numpy engine)
+    :return: sha256 hex digest (None if seed is None)
+    """
+
+    if seed is None:
+        return None
+
+    parameters = {
+        'scenario_id': scenario_id,
+        'ramp_input': file_hash(ramp_input_file),
+        'days_nr': days_nr,
+        'seed': seed,
+        'start_date': str(start_date),
+        'resolution': resolution,
+        'engine': engine,
+        'block_days': block_days if engine == 'numpy' else None,
+        'code_version': code_version()
+    }
+
+    return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+
+
+def scenario_files(scenario_information):
+    """
+    :param scenario_information: dict of a scenario's information (see pipeline.generate_scenario_load_profiles)
+    :return: list of paths of all files of the scenario's generated load profiles
+    """
+
+    files = [scenario_information['modelled_load_profiles'], scenario_information['peak_power_events']]
+    files += list(scenario_information.get('load_profile_aggregates', {}).values())
+
+    return files
+
+
+def find_cached_scenario(cache_key, cache_path, exclude_dir=None):
+    """
+    Search all runs in the data cache for load profiles generated with the same key
+    :param cache_key: key of the scenario (see scenario_cache_key)
+    :param cache_path: path of the data cache (e.g. ./data_cache/)
+    :param exclude_dir: run folder not to search (e.g. the current run's)
+    :return: scenario information of the cached scenario (None if not found or files are missing)
+    """
+
+    if cache_key is None or not os.path.isdir(cache_path):
+        return None
+
+    for run_name in sorted(os.listdir(cache_path)):
+        cache_dir_path = os.path.join(cache_path, run_name)
+        info_file = os.path.join(cache_dir_path, 'scenarios_information.json')
+        if exclude_dir is not None and os.path.abspath(cache_dir_path) == os.path.abspath(exclude_dir):
+            continue
+        if not os.path.exists(info_file):
+            continue
+
+        with open(info_file) as file:
+            scenarios_information = json.load(file)
+
+        for scenario_information in scenarios_information.values():
+            if scenario_information.get('cache_key') != cache_key or 'error' in scenario_information:
+                continue
+            if all(os.path.exists(file) for file in scenario_files(scenario_information)):
+                return scenario_information
+
+    return None
+
+
+def reuse_cached_scenario(cached_information, cache_dir_path):
+    """
+    Copy the files of a cached scenario into a run's cache folder
+    -> copies instead of links: overwriting the source run (e.g. --overwrite) must not change this run's files
+    :param cached_information: scenario information of the cached scenario (see find_cached_scenario)
+    :param cache_dir_path: path of the run's cache folder
+    :return: scenario information with paths in the run's cache folder
+    """
+
+    def copy(file):
+        new_file = cache_dir_path + os.path.basename(file)
+        shutil.copyfile(file, new_file)
+        return new_file
+
+    scenario_information = dict(cached_information)
+    scenario_information['modelled_load_profiles'] = copy(cached_information['modelled_load_profiles'])
+    scenario_information['peak_power_events'] = copy(cached_information['peak_power_events'])
+    scenario_information['load_profile_aggregates'] = {
+        resolution: copy(file) for resolution, file in cached_information.get('load_profile_aggregates', {}).items()}
+
+    return scenario_information
@@ -0,0 +1,207 @@
+import pandas as pd
+import pyomo.environ as po
+from pyomo.contrib.appsi import solvers as appsi_solvers
+
+from oemof import solph
+
+from model import instrumentation
+
+
+# Persistent solver interfaces of pyomo (appsi) -> keep the model between solves and only update changed parameters
+PERSISTENT_SOLVERS = {
+    'highs': appsi_solvers.Highs,
+    'gurobi': appsi_solvers.Gurobi,
+    'cplex': appsi_solvers.Cplex,
+    'cbc': appsi_solvers.Cbc
+}
+
+# Unsupplied demand storages and the fractions of general_data limiting them
+UNSUPPLIED_DEMAND = {
+    'total': ('unsupplied_total_demand_l', 'unsupplied_total_demand'),
+    'pue': ('unsupplied_pue_demand_l', 'unsupplied_pue_demand'),
+    'household': ('unsupplied_household_demand_l', 'unsupplied_household_demand')
+}
+
+
+class SensitivityModel:
+    """
+    Sizing model (OemofModel) built once and solved repeatedly with changed parameters
+    - capital costs of the invested components (capex, wacc), scale of the PV profiles and the energy that can be left
+      unsupplied are mutable -> changing them does not rebuild the energysystem and solph model
+    - capital costs: mutable pyomo Params, the objective is corrected by (capital_cost - base capital_cost) * invest
+    - PV scale: mutable pyomo Param in the fixed PV flows (flow = pv_scale * fix * total capacity)
+    - unsupplied demand: initial content and bounds of the unsupplied demand storages
+    -> persistent solvers (see PERSISTENT_SOLVERS) keep the model between solves, HiGHS restarts from the previous basis
+    """
+
+    @instrumentation.span('SensitivityModel.__init__')
+    def __init__(self, mg_model, solver='highs'):
+        """
+        :param mg_model: OemofModel without fixed capacities (sizing), the energysystem is built here
+        :param solver: name of the solver -> persistent interface if in PERSISTENT_SOLVERS and available, otherwise
+        solved with solph (model is not rebuilt, but written to the solver for every solve)
+        """
+
+        if mg_model.capacities is not None:
+            raise ValueError('Sensitivity runs require a sizing model (capacities=None)')
+
+        self.mg_model = mg_model
+        self.solver = solver
+
+        mg_model.build_energysystem()
+        om = mg_model.om
+        nodes = mg_model.energysystem.groups
+        bus_ac = nodes['bus_ac_l']
+
+        # Investment variables of the components
+        self.invest = {}
+        pv_components = [component for component, exists in [('pv', mg_model.pv_south_exists),
+                                                              ('pv_east', mg_model.pv_east_west_exists),
+                                                              ('pv_west', mg_model.pv_east_west_exists)] if exists]
+        for component in pv_components + ['battery_inverter']:
+            self.invest[component] = om.InvestmentFlowBlock.invest[nodes[component + '_l'], bus_ac, 0]
+        self.invest['battery_capacity'] = om.GenericInvestmentStorageBlock.invest[nodes['battery_l'], 0]
+        if mg_model.components_data['genset']['exists'] != 0:
+            self.invest['genset'] = om.InvestmentFlowBlock.invest[nodes['genset_l'], bus_ac, 0]
+
+        # -- Capital costs -> mutable Params, objective corrected by the change to the costs the model is built with
+        base_capital_cost = {component: mg_model.components_specific_costs[component]['capital_cost']
+                             for component in self.invest}
+        om.sensitivity = po.Block()
+        om.sensitivity.capital_cost = po.Param(list(self.invest), mutable=True, initialize=base_capital_cost)
+        om.objective.expr = om.objective.expr + sum(
+            (om.sensitivity.capital_cost[component] - base_capital_cost[component]) * invest
+            for component, invest in self.invest.items())
+
+        # -- PV scale -> solph's fixed investment flows of PV are replaced by scaled ones
+        self.pv_flows = [(nodes[component + '_l'], bus_ac) for component in pv_components]
+        om.sensitivity.pv_scale = po.Param(mutable=True, initialize=1)
+
+        def _pv_fixed_rule(block, i, o, p, t):
+            return (om.flow[i, o, p, t]
+                    == block.pv_scale * om.flows[i, o].fix[t] * om.InvestmentFlowBlock.total[i, o, p])
+
+        om.sensitivity.pv_fixed = po.Constraint(self.pv_flows, om.TIMEINDEX, rule=_pv_fixed_rule)
+        for i, o in self.pv_flows:
+            for p, t in om.TIMEINDEX:
+                om.InvestmentFlowBlock.fixed[i, o, p, t].deactivate()
+
+        # -- Unsupplied demand storages (only limits > 0 in the built model have a storage)
+        self.unsupplied_storages = {demand: nodes[label] for demand, (label, _) in UNSUPPLIED_DEMAND.items()
+                                    if label in nodes}
+
+        # Persistent solver -> the model is loaded into the solver at the first solve
+        self.persistent_solver = None
+        if solver in PERSISTENT_SOLVERS and PERSISTENT_SOLVERS[solver]().available():
+            self.persistent_solver = PERSISTENT_SOLVERS[solver]()
+        else:
+            print('no persistent interface for solver ' + solver + ' -> model is written to the solver every solve')
+
+    def set_parameters(self, wacc=None, specific_capex=None, pv_scale=None, unsupplied_demand=None):
+        """
+        Update the parameters of the model (None -> unchanged)
+        -> components_specific_costs and unsupplied demand of the OemofModel are updated for its results
+        :param wacc: weighted average cost of capital
+        :param specific_capex: dict of specific capex {component: capex}
+        :param pv_scale: factor of the PV profiles (e.g. 0.9 -> 10 % less PV generation)
+        :param unsupplied_demand: dict of fractions of demand that can be left unsupplied {'total': ..., 'pue': ...,
+        'household': ...} (see general_data)
+        """
+
+        mg_model = self.mg_model
+        om = mg_model.om
+
+        # Copies -> system_data tables may be shared with other models
+        mg_model.general_data = dict(mg_model.general_data)
+        mg_model.components_data = {component: dict(data) for component, data in mg_model.components_data.items()}
+
+        # -- Capital costs
+        if wacc is not None:
+            mg_model.general_data['wacc'] = wacc
+        for component, capex in (specific_capex or {}).items():
+            mg_model.components_data[component]['specific_capex'] = capex
+        mg_model.components_specific_costs = mg_model.calc_components_costs()
+        for component in self.invest:
+            om.sensitivity.capital_cost[component] = mg_model.components_specific_costs[component]['capital_cost']
+
+        # -- PV scale
+        if pv_scale is not None:
+            om.sensitivity.pv_scale = pv_scale
+
+        # -- Unsupplied demand -> initial content and upper bound of the unsupplied demand storages
+        for demand, fraction in (unsupplied_demand or {}).items():
+            mg_model.general_data[UNSUPPLIED_DEMAND[demand][1]] = fraction
+        mg_model.calc_unsupplied_demand()
+        limits = {'total': mg_model.unsupplied_total_demand,
+                  'pue': mg_model.unsupplied_pue_demand,
+                  'household': mg_model.unsupplied_household_demand}
+        for demand, limit in limits.items():
+            if demand not in self.unsupplied_storages:
+                if limit != 0:
+                    raise ValueError('Unsupplied ' + demand + ' demand is 0 in the built model and cannot be changed')
+                continue
+            storage = self.unsupplied_storages[demand]
+            for t in om.TIMEPOINTS:
+                om.GenericStorageBlock.storage_content[storage, t].setub(limit)
+            om.GenericStorageBlock.storage_content[storage, 0].fix(limit)
+
+    def parameters(self):
+        """
+        :return: dict of the parameters the model is solved with {'wacc': ..., 'specific_capex_<component>': ...,
+        'pv_scale': ..., 'unsupplied_<demand>_demand': fraction}
+        """
+
+        mg_model = self.mg_model
+
+        parameters = {'wacc': mg_model.general_data['wacc']}
+        for component in self.invest:
+            parameters['specific_capex_' + component] = mg_model.components_data[component]['specific_capex']
+        parameters['pv_scale'] = mg_model.om.sensitivity.pv_scale.value
+        for _, fraction_key in UNSUPPLIED_DEMAND.values():
+            parameters[fraction_key] = mg_model.general_data[fraction_key]
+
+        return parameters
+
+    @instrumentation.span('SensitivityModel.solve')
+    def solve(self):
+        """
+        Solve the model with the current parameters and extract the results of the OemofModel
+        (see OemofModel.extract_results)
+        """
+
+        mg_model = self.mg_model
+
+        print('solve model')
+        with instrumentation.span('solve'):
+            if self.persistent_solver is not None:
+                self.persistent_solver.solve(mg_model.om)
+            else:
+                mg_model.om.solve(solver=self.solver)
+
+        print('process results')
+        with instrumentation.span('solph.processing.results'):
+            mg_model.results_oemof = solph.processing.results(mg_model.om)
+
+        mg_model.extract_results(mg_model.results_oemof)
+
+    @instrumentation.span('SensitivityModel.sweep')
+    def sweep(self, parameter_sets):
+        """
+        Solve the model for every set of parameters
+        :param parameter_sets: list of dicts of keyword arguments of set_parameters, e.g. [{'wacc': 0.05}, {'wacc': 0.1}]
+        -> parameters not given in a set keep the value of the previous set
+        :return: df of the parameters in effect, total capacities and LCOE of every set (one row per set)
+        """
+
+        results = []
+        for set_nr, parameters in enumerate(parameter_sets):
+            print('sensitivity run ' + str(set_nr + 1) + '/' + str(len(parameter_sets)) + ': ' + str(parameters))
+            self.set_parameters(**parameters)
+            self.solve()
+
+            result = self.parameters()
+            result.update(self.mg_model.results_components_capacities.loc['capacity_total'].to_dict())
+            result['LCOE'] = self.mg_model.results_system['LCOE']
+            results.append(result)
+
+        return pd.DataFrame(results)
@@ -0,0 +1,260 @@
+import numpy as np
+import pandas as pd
+from pyomo.environ import Block, Constraint, Expression, NonNegativeReals, NonPositiveReals, Var, value
+
+
+class TypicalPeriods:
+    """
+    Aggregation of the model timeseries into typical periods (e.g. days or weeks)
+    - the periods of the timeseries are clustered with k-medoids -> every cluster is represented by its medoid
+      (an actual period of the input data, no averaged profiles)
+    - extreme periods (e.g. peak load, lowest PV generation) are kept as periods of their own
+    - an incomplete last period is kept as period of its own
+    - the typical periods are laid end-to-end on a reduced timeindex, every timestep is weighted with the number of
+      periods its typical period represents (see objective_weighting)
+    """
+
+    def __init__(self, timeseries, typical_periods_nr, period_length='1D', extreme_periods=None):
+        """
+        :param timeseries: df of model timeseries (DatetimeIndex with freq, columns normalised e.g. to capacity factors)
+        :param typical_periods_nr: number of typical periods (clusters, excluding extreme and incomplete periods)
+        :param period_length: length of a period (e.g. '1D', '7D')
+        :param extreme_periods: dict {column: 'max' -> period containing the column's maximum, 'min_sum' -> period
+        with the column's lowest sum} of periods kept as extreme periods (None -> no extreme periods)
+        """
+
+        if typical_periods_nr < 1:
+            raise ValueError('Number of typical periods must be at least 1, got ' + str(typical_periods_nr))
+
+        self.full_index = timeseries.index
+        steps_per_period = int(pd.Timedelta(period_length) / pd.Timedelta(pd.tseries.frequencies.to_offset(
+            timeseries.index.freq)))
+        if steps_per_period < 1:
+            raise ValueError('Period length ' + str(period_length) + ' is shorter than the model timestep')
+
+        # Periods of the full timeseries (the last one can be incomplete)
+        periods_nr = int(np.ceil(len(timeseries) / steps_per_period))
+        period_of_step = np.arange(len(timeseries)) // steps_per_period
+        complete_nr = len(timeseries) // steps_per_period
+
+        # Extreme periods (only complete periods are compared by their sum)
+        extreme = []
+        for column, kind in (extreme_periods or {}).items():
+            if column not in timeseries.columns:
+                continue
+            if kind == 'max':
+                period = int(period_of_step[np.nanargmax(timeseries[column].to_numpy())])
+            elif kind == 'min_sum':
+                if complete_nr == 0:
+                    continue
+                sums = np.nansum(timeseries[column].to_numpy()[:complete_nr * steps_per_period].reshape(complete_nr, -1),
+                                 axis=1)
+                period = int(sums.argmin())
+            else:
+                raise ValueError('Unknown kind of extreme period: ' + str(kind))
+            if period not in extreme:
+                extreme.append(period)
+
+        # Cluster all other complete periods (one row of all columns' values per period)
+        candidates = np.array([p for p in range(complete_nr) if p not in extreme], dtype=int)
+        features = timeseries.to_numpy(dtype=float)[:complete_nr * steps_per_period].reshape(complete_nr, -1)
+        features = np.nan_to_num(features[candidates])
+        if len(candidates) > 0:
+            # Euclidean distances from the Gram matrix (no periods x periods x features array)
+            squared = (features ** 2).sum(axis=1)
+            distances = np.sqrt(np.maximum(squared[:, None] + squared[None, :] - 2 * features @ features.T, 0))
+            medoids, labels = k_medoids(distances, min(typical_periods_nr, len(candidates)))
+            medoids = candidates[medoids]
+        else:
+            medoids, labels = np.array([], dtype=int), np.array([], dtype=int)
+
+        # Representative (original) period of every typical period: medoids, extreme periods, incomplete period
+        incomplete = [periods_nr - 1] if complete_nr < periods_nr and periods_nr - 1 not in extreme else []
+        self.representatives = list(medoids) + extreme + incomplete
+
+        # Typical period of every original period
+        self.order = np.zeros(periods_nr, dtype=int)
+        self.order[candidates] = labels
+        for i, period in enumerate(self.representatives[len(medoids):]):
+            self.order[period] = len(medoids) + i
+
+        # Number of original periods every typical period represents
+        self.period_weights = np.bincount(self.order, minlength=len(self.representatives))
+
+        # Position of every typical period's steps in the full timeseries
+        full_positions = [np.flatnonzero(period_of_step == period) for period in self.representatives]
+        self.period_lengths = np.array([len(positions) for positions in full_positions])
+        self.period_starts = np.concatenate([[0], np.cumsum(self.period_lengths)[:-1]]).astype(int)
+
+        # Reduced timeseries (typical periods end-to-end) with its own contiguous index
+        reduced_index = pd.date_range(self.full_index[0], periods=self.period_lengths.sum(), freq=self.full_index.freq)
+        self.timeseries = timeseries.iloc[np.concatenate(full_positions)].set_axis(reduced_index)
+
+        # Weight of every reduced timestep
+        self.timestep_weights = np.repeat(self.period_weights, self.period_lengths).astype(float)
+
+        # Reduced timestep of every full timestep (to map results back to the full timeseries)
+        self.reduced_positions = (self.period_starts[self.order][period_of_step]
+                                  + np.arange(len(timeseries)) - period_of_step * steps_per_period)
+
+    def objective_weighting(self):
+        """
+        :return: list of objective weights of every reduced timestep (solph.Model objective_weighting)
+        -> hours of the timestep x number of periods its typical period represents
+        """
+
+        hours = pd.Timedelta(pd.tseries.frequencies.to_offset(self.full_index.freq)) / pd.Timedelta(hours=1)
+
+        return list(hours * self.timestep_weights)
+
+    def expand(self, df):
+        """
+        Map a df of the reduced timeseries (e.g. result sequences) back to the full timeseries
+        :param df: df with one row per reduced timestep
+        :return: df with one row per full timestep
+        """
+
+        return pd.DataFrame(df.to_numpy()[self.reduced_positions], index=self.full_index, columns=df.columns)
+
+    def expand_storage_content(self, om, storage, name='inter_period_storage'):
+        """
+        Storage content of the full timeseries: level at the start of every original period
+        (see add_inter_period_storage_constraints) + content change within its typical period
+        :param om: solved solph Model
+        :param storage: GenericStorage linked with add_inter_period_storage_constraints
+        :param name: name of the linking block
+        :return: series of storage content of every full timestep
+        """
+
+        linking = getattr(om, name)
+        block = om.GenericInvestmentStorageBlock
+        content = np.array([block.storage_content[storage, t].value for t in range(len(self.timeseries))])
+        start = np.array([linking.period_start_content[storage, c].value for c in range(len(self.representatives))])
+        inter = np.array([value(linking.inter_content[d]) for d in range(len(self.order))])
+
+        # Content change within the typical period + level at the start of the original period
+        period_of_step = np.repeat(np.arange(len(self.order)), self.period_lengths[self.order])
+        intra = content[self.reduced_positions] - start[self.order][period_of_step]
+
+        return pd.Series(inter[period_of_step] + intra, index=self.full_index)
+
+
+def k_medoids(distances, k, max_iterations=100):
+    """
+    Cluster items into k clusters represented by medoids (greedy build of the medoids, then alternating assignment
+    and medoid update until the medoids do not change)
+    :param distances: array (items x items) of pairwise distances
+    :param k: number of clusters
+    :param max_iterations: maximum number of assignment and update iterations
+    :return: array of the medoids' items, array of every item's cluster
+    """
+
+    # Greedy build -> first medoid minimises the total distance, every next one reduces it the most
+    medoids = [int(distances.sum(axis=1).argmin())]
+    nearest = distances[medoids[0]].copy()
+    while len(medoids) < k:
+        gain = np.maximum(nearest[None, :] - distances, 0).sum(axis=1)
+        gain[medoids] = -1
+        medoids.append(int(gain.argmax()))
+        nearest = np.minimum(nearest, distances[medoids[-1]])
+
+    for _ in range(max_iterations):
+        labels = distances[:, medoids].argmin(axis=1)
+        # New medoid of every cluster -> member with the smallest total distance to the other members
+        updated = []
+        for cluster in range(k):
+            members = np.flatnonzero(labels == cluster)
+            updated.append(int(members[distances[np.ix_(members, members)].sum(axis=1).argmin()]))
+        if updated == medoids:
+            break
+        medoids = updated
+
+    return np.array(medoids, dtype=int), distances[:, medoids].argmin(axis=1)
+
+
+def add_inter_period_storage_constraints(om, storage, typical_periods, name='inter_period_storage'):
+    """
+    Link the storage content of the typical periods over the full (chronological) sequence of original periods
+    (storage content formulation of Kotzur et al. 2018)
+    - every typical period starts from its own content (the storage balance between typical periods is replaced)
+    - the content at the start of every original period follows from the previous one and the content change within
+      the previous period's typical period
+    - the content at the start of every original period + the highest / lowest content change within its typical
+      period stay within the storage's min and max content (losses within the period are neglected here)
+    -> variables are indexed by (storage, typical period) -> processed by solph.processing.results as the storage's
+       scalars, the contents at the start of the original periods are expressions (see expand_storage_content)
+    :param om: solph Model built on the reduced timeseries (investment storage, no multi-period model)
+    :param storage: GenericStorage with investment
+    :param typical_periods: TypicalPeriods of the reduced timeseries
+    :param name: name of the block added to the model
+    :return:
+    """
+
+    block = om.GenericInvestmentStorageBlock
+    inflow = list(storage.inputs)[0]
+    outflow = list(storage.outputs)[0]
+    typical = [(storage, c) for c in range(len(typical_periods.representatives))]
+    periods_nr = len(typical_periods.order)
+    starts = typical_periods.period_starts
+    lasts = starts + typical_periods.period_lengths - 1
+
+    linking = Block()
+    om.add_component(name, linking)
+
+    # Content at the start of every typical period and highest / lowest content change within it
+    linking.period_start_content = Var(typical, within=NonNegativeReals)
+    linking.period_content_max = Var(typical, within=NonNegativeReals)
+    linking.period_content_min = Var(typical, within=NonPositiveReals)
+    # Content at the start of the first original period
+    linking.initial_content = Var([storage], within=NonNegativeReals)
+
+    def balance_first_rule(_, n, c):
+        t = int(starts[c])
+        expr = block.storage_content[n, t]
+        expr += -linking.period_start_content[n, c] * (1 - n.loss_rate[t]) ** om.timeincrement[t]
+        expr += n.fixed_losses_relative[t] * block.total[n, 0] * om.timeincrement[t]
+        expr += n.fixed_losses_absolute[t] * om.timeincrement[t]
+        expr += -om.flow[inflow, n, 0, t] * n.inflow_conversion_factor[t] * om.timeincrement[t]
+        expr += om.flow[n, outflow, 0, t] / n.outflow_conversion_factor[t] * om.timeincrement[t]
+        return expr == 0
+
+    # Typical periods start from their own content instead of the previous typical period's last content
+    # -> first typical period starts from the storage's initial content
+    for c in range(1, len(typical)):
+        block.balance[storage, 0, int(starts[c])].deactivate()
+    linking.balance_first = Constraint(typical[1:], rule=balance_first_rule)
+    linking.first_period_start = Constraint(expr=linking.period_start_content[storage, 0] == block.init_content[storage])
+
+    steps = [(n, c, t) for n, c in typical for t in range(int(starts[c]), int(lasts[c]) + 1)]
+    linking.content_max_bound = Constraint(steps, rule=lambda _, n, c, t: (
+        linking.period_content_max[n, c] >= block.storage_content[n, t] - linking.period_start_content[n, c]))
+    linking.content_min_bound = Constraint(steps, rule=lambda _, n, c, t: (
+        linking.period_content_min[n, c] <= block.storage_content[n, t] - linking.period_start_content[n, c]))
+
+    def inter_content_rule(_, d):
+        if d == 0:
+            return linking.initial_content[storage]
+        c = int(typical_periods.order[d - 1])
+        hours = sum(om.timeincrement[t] for t in range(int(starts[c]), int(lasts[c]) + 1))
+        return (linking.inter_content[d - 1] * (1 - storage.loss_rate[int(starts[c])]) ** hours
+                + block.storage_content[storage, int(lasts[c])] - linking.period_start_content[storage, c])
+
+    # Content at the start of every original period (+ end of the last one)
+    linking.inter_content = Expression(range(periods_nr + 1), rule=inter_content_rule)
+
+    def inter_max_rule(_, d):
+        c = int(typical_periods.order[d])
+        return (linking.inter_content[d] + linking.period_content_max[storage, c]
+                <= storage.max_storage_level[int(starts[c])] * block.total[storage, 0])
+
+    def inter_min_rule(_, d):
+        c = int(typical_periods.order[d])
+        return (linking.inter_content[d] + linking.period_content_min[storage, c]
+                >= storage.min_storage_level[int(starts[c])] * block.total[storage, 0])
+
+    linking.inter_max = Constraint(range(periods_nr + 1), rule=lambda _, d: (
+        linking.inter_content[d] <= storage.max_storage_level[0] * block.total[storage, 0]) if d == periods_nr
+        else inter_max_rule(_, d))
+    linking.inter_min = Constraint(range(periods_nr + 1), rule=lambda _, d: (
+        linking.inter_content[d] >= storage.min_storage_level[0] * block.total[storage, 0]) if d == periods_nr
+        else inter_min_rule(_, d))
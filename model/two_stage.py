@@ -0,0 +1,159 @@
+import pandas as pd
+
+from model import instrumentation
+from model.oemof_model import UNSUPPLIED_EXCESS_FLOWS
+
+
+@instrumentation.span('two_stage.two_stage_sizing')
+def two_stage_sizing(create_model, sizing_freq='1h', dispatch_freq='1min', solver='cbc', horizon='1D', overlap='12h',
+                     margin=0.0, max_iterations=1, tolerance=0.0):
+    """
+    Two-stage sizing of the microgrid
+    - stage one: PV, battery and inverter capacities are optimised at the coarse sizing_freq
+    - stage two: the dispatch of these capacities is optimised at the fine dispatch_freq (see check_capacities)
+    :param create_model: function(freq, **OemofModel kwargs) returning an OemofModel of the input data at freq
+    (e.g. functools.partial of pipeline.scenario_model)
+    :param sizing_freq: frequency of the sizing model
+    :param dispatch_freq: frequency of the dispatch model
+    :param solver: name of the solver
+    :param horizon: length of the kept part of every rolling horizon window (see OemofModel.solve_rolling_horizon)
+    :param overlap: look-ahead of every rolling horizon window
+    :param margin: relative capacity margin added when the dispatch shows violations (see check_capacities)
+    :param max_iterations: maximum number of dispatch runs
+    :param tolerance: energy [kWh] left unsupplied beyond the limits that is accepted
+    :return: solved sizing OemofModel, last solved dispatch OemofModel, df of the dispatch check of every iteration
+    """
+
+    # -- Stage one: sizing at coarse resolution
+    print('two-stage sizing: size capacities at ' + sizing_freq)
+    sizing_model = create_model(freq=sizing_freq)
+    sizing_model.solve(solver=solver)
+    capacities = sizing_model.results_components_capacities.loc['capacity_total'].to_dict()
+
+    # -- Stage two: dispatch of the fixed capacities at fine resolution
+    print('two-stage sizing: check capacities at ' + dispatch_freq)
+    dispatch_model, dispatch_checks = check_capacities(
+        lambda capacities: create_model(freq=dispatch_freq, capacities=capacities, peak_power_model=False),
+        capacities, solver=solver, horizon=horizon, overlap=overlap, margin=margin, max_iterations=max_iterations,
+        tolerance=tolerance)
+
+    return sizing_model, dispatch_model, dispatch_checks
+
+
+def check_capacities(create_dispatch_model, capacities, solver='cbc', horizon='1D', overlap='12h', margin=0.0,
+                     max_iterations=1, tolerance=0.0):
+    """
+    Dispatch fixed capacities with a rolling horizon and check the unsupplied energy and peak power of the dispatch
+    (see dispatch_check)
+    -> with violations and max_iterations > 1 capacity margins are added and the dispatch is repeated:
+       - energy left unsupplied beyond the limits -> PV and battery capacity + margin
+       - peak power above the battery inverter's or battery storage's peak power -> capacity raised to the required
+         peak power (+ margin)
+    :param create_dispatch_model: function(capacities) returning an OemofModel with these fixed capacities
+    :param capacities: dict of total capacities {component: capacity}
+    :param solver: name of the solver
+    :param horizon: length of the kept part of every rolling horizon window
+    :param overlap: look-ahead of every rolling horizon window
+    :param margin: relative capacity margin added per iteration (e.g. 0.05)
+    :param max_iterations: maximum number of dispatch runs
+    :param tolerance: energy [kWh] left unsupplied beyond the limits that is accepted
+    :return: last solved dispatch OemofModel, df of the capacities and dispatch check of every iteration
+    """
+
+    capacities = dict(capacities)
+    dispatch_checks = []
+    for iteration in range(max_iterations):
+        with instrumentation.span('dispatch_iteration'):
+            dispatch_model = create_dispatch_model(capacities)
+            dispatch_model.solve_rolling_horizon(horizon=horizon, overlap=overlap, solver=solver)
+
+        check = dispatch_check(dispatch_model)
+        dispatch_checks.append(dict(capacities, **check))
+        print('dispatch check ' + str(iteration + 1) + ': ' + str(round(check['unsupplied_excess_energy'], 3))
+              + ' kWh unsupplied beyond the limits, ' + str(check['peak_violation_steps']) + ' peak power violations')
+
+        # Add margins to the violated capacities
+        new_capacities = dict(capacities)
+        if check['unsupplied_excess_energy'] > tolerance:
+            new_capacities['pv'] = capacities['pv'] * (1 + margin)
+            new_capacities['battery_capacity'] = capacities['battery_capacity'] * (1 + margin)
+        if check['peak_violation_steps'] > 0:
+            new_capacities['battery_inverter'] = max(capacities['battery_inverter'],
+                                                     check['required_battery_inverter'] * (1 + margin))
+            new_capacities['battery_capacity'] = max(new_capacities['battery_capacity'],
+                                                     check['required_battery_capacity'] * (1 + margin))
+
+        # No violations or no margin to add -> capacities are final
+        if new_capacities == capacities:
+            break
+        capacities = new_capacities
+
+    return dispatch_model, pd.DataFrame(dispatch_checks)
+
+
+def dispatch_check(dispatch_model):
+    """
+    Unsupplied energy and peak power violations of a dispatch with fixed capacities
+    - peak power: battery inverter flow + peak power demand (as in the peak power model) compared to the peak power
+      of the battery inverter (capacity * peak_power_ratio) and battery storage (capacity * c-rate * peak_power_ratio)
+    :param dispatch_model: OemofModel with fixed capacities and results (see OemofModel.solve_rolling_horizon)
+    -> raises an Exception if energy delivered + unsupplied energy (within and beyond the limits) != demand
+    :return: dict {
+    energy_demand: energy demand of the loads [kWh]
+    energy_delivered: energy delivered by the system's components to the loads [kWh]
+    unsupplied_energy: energy left unsupplied within the limits of unsupplied demand [kWh]
+    unsupplied_excess_energy: energy left unsupplied beyond the limits [kWh]
+    peak_violation_steps: number of timesteps with peak power above the battery inverter's or storage's peak power
+    peak_violation_max: maximum peak power above the peak power of battery inverter or storage [kW]
+    required_battery_inverter: battery inverter capacity supplying all peaks [kW]
+    required_battery_capacity: battery capacity supplying all peaks [kWh]
+    }
+    """
+
+    flows = dispatch_model.results_ac_flows
+    capacities = dispatch_model.capacities
+    battery_data = dispatch_model.components_data['battery_capacity']
+    inverter_data = dispatch_model.components_data['battery_inverter']
+    timestep_hours = (pd.Timedelta(pd.tseries.frequencies.to_offset(dispatch_model.timeseries.index.freq))
+                      / pd.Timedelta('1h'))
+
+    unsupplied_flows = [flow for flow in ['unsupplied_total_demand_l - bus_ac_l',
+                                          'unsupplied_pue_demand_l - bus_ac_pue_l',
+                                          'unsupplied_household_demand_l - bus_ac_household_l'] if flow in flows]
+    excess_flows = [flow for flow in UNSUPPLIED_EXCESS_FLOWS if flow in flows]
+
+    # Peak power required from the battery inverter in every timestep
+    peak_power = dispatch_model.timeseries['peak_power'] * dispatch_model.peak_power_nominal
+    required_peak_power = peak_power + flows['battery_inverter_l - bus_ac_l'].reindex(peak_power.index).fillna(0)
+    available_peak_power = min(capacities['battery_inverter'] * inverter_data['peak_power_ratio'],
+                               capacities['battery_capacity'] * battery_data['c-rate'] * battery_data['peak_power_ratio'])
+    peak_violation = (required_peak_power - available_peak_power).clip(lower=0)
+
+    # Energy balance of the loads: demand = delivered by the system + unsupplied (within and beyond the limits)
+    # -> delivered through the AC bus links, unsupplied total demand is fed into the AC bus and deducted
+    demand_flows = [flow for flow in ['bus_ac_pue_l - pue_load_l', 'bus_ac_household_l - household_baseload_l']
+                    if flow in flows]
+    energy_demand = flows[demand_flows].sum().sum() * timestep_hours
+    energy_delivered = flows[['bus_ac_l - ac_pue_bus_link_l', 'bus_ac_l - ac_household_bus_link_l']].sum().sum() \
+        * timestep_hours
+    if 'unsupplied_total_demand_l - bus_ac_l' in flows:
+        energy_delivered -= flows['unsupplied_total_demand_l - bus_ac_l'].sum() * timestep_hours
+    unsupplied_energy = flows[unsupplied_flows].sum().sum() * timestep_hours
+    unsupplied_excess_energy = flows[excess_flows].sum().sum() * timestep_hours
+
+    energy_balance_error = energy_demand - energy_delivered - unsupplied_energy - unsupplied_excess_energy
+    if abs(energy_balance_error) > 1e-6 * max(energy_demand, 1):
+        raise Exception('Energy delivered and left unsupplied does not add up to the demand of the dispatch: '
+                        + str(energy_balance_error) + ' kWh difference')
+
+    return {
+        'energy_demand': energy_demand,
+        'energy_delivered': energy_delivered,
+        'unsupplied_energy': unsupplied_energy,
+        'unsupplied_excess_energy': unsupplied_excess_energy,
+        'peak_violation_steps': int((peak_violation > 1e-6).sum()),
+        'peak_violation_max': peak_violation.max(),
+        'required_battery_inverter': required_peak_power.max() / inverter_data['peak_power_ratio'],
+        'required_battery_capacity': required_peak_power.max() / (battery_data['c-rate']
+                                                                  * battery_data['peak_power_ratio'])
+    }
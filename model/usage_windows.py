@@ -0,0 +1,100 @@
+import pandas as pd
+import numpy as np
+
+
+WINDOWS = [1, 2, 3]     # usage windows per day and appliance (RAMP allows max. 3)
+
+
+def window_parameters(pue_input, weekdays):
+    """
+    Collect the usage window parameters of all appliances into one array
+    :param pue_input: nested dict of pue input data (see InputData.read_pue_input) or CompiledPueInput
+    :param weekdays: list of weekday names (columns of weekly_preferences)
+    :return: array (weekdays x appliances x windows x [start, start_var, end, end_var]) in hours,
+    NaN for windows that are not defined
+    """
+
+    if not isinstance(pue_input, dict):
+        # Compiled input (see compiled_input.CompiledPueInput) -> windows of all weekdays are compiled already
+        return pue_input.window_parameters[[pue_input.weekdays.index(weekday) for weekday in weekdays]]
+
+    rows = [['window_' + str(i) + '_start', 'window_' + str(i) + '_start_var',
+             'window_' + str(i) + '_end', 'window_' + str(i) + '_end_var'] for i in WINDOWS]
+    rows = [row for window_rows in rows for row in window_rows]
+
+    parameters = np.stack([
+        data['weekly_preferences'].loc[rows, weekdays].to_numpy(dtype=float).T.reshape(len(weekdays), len(WINDOWS), 4)
+        for data in pue_input.values()
+    ], axis=1)
+
+    return parameters
+
+
+def window_bounds(pue_input, weekdays):
+    """
+    Calculate bounds of the random start and end of every usage window in minutes and check they are valid
+    - Rand window calculation in RAMP: random.randint(_window[0] - _random_var, _window[0] + _random_var)
+      !! Different here: window_X_start_var is absolut value in hours!
+    :param pue_input: nested dict of pue input data
+    :param weekdays: list of weekday names
+    :return: arrays (weekdays x appliances x windows) of lowest and highest start and end (in min),
+    bool array of defined windows
+    """
+
+    parameters = window_parameters(pue_input, weekdays) * 60
+    start, start_var, end, end_var = np.moveaxis(parameters, -1, 0)
+    defined = ~np.isnan(start)
+
+    start_low, start_high = start - start_var, start + start_var
+    end_low, end_high = end - end_var, end + end_var
+
+    # Check bounds of all defined windows -> window always lies within the day and always ends after it starts
+    invalid = defined & ~((start_var >= 0) & (end_var >= 0) & (start_low >= 0) & (end_high <= 24*60)
+                          & (start_high <= end_low))
+    if invalid.any():
+        weekday, appliance, window = np.argwhere(invalid)[0]
+        raise ValueError('Invalid usage window ' + str(WINDOWS[window]) + ' of ' + list(pue_input)[appliance]
+                         + ' on ' + weekdays[weekday] + ': start and end +/- variability must lie within the day'
+                         + ' and the latest start must not be after the earliest end')
+
+    # Bounds of undefined windows are set to 0 -> draws return 0 without using the random stream
+    bounds = [np.where(defined, bound, 0).astype(int) for bound in [start_low, start_high, end_low, end_high]]
+
+    return bounds + [defined]
+
+
+def draw_usage_windows(pue_input, days, seed=None, random_streams=None):
+    """
+    Draw random start and end of every usage window of every appliance on every day in one pass
+    :param pue_input: nested dict of pue input data (see InputData.read_pue_input)
+    :param days: DatetimeIndex of days
+    :param seed: seed of the random generator drawing all windows in one batch (None -> random)
+    :param random_streams: RandomStreams instance -> if passed, the windows of every day and appliance are drawn
+    from their own 'windows' stream (seed is ignored)
+    :return: arrays (days x appliances x windows) of window starts and ends in min (-1 for undefined windows)
+    """
+
+    days = pd.DatetimeIndex(days)
+    weekdays = list(pd.unique(days.day_name()))
+    start_low, start_high, end_low, end_high, defined = window_bounds(pue_input, weekdays)
+
+    # Bounds of every day (days x appliances x windows x [start, end])
+    day_weekdays = pd.Index(weekdays).get_indexer(days.day_name())
+    low = np.stack([start_low, end_low], axis=-1)[day_weekdays]
+    high = np.stack([start_high, end_high], axis=-1)[day_weekdays]
+
+    if random_streams is None:
+        # all days in one batch
+        rng = np.random.default_rng(seed)
+        windows = rng.integers(low, high, endpoint=True)
+    else:
+        # one batch per day and appliance from its own stream (order: start 1, end 1, start 2, end 2, ...)
+        windows = np.zeros(low.shape, dtype=int)
+        for d, day in enumerate(days):
+            for a, appliance in enumerate(pue_input):
+                rng = random_streams.generator('windows', day, appliance)
+                windows[d, a] = rng.integers(low[d, a], high[d, a], endpoint=True)
+
+    windows[~defined[day_weekdays]] = -1
+
+    return windows[..., 0], windows[..., 1]
@@ -15,6 +15,7 @@ from plotly.subplots import make_subplots
 import plotting
 from model.data_input import InputData
 from model.oemof_model import OemofModel
+from model.load_profile_store import read_load_profiles
 import helpers
 
 
@@ -38,10 +39,8 @@ while True:
 scenarios_lp = {}
 for scenario_id, scenario in scenarios.items():
 # Read this scenario's pue load profiles
-    scenarios_lp[scenario_id] = pd.read_csv(
-        cache_dir_path + 'load_profile_scenario_' + str(scenario_id) + '.csv',  # path to RAMP modelled load profiles
-        index_col=0,
-        parse_dates=True)
+    scenarios_lp[scenario_id] = read_load_profiles(
+        cache_dir_path + 'load_profile_scenario_' + str(scenario_id) + '.parquet')  # path to RAMP modelled load profiles
 
 #%% Plotting
 
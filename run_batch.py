@@ -0,0 +1,149 @@
+"""
+Headless batch runner: load profile generation (RAMP) and microgrid optimisation (oemof) without user input
+Usage:
+    python run_batch.py --run-name my_run --scenarios a b --workers 4 --seed 42
+    python run_batch.py --run-name my_run --stages optimise --freq 15min    (optimise previously generated run)
+    python run_batch.py --run-name my_run --stages optimise --solve-workers 8    (solve 8 scenarios at the same time)
+
+Exit codes: 0 -> all scenarios done, 1 -> at least one scenario failed, 2 -> invalid arguments or run folder
+"""
+import argparse
+import os
+import sys
+
+from model import pipeline
+
+
+EXIT_OK = 0
+EXIT_SCENARIO_FAILED = 1
+EXIT_INVALID = 2
+
+
+def positive_int(text):
+    """
+    argparse type of arguments that must be integers >= 1
+    """
+
+    number = int(text)
+    if number < 1:
+        raise argparse.ArgumentTypeError('must be at least 1, got ' + text)
+    return number
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate load profiles and optimise microgrids without user input')
+    parser.add_argument('--run-name', required=True, help='name of the run (folder in ./data_cache)')
+    parser.add_argument('--input-workbook', default='./model_input_data/model_input_1_scen_1min_res_test.xlsx',
+                        help='input workbook containing the scenarios table')
+    parser.add_argument('--scenarios', nargs='+', default=None, help='scenario ids to run (default: all)')
+    parser.add_argument('--stages', nargs='+', choices=['generate', 'optimise'], default=['generate', 'optimise'],
+                        help='stages to run')
+    parser.add_argument('--days', type=int, default=365, help='number of days to generate')
+    parser.add_argument('--freq', default='1h', help='time resolution of the oemof model')
+    parser.add_argument('--short', type=int, default=None, help='only optimise the first SHORT days')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes generating days in parallel')
+    parser.add_argument('--engine', choices=['ramp', 'numpy'], default='ramp',
+                        help='generate the appliances\' load profiles with RAMP or the vectorized duty cycle engine')
+    parser.add_argument('--block-days', type=int, default=7,
+                        help='days generated and appended to the files at once (memory does not grow with --days)')
+    parser.add_argument('--seed', type=int, default=None, help='master seed of all random streams')
+    parser.add_argument('--solver', default='cbc', help='solver used by oemof')
+    parser.add_argument('--solve-workers', type=int, default=1,
+                        help='worker processes building and solving scenarios in parallel')
+    parser.add_argument('--typical-periods', type=positive_int, default=None,
+                        help='optimise on this number of typical periods instead of the full timeseries')
+    parser.add_argument('--period-length', default='1D', help='length of the typical periods (e.g. 1D, 7D)')
+    parser.add_argument('--dispatch-freq', default=None,
+                        help='check the optimised capacities with a rolling horizon dispatch at this resolution')
+    parser.add_argument('--horizon', default='1D', help='kept part of every rolling horizon window')
+    parser.add_argument('--overlap', default='12h', help='look-ahead of every rolling horizon window')
+    parser.add_argument('--margin', type=float, default=0.0,
+                        help='relative capacity margin added to capacities violated in the dispatch check')
+    parser.add_argument('--max-iterations', type=int, default=1, help='maximum number of dispatch checks')
+    parser.add_argument('--peak-power-from', nargs='+', default=[], metavar='SCENARIO=SOURCE',
+                        help='use the peak power profile of SOURCE for SCENARIO (e.g. c=a)')
+    parser.add_argument('--no-reuse', action='store_true',
+                        help='generate all load profiles even if a previous run has them cached with the same key')
+    parser.add_argument('--overwrite', action='store_true', help='reuse an existing run folder when generating')
+
+    return parser.parse_args(argv)
+
+
+def check_peak_power_from(peak_power_from, scenario_ids):
+    """
+    :param peak_power_from: dict {scenario id: scenario id whose peak power profile is used}
+    :param scenario_ids: ids of the scenarios whose peak power profiles can be used
+    :raise ValueError: if a source scenario is not one of scenario_ids
+    """
+
+    unknown = set(peak_power_from.values()) - set(scenario_ids)
+    if unknown:
+        raise ValueError('--peak-power-from sources unknown or without load profiles: ' + ', '.join(sorted(unknown)))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    try:
+        peak_power_from = dict(pair.split('=', 1) for pair in args.peak_power_from)
+    except ValueError:
+        print('--peak-power-from expects SCENARIO=SOURCE pairs', file=sys.stderr)
+        return EXIT_INVALID
+
+    failed = []
+
+    if 'generate' in args.stages:
+        try:
+            scenarios = pipeline.read_scenarios(args.input_workbook, args.scenarios)
+            check_peak_power_from(peak_power_from, list(scenarios['scenario_id']))
+            cache_dir_path = pipeline.create_run_dir(args.run_name, overwrite=args.overwrite)
+        except (OSError, ValueError) as error:
+            print(error, file=sys.stderr)
+            return EXIT_INVALID
+
+        scenarios_information = pipeline.generate_load_profiles(cache_dir_path, scenarios, days_nr=args.days,
+                                                                workers=args.workers, seed=args.seed,
+                                                                continue_on_error=True,
+                                                                reuse_cached=not args.no_reuse,
+                                                                engine=args.engine, block_days=args.block_days)
+        failed += [scenario_id for scenario_id, info in scenarios_information.items() if 'error' in info]
+
+    if 'optimise' in args.stages:
+        cache_dir_path = pipeline.CACHE_PATH + args.run_name + "/"
+        if not os.path.exists(cache_dir_path + "scenarios_information.json"):
+            print(args.run_name + ' has no generated load profiles at: ' + cache_dir_path, file=sys.stderr)
+            return EXIT_INVALID
+
+        scenarios = pipeline.read_scenarios_information(cache_dir_path)
+        # Peak power profiles can only be taken from scenarios with generated load profiles
+        try:
+            check_peak_power_from(peak_power_from, [scenario_id for scenario_id, info in scenarios.items()
+                                                    if 'error' not in info])
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            return EXIT_INVALID
+        # Only optimise scenarios with generated load profiles
+        scenario_ids = [scenario_id for scenario_id, info in scenarios.items()
+                        if 'error' not in info and (args.scenarios is None or scenario_id in args.scenarios)]
+
+        _, optimise_failed = pipeline.optimise_scenarios(cache_dir_path, scenarios, scenario_ids=scenario_ids,
+                                                         freq=args.freq, short=args.short or False,
+                                                         solver=args.solver, peak_power_from=peak_power_from,
+                                                         continue_on_error=True,
+                                                         typical_periods=args.typical_periods,
+                                                         period_length=args.period_length,
+                                                         dispatch_freq=args.dispatch_freq,
+                                                         horizon=args.horizon, overlap=args.overlap,
+                                                         margin=args.margin, max_iterations=args.max_iterations,
+                                                         workers=args.solve_workers)
+        failed += optimise_failed
+
+    if failed:
+        print('Failed scenarios: ' + ', '.join(sorted(set(failed))), file=sys.stderr)
+        return EXIT_SCENARIO_FAILED
+
+    return EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())